@@ -2,6 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compass import load_grid as load_scenario_grid
+from compass.frontier import frontier_tables, goal_seek
+from compass.path_to_green import path_to_green
 
 st.set_page_config(
     page_title="PFM Compass - Retirement Planning Feature | 退職計画シミュレーター",
@@ -242,6 +249,20 @@ def load_data():
         st.error(f"❌ Error loading data | データの読み込みに失敗しました: {e}")
         return None
 
+@st.cache_resource
+def load_grid():
+    """Dense scenario grid used for the path-to-green advice"""
+    try:
+        return load_scenario_grid()
+    except Exception:
+        return None
+
+@st.cache_resource
+def load_frontiers():
+    """Goal-seek tables (minimum savings / maximum expenses) for the grid"""
+    grid = load_grid()
+    return frontier_tables(grid) if grid is not None else None
+
 def simple_lookup(df, age_bucket, current_savings_bucket, expected_expenses_bucket,
                  gender, household_size, housing_status, income_bucket, 
                  marital_status, monthly_savings_bucket, retirement_age_bucket):
@@ -278,11 +299,25 @@ def get_status_message(result, lang):
     else:
         return TRANSLATIONS[lang]["status_red"]
 
-def get_advice(result, lang):
+def describe_path(path, lang):
+    """One line per bucket change on the way to green"""
+    side = 0 if lang == "English" else 1
+    return [
+        f"{BUCKET_MAPPINGS[s['dimension']][s['from_level']].split(' | ')[side]} → "
+        f"{BUCKET_MAPPINGS[s['dimension']][s['to_level']].split(' | ')[side]}"
+        for s in path
+    ]
+
+def get_advice(result, lang, path=None):
     """Get personalized advice in selected language"""
     advice = []
     
     if lang == "English":
+        if path:
+            advice.append(f"🟢 Fewest changes to reach green ({len(path)}): " + ", ".join(describe_path(path, lang)))
+        elif path is None and result['status_color'] != 'green':
+            advice.append("🧭 No change to savings, expenses, retirement age or housing reaches green - focus on income and assets")
+        
         if result['fire_percentage'] < 50:
             advice.append("💰 Consider increasing savings or reducing expenses")
         
@@ -296,6 +331,11 @@ def get_advice(result, lang):
         if not advice:
             advice.append("✅ Your current plan looks good. Continue building your assets")
     else:  # Japanese
+        if path:
+            advice.append(f"🟢 グリーン達成までの最短ステップ（{len(path)}）: " + "、".join(describe_path(path, lang)))
+        elif path is None and result['status_color'] != 'green':
+            advice.append("🧭 貯蓄・生活費・退職年齢・住居の変更だけではグリーンに届きません。収入や資産の拡大を検討してください")
+        
         if result['fire_percentage'] < 50:
             advice.append("💰 貯蓄額を増やすか、支出を削減することをお勧めします")
         
@@ -590,10 +630,45 @@ if analyze_button:
         with tab3:
             st.markdown(t["personalized_advice"])
             
-            advice_list = get_advice(result, lang)
+            grid = load_grid()
+            path = []
+            if grid is not None:
+                path = path_to_green(
+                    grid, age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                    expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                    household_size=household_size, housing_status=housing_status,
+                    income_bucket=income_bucket, marital_status=marital_status,
+                    monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                )
+            advice_list = get_advice(result, lang, path)
             for advice in advice_list:
                 st.markdown(f"- {advice}")
             
+            frontiers = load_frontiers()
+            if frontiers is not None:
+                goals = goal_seek(
+                    frontiers, age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                    expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                    household_size=household_size, housing_status=housing_status,
+                    income_bucket=income_bucket, marital_status=marital_status,
+                    monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                )
+                side = 0 if lang == "English" else 1
+                def goal_label(dim, level):
+                    if level is None:
+                        return "Out of reach" if lang == "English" else "到達不可"
+                    return BUCKET_MAPPINGS[dim][level].split(' | ')[side]
+                goal_cols = st.columns(3)
+                goal_cols[0].metric(
+                    "Min. savings for green" if lang == "English" else "グリーンに必要な最低貯蓄額",
+                    goal_label('monthly_savings_bucket', goals['min_savings_for_green']))
+                goal_cols[1].metric(
+                    "Min. savings for yellow" if lang == "English" else "イエローに必要な最低貯蓄額",
+                    goal_label('monthly_savings_bucket', goals['min_savings_for_yellow']))
+                goal_cols[2].metric(
+                    "Max. expenses staying green" if lang == "English" else "グリーンを保てる最大生活費",
+                    goal_label('expected_expenses_bucket', goals['max_expenses_for_green']))
+            
             st.markdown(t["related_info"])
             
             if result['retirement_age_midpoint'] < 65:
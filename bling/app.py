@@ -4,6 +4,18 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compass import LEVEL_MIDPOINTS, LEVELS, warmup
+from compass.montecarlo import submit_fan_chart
+from compass.accounts import ACCOUNTS
+from compass.inflation import INFLATION, view
+from compass.model import ASSUMPTIONS
+from compass.household import joint_plan
+from compass.path_to_green import path_to_green
+from compass.sensitivity import sensitivity
 
 st.set_page_config(
     page_title="PFM Compass - Retirement Planning Feature | 退職計画シミュレーター",
@@ -414,43 +426,55 @@ BUCKET_MAPPINGS = {
     }
 }
 
-@st.cache_data
+@st.cache_resource
 def load_data():
-    """Load the data from S3 (partitioned structure)"""
+    """Load the data from S3 (partitioned structure); shared with the startup warm-up"""
     try:
-        # Try S3 first
-        import boto3
-        import awswrangler as wr
-        s3_path = "s3://jp-data-lake-experimental-production/lakehouse_experimental_jp_production/pfm_compass_retirement_predictions_internal_v1/"
-        df = wr.s3.read_parquet(path=s3_path, dataset=True, partition_filter=None)
-        return df
-    except:
-        # Fallback to local or sample data
-        try:
-            df = pd.read_parquet('../data/pfm_compass_data/retirement_scenarios_FIXED_v4_alternative.parquet')
-            return df
-        except:
-            # Create sample data for demo
-            sample_data = []
-            for i in range(100):
-                sample_data.append({
-                    'sk': f'combo__35-39__c__c__f__2__rent__c__m__d__65__{i}',
-                    'age_bucket': '35-39', 'current_savings_bucket': 'c', 'expected_expenses_bucket': 'c',
-                    'gender': 'f', 'household_size': 2, 'housing_status': 'rent', 'income_bucket': 'c',
-                    'marital_status': 'm', 'monthly_savings_bucket': 'd', 'retirement_age_bucket': '65',
-                    'fire_percentage': 75.0 + i % 25, 'fire_grade': 'A', 'traditional_grade': 'B',
-                    'status_color': 'green', 'projected_wealth': 50000000, 'fire_number': 60000000,
-                    'traditional_retirement_age': 62.0, 'traditional_number': 40000000,
-                    'wealth_timeline': [
-                        {'age': 37, 'wealth': 10000000, 'year': 2025},
-                        {'age': 40, 'wealth': 20000000, 'year': 2028},
-                        {'age': 65, 'wealth': 50000000, 'year': 2053}
-                    ],
-                    'fire_achievable': True, 'on_time_retirement': True,
-                    'early_retirement_ready': 3.0, 'late_retirement': 0.0,
-                    'age_midpoint': 37.0, 'retirement_age_midpoint': 67.0
-                })
-            return pd.DataFrame(sample_data)
+        # S3 first, then the local export
+        return warmup.data()
+    except Exception:
+        # Fallback to sample data for demo
+        sample_data = []
+        for i in range(100):
+            sample_data.append({
+                'sk': f'combo__35-39__c__c__f__2__rent__c__m__d__65__{i}',
+                'age_bucket': '35-39', 'current_savings_bucket': 'c', 'expected_expenses_bucket': 'c',
+                'gender': 'f', 'household_size': 2, 'housing_status': 'rent', 'income_bucket': 'c',
+                'marital_status': 'm', 'monthly_savings_bucket': 'd', 'retirement_age_bucket': '65',
+                'fire_percentage': 75.0 + i % 25, 'fire_grade': 'A', 'traditional_grade': 'B',
+                'status_color': 'green', 'projected_wealth': 50000000, 'fire_number': 60000000,
+                'traditional_retirement_age': 62.0, 'traditional_number': 40000000,
+                'wealth_timeline': [
+                    {'age': 37, 'wealth': 10000000, 'year': 2025},
+                    {'age': 40, 'wealth': 20000000, 'year': 2028},
+                    {'age': 65, 'wealth': 50000000, 'year': 2053}
+                ],
+                'fire_achievable': True, 'on_time_retirement': True,
+                'early_retirement_ready': 3.0, 'late_retirement': 0.0,
+                'age_midpoint': 37.0, 'retirement_age_midpoint': 67.0
+            })
+        return pd.DataFrame(sample_data)
+
+@st.cache_resource
+def load_backend():
+    """DynamoDB lookup backend when PFM_DYNAMODB_TABLE is set, else the PFM_BACKEND storage
+    backend (e.g. ``mmap``, shared by all workers); no table held in memory"""
+    table = os.environ.get('PFM_DYNAMODB_TABLE')
+    if not table:
+        return warmup.backend()
+    from compass.dynamo import DynamoLookup
+    return DynamoLookup(table, endpoint_url=os.environ.get('PFM_DYNAMODB_ENDPOINT'))
+
+@st.cache_resource
+def load_grid():
+    """Dense scenario grid used for what-if (neighbour) lookups"""
+    backend = load_backend()
+    if backend is not None and not hasattr(backend, 'grid'):
+        return None
+    try:
+        return warmup.grid()
+    except Exception:
+        return None
 
 def create_enhanced_progress_bar(percentage, label, color="#667eea"):
     """Create an animated progress bar"""
@@ -509,7 +533,7 @@ def create_chart_explanation(title, explanation):
 
 # Enhanced data loading with progress
 with st.spinner("🔄 Loading retirement scenarios..."):
-    df = load_data()
+    df = load_backend() or load_data()
     
 if df is None:
     st.error("Failed to load data")
@@ -600,14 +624,43 @@ with st.sidebar.form("profile_form"):
         format_func=lambda x: BUCKET_MAPPINGS['housing_status'][x]
     )
     
+    with st.expander("👫 Partner (joint household plan)"):
+        include_partner = st.checkbox("Plan together with my partner", value=False)
+        partner = {}
+        for dim, label in [('age_bucket', t["age"]), ('income_bucket', t["income"]),
+                           ('current_savings_bucket', t["current_savings"]),
+                           ('monthly_savings_bucket', t["monthly_savings"]),
+                           ('retirement_age_bucket', t["retirement_age"])]:
+            partner[dim] = st.selectbox(
+                label,
+                options=list(BUCKET_MAPPINGS[dim].keys()),
+                format_func=lambda x, dim=dim: BUCKET_MAPPINGS[dim][x],
+                key=f"partner_{dim}"
+            )
+    
     analyze_button = st.form_submit_button(t["analyze_button"], type="primary", use_container_width=True)
 
+# Real/nominal switch sits outside the form: toggling it only rescales the amounts already shown
+real_view = st.sidebar.radio("💴 Amounts", ["Nominal yen", "Today's yen"], horizontal=True) == "Today's yen"
+inflation_rate = st.sidebar.slider("Inflation (%/year)", 0.0, 4.0, INFLATION * 100, 0.5, disabled=not real_view) / 100
+
 # Enhanced analysis section with better functions from your original code
 def simple_lookup(df, age_bucket, current_savings_bucket, expected_expenses_bucket,
                  gender, household_size, housing_status, income_bucket, 
                  marital_status, monthly_savings_bucket, retirement_age_bucket):
     """Simple lookup using the exact sort key format"""
+    if not isinstance(df, pd.DataFrame):
+        return df.lookup(
+            age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+            expected_expenses_bucket=expected_expenses_bucket, gender=gender, household_size=household_size,
+            housing_status=housing_status, income_bucket=income_bucket, marital_status=marital_status,
+            monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket)
     sort_key = f"combo__{age_bucket}__{current_savings_bucket}__{expected_expenses_bucket}__{gender}__{household_size}__{housing_status}__{income_bucket}__{marital_status}__{monthly_savings_bucket}__{retirement_age_bucket}"
+    if 'sk' in df.columns:
+        index = warmup.sk_index(df)
+        row = index.get_indexer([sort_key])[0] if index.is_unique else -1
+        if row >= 0:
+            return df.iloc[row].to_dict()
     result = df[df['sk'].str.startswith(sort_key) if 'sk' in df.columns else df.index == 0]
     return result.iloc[0].to_dict() if len(result) > 0 else None
 
@@ -626,13 +679,22 @@ if analyze_button:
         import time
         time.sleep(1)  # Dramatic pause for effect
         
-        result = simple_lookup(
+        st.session_state['result'] = simple_lookup(
             df, age_bucket, current_savings_bucket, expected_expenses_bucket,
             gender, household_size, housing_status, income_bucket,
             marital_status, monthly_savings_bucket, retirement_age_bucket
         )
-    
+
+if 'result' in st.session_state:
+    result = st.session_state['result']
+
+    def amount(value, year):
+        """Nominal yen at ``year`` in the selected view"""
+        return view(value, year, real_view, inflation_rate)
+
     if result:
+        retirement_year = int(LEVEL_MIDPOINTS['retirement_age_bucket'][LEVELS['retirement_age_bucket'].index(retirement_age_bucket)]
+                              - LEVEL_MIDPOINTS['age_bucket'][LEVELS['age_bucket'].index(age_bucket)]) + ASSUMPTIONS['start_year']
         # Enhanced status message with glow effects
         status_msg = TRANSLATIONS[lang]["status_green"] if result.get('status_color', 'green') == 'green' else \
                     TRANSLATIONS[lang]["status_yellow"] if result.get('status_color', 'yellow') == 'yellow' else \
@@ -694,14 +756,14 @@ if analyze_button:
         with col3:
             st.metric(
                 t["projected_wealth"],
-                format_currency(result.get('projected_wealth', 50000000)),
+                format_currency(amount(result.get('projected_wealth', 50000000), retirement_year)),
                 t["at_retirement"]
             )
         
         with col4:
             st.metric(
                 t["fire_required"],
-                format_currency(result.get('fire_number', 60000000)),
+                format_currency(amount(result.get('fire_number', 60000000), retirement_year)),
                 t["years_living_expenses"]
             )
         
@@ -752,6 +814,8 @@ if analyze_button:
                         timeline_df = pd.DataFrame(timeline_data.tolist())
                     else:
                         timeline_df = pd.DataFrame([timeline_data])
+                    if 'year' in timeline_df.columns and 'wealth' in timeline_df.columns:
+                        timeline_df['wealth'] = amount(timeline_df['wealth'].to_numpy(), timeline_df['year'].to_numpy())
                     
                     if len(timeline_df) > 0 and 'age' in timeline_df.columns and 'wealth' in timeline_df.columns:
                         # Create enhanced visualization
@@ -772,8 +836,44 @@ if analyze_button:
                             )
                         )
                         
+                        # Monte Carlo fan: 10th-90th percentile band and median of 10,000 return paths
+                        def midpoint(dim, level):
+                            return float(LEVEL_MIDPOINTS[dim][LEVELS[dim].index(level)])
+                        try:
+                            with st.spinner("🎲 Simulating 10,000 market scenarios..."):
+                                fan = submit_fan_chart(
+                                    midpoint('age_bucket', age_bucket),
+                                    midpoint('retirement_age_bucket', retirement_age_bucket),
+                                    midpoint('current_savings_bucket', current_savings_bucket),
+                                    midpoint('monthly_savings_bucket', monthly_savings_bucket),
+                                    midpoint('expected_expenses_bucket', expected_expenses_bucket),
+                                ).result(timeout=30)
+                        except Exception:
+                            fan = None
+                        if fan is not None and real_view:
+                            # The fan is memoised; rescale a copy
+                            fan = dict(fan, **{k: amount(fan[k], fan['year']) for k in ('p10', 'p50', 'p90')})
+                        if fan is not None:
+                            fig.add_trace(go.Scatter(
+                                x=fan['age'], y=fan['p90'], mode='lines', line=dict(width=0),
+                                name='90th percentile', showlegend=False,
+                                hovertemplate='Good markets (p90): ¥%{y:,.0f}<extra></extra>'
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=fan['age'], y=fan['p10'], mode='lines', line=dict(width=0),
+                                fill='tonexty', fillcolor='rgba(46, 213, 115, 0.15)',
+                                name='Likely range (p10-p90)',
+                                hovertemplate='Poor markets (p10): ¥%{y:,.0f}<extra></extra>'
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=fan['age'], y=fan['p50'], mode='lines',
+                                line=dict(color='#2ed573', width=2, dash='dot'),
+                                name='Median market outcome',
+                                hovertemplate='Median (p50): ¥%{y:,.0f}<extra></extra>'
+                            ))
+                        
                         # FIRE goal line
-                        fire_target = result.get('fire_number', 60000000)
+                        fire_target = amount(result.get('fire_number', 60000000), retirement_year)
                         fig.add_hline(
                             y=fire_target,
                             line_dash="dash",
@@ -832,6 +932,29 @@ if analyze_button:
                             final_wealth = timeline_df['wealth'].iloc[-1]
                             st.metric("🎯 **Final Wealth**", format_currency(final_wealth))
                         
+                        grid = load_grid()
+                        if grid is not None:
+                            scenario = grid.lookup(
+                                age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                                expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                                household_size=household_size, housing_status=housing_status,
+                                income_bucket=income_bucket, marital_status=marital_status,
+                                monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                            )
+                            if np.isnan(scenario['depletion_age']):
+                                st.success(f"🏦 **Money lasts to 100** with {format_currency(scenario['terminal_wealth'])} left, withdrawing your expected expenses from retirement and adding the public pension from 65")
+                            else:
+                                st.warning(f"🏦 **Savings run out at age {scenario['depletion_age']:.0f}** when withdrawing your expected expenses after retirement (public pension from 65 included)")
+                        
+                        if fan is not None:
+                            st.markdown(f"""
+                            <div class="chart-explanation">
+                                <h4>🎲 Market Uncertainty ({fan['paths']:,} simulated paths)</h4>
+                                <p>With yearly returns that average 3% but swing around it, <b>{fan['success_probability'] * 100:.0f}%</b> of simulated futures reach your FIRE target by retirement.
+                                In a poor market (10th percentile) you would retire with about {format_currency(fan['p10'][-1])}; in a good one (90th percentile) about {format_currency(fan['p90'][-1])}.</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        
                     else:
                         st.info("📊 Timeline data structure not compatible. Showing summary instead.")
                         # Show simple metrics instead
@@ -994,94 +1117,93 @@ if analyze_button:
             # Chart explanation for scenarios
             st.markdown(create_chart_explanation(
                 "What-If Scenario Analysis",
-                "This analysis shows how small changes to your savings rate or investment returns could dramatically impact your retirement outcome. The Conservative scenario assumes lower returns and savings, Current Plan uses your inputs, and Aggressive assumes higher savings and returns. Use this to understand the impact of increasing your monthly savings or taking on slightly more investment risk."
+                "Each bar shows what happens to your FIRE achievement if you move one step on something you control - saving a bucket more or less per month, spending a bucket more or less in retirement, retiring one bracket earlier or later, or changing your housing situation. Every alternative is an actual pre-computed scenario, not an estimate, so the retirement age and status shown are exactly what you would see by re-running the analysis with that change."
             ), unsafe_allow_html=True)
             
-            # New scenarios analysis tab
             st.subheader("🎯 Impact of Different Strategies")
             
-            # Create scenario variations
-            scenarios = {
-                'Conservative': {'savings_multiplier': 0.8, 'return_rate': 0.02, 'description': 'Lower savings, safer investments'},
-                'Current Plan': {'savings_multiplier': 1.0, 'return_rate': 0.03, 'description': 'Your current strategy'},
-                'Aggressive': {'savings_multiplier': 1.3, 'return_rate': 0.05, 'description': 'Higher savings, growth investments'}
-            }
-            
-            scenario_results = []
-            for scenario_name, params in scenarios.items():
-                # Simulate different outcomes
-                base_wealth = result.get('projected_wealth', 50000000)
-                adjusted_wealth = base_wealth * params['savings_multiplier'] * (1 + params['return_rate'] - 0.03)
-                fire_achievement = min(100, (adjusted_wealth / result.get('fire_number', 60000000)) * 100)
+            grid = load_grid()
+            if grid is None:
+                st.info("📊 Scenario grid not available - what-if analysis needs the local scenario data.")
+            else:
+                profile = dict(
+                    age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                    expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                    household_size=household_size, housing_status=housing_status,
+                    income_bucket=income_bucket, marital_status=marital_status,
+                    monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                )
+                what_if = sensitivity(grid, **profile)
+                base = what_if['base']
+                moves_df = pd.DataFrame(what_if['moves'])
                 
-                scenario_results.append({
-                    'Scenario': scenario_name,
-                    'Description': params['description'],
-                    'Projected Wealth': adjusted_wealth,
-                    'FIRE Achievement': fire_achievement,
-                    'Monthly Savings Adjustment': f"{(params['savings_multiplier'] - 1) * 100:+.0f}%",
-                    'Expected Return': f"{params['return_rate'] * 100:.1f}%"
-                })
-            
-            scenario_df = pd.DataFrame(scenario_results)
-            
-            # Scenario comparison chart
-            fig_scenarios = go.Figure()
-            
-            colors = ['#e74c3c', '#667eea', '#2ecc71']
-            for i, scenario in enumerate(scenario_results):
+                dimension_labels = {
+                    'monthly_savings_bucket': t["monthly_savings"],
+                    'expected_expenses_bucket': t["monthly_expenses"],
+                    'retirement_age_bucket': t["retirement_age"],
+                    'housing_status': t["housing"]
+                }
+                moves_df['Change'] = [
+                    f"{dimension_labels[d]}: {BUCKET_MAPPINGS[d][to].split(' | ')[0]}"
+                    for d, to in zip(moves_df['dimension'], moves_df['to_level'])
+                ]
+                
+                status_colors = {'green': '#2ed573', 'yellow': '#ffa502', 'red': '#ff4757'}
+                fig_scenarios = go.Figure()
                 fig_scenarios.add_trace(go.Bar(
-                    name=scenario['Scenario'],
-                    x=['Projected Wealth (Million ¥)', 'FIRE Achievement (%)'],
-                    y=[scenario['Projected Wealth']/1000000, scenario['FIRE Achievement']],
-                    marker_color=colors[i],
-                    opacity=0.8,
-                    text=[f"¥{scenario['Projected Wealth']/1000000:.1f}M", f"{scenario['FIRE Achievement']:.1f}%"],
+                    x=moves_df['fire_percentage_change'],
+                    y=moves_df['Change'],
+                    orientation='h',
+                    marker_color=[status_colors[c] for c in moves_df['status_color']],
+                    opacity=0.85,
+                    text=[f"{v:+.1f} pts" for v in moves_df['fire_percentage_change']],
                     textposition='auto',
+                    hovertemplate='<b>%{y}</b><br>FIRE change: %{x:+.1f} pts<extra></extra>'
                 ))
-            
-            fig_scenarios.update_layout(
-                title="Scenario Impact Comparison",
-                barmode='group',
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)",
-                font={'color': "white", 'family': "Inter"},
-                height=400,
-                yaxis_title="Value",
-                showlegend=True
-            )
-            
-            fig_scenarios.update_xaxes(gridcolor="rgba(255,255,255,0.2)")
-            fig_scenarios.update_yaxes(gridcolor="rgba(255,255,255,0.2)")
-            
-            st.plotly_chart(fig_scenarios, use_container_width=True)
-            
-            # Scenario details with actionable insights
-            st.markdown("#### 💰 What Each Scenario Means:")
-            
-            for scenario in scenario_results:
-                color = {'Conservative': '#e74c3c', 'Current Plan': '#667eea', 'Aggressive': '#2ecc71'}[scenario['Scenario']]
                 
-                st.markdown(f"""
-                <div style="background: linear-gradient(145deg, #34495e, #2c3e50); padding: 1.5rem; margin: 1rem 0; border-radius: 15px; border-left: 4px solid {color};">
-                    <h4 style="color: {color}; margin-bottom: 1rem;">{scenario['Scenario']} Strategy</h4>
-                    <p style="color: #bdc3c7; margin-bottom: 1rem;">{scenario['Description']}</p>
-                    <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem;">
-                        <div>
-                            <span style="color: white; font-weight: bold;">Final Wealth</span><br>
-                            <span style="color: {color}; font-size: 1.2rem;">{format_currency(scenario['Projected Wealth'])}</span>
-                        </div>
-                        <div>
-                            <span style="color: white; font-weight: bold;">FIRE Progress</span><br>
-                            <span style="color: {color}; font-size: 1.2rem;">{scenario['FIRE Achievement']:.1f}%</span>
-                        </div>
-                        <div>
-                            <span style="color: white; font-weight: bold;">Savings Change</span><br>
-                            <span style="color: {color}; font-size: 1.2rem;">{scenario['Monthly Savings Adjustment']}</span>
+                fig_scenarios.update_layout(
+                    title=f"FIRE Achievement Change vs Current Plan ({base['fire_percentage']:.1f}%)",
+                    paper_bgcolor="rgba(0,0,0,0)",
+                    plot_bgcolor="rgba(0,0,0,0)",
+                    font={'color': "white", 'family': "Inter"},
+                    height=max(350, 45 * len(moves_df)),
+                    xaxis_title="Change in FIRE Achievement (percentage points)",
+                    showlegend=False
+                )
+                
+                fig_scenarios.update_xaxes(gridcolor="rgba(255,255,255,0.2)", zeroline=True, zerolinecolor="white")
+                fig_scenarios.update_yaxes(gridcolor="rgba(255,255,255,0.2)")
+                
+                st.plotly_chart(fig_scenarios, use_container_width=True)
+                
+                # Scenario details with actionable insights
+                st.markdown("#### 💰 What Each Change Means:")
+                
+                for _, move in moves_df.iterrows():
+                    color = status_colors[move['status_color']]
+                    age_change = move['retirement_age_change']
+                    age_text = "No change" if age_change == 0 else f"{age_change:+.0f} years"
+                    status_text = f"{base['status_color']} → {move['status_color']}" if move['status_changed'] else move['status_color']
+                    
+                    st.markdown(f"""
+                    <div style="background: linear-gradient(145deg, #34495e, #2c3e50); padding: 1.5rem; margin: 1rem 0; border-radius: 15px; border-left: 4px solid {color};">
+                        <h4 style="color: {color}; margin-bottom: 1rem;">{move['Change']}</h4>
+                        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem;">
+                            <div>
+                                <span style="color: white; font-weight: bold;">FIRE Progress</span><br>
+                                <span style="color: {color}; font-size: 1.2rem;">{move['fire_percentage']:.1f}% ({move['fire_percentage_change']:+.1f})</span>
+                            </div>
+                            <div>
+                                <span style="color: white; font-weight: bold;">Traditional Retirement Age</span><br>
+                                <span style="color: {color}; font-size: 1.2rem;">{move['traditional_retirement_age']:.0f} ({age_text})</span>
+                            </div>
+                            <div>
+                                <span style="color: white; font-weight: bold;">Status</span><br>
+                                <span style="color: {color}; font-size: 1.2rem;">{status_text}</span>
+                            </div>
                         </div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
         
         with tab4:
             # Enhanced advice with personalized recommendations
@@ -1091,6 +1213,52 @@ if analyze_button:
             advice_items = []
             
             fire_pct = result.get('fire_percentage', 75)
+            grid = load_grid()
+            if grid is not None and result.get('status_color') != 'green':
+                steps = path_to_green(
+                    grid, age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                    expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                    household_size=household_size, housing_status=housing_status,
+                    income_bucket=income_bucket, marital_status=marital_status,
+                    monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                )
+                if steps:
+                    changes = [
+                        f"{BUCKET_MAPPINGS[s['dimension']][s['from_level']].split(' | ')[0]} → "
+                        f"{BUCKET_MAPPINGS[s['dimension']][s['to_level']].split(' | ')[0]}"
+                        for s in steps
+                    ]
+                    advice_items.append({
+                        'icon': '🟢',
+                        'title': f"Path to Green ({len(steps)} step{'s' if len(steps) > 1 else ''})",
+                        'description': 'The fewest bucket changes that turn this plan green, based on the pre-computed scenarios: ' + '; '.join(changes) + '.',
+                        'priority': 'High',
+                        'action': f"Start with {changes[0]}"
+                    })
+                elif steps is None:
+                    advice_items.append({
+                        'icon': '🧭',
+                        'title': 'No Green Plan Within Reach',
+                        'description': 'No combination of savings, expenses, retirement age or housing changes turns this profile green. Income and current savings are the levers left.',
+                        'priority': 'High',
+                        'action': 'Look for ways to grow income or existing assets'
+                    })
+                if 'value_of_nisa' in grid.columns:
+                    scenario = grid.lookup(
+                        age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                        expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                        household_size=household_size, housing_status=housing_status,
+                        income_bucket=income_bucket, marital_status=marital_status,
+                        monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+                    )
+                    if scenario['value_of_nisa'] + scenario['value_of_ideco'] > 0:
+                        advice_items.append({
+                            'icon': '🧾',
+                            'title': 'Use NISA and iDeCo',
+                            'description': f"Routing your savings through iDeCo and NISA instead of a taxable account is worth about {format_currency(scenario['value_of_nisa'])} (NISA) and {format_currency(scenario['value_of_ideco'])} (iDeCo) by retirement, after tax ({format_currency(scenario['after_tax_wealth'])} in total).",
+                            'priority': 'Medium',
+                            'action': f"Fill iDeCo (¥{ACCOUNTS['ideco_annual']:,}/year) first, then NISA (¥{ACCOUNTS['nisa_annual']:,}/year)"
+                        })
             if fire_pct < 50:
                 advice_items.append({
                     'icon': '💰',
@@ -1160,7 +1328,7 @@ if analyze_button:
             
             action_steps = [
                 "📊 Review and optimize current investment allocation for your risk tolerance",
-                "💳 Maximize employer 401k matching and NISA contributions (¥1.2M annually)",
+                f"💳 Maximize iDeCo (¥{ACCOUNTS['ideco_annual']:,} annually) and NISA contributions (¥{ACCOUNTS['nisa_annual']:,} annually)",
                 "🏠 Evaluate housing costs - consider refinancing or downsizing if beneficial",
                 "📈 Set up automatic savings increases (1% of salary every 6 months)",
                 "🎯 Schedule quarterly reviews to track progress and adjust strategy"
@@ -1199,6 +1367,48 @@ if analyze_button:
             </div>
             """, unsafe_allow_html=True)
     
+        grid = load_grid()
+        if include_partner and grid is not None:
+            st.markdown("---")
+            st.subheader("👫 Joint Household Plan")
+            me = dict(
+                age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+                expected_expenses_bucket=expected_expenses_bucket, gender=gender,
+                household_size=household_size, housing_status=housing_status,
+                income_bucket=income_bucket, marital_status=marital_status,
+                monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket
+            )
+            # The household shares one expense budget: the one entered above
+            partner_profile = dict(me, gender='f' if gender == 'm' else 'm', **partner)
+            plan = joint_plan(grid, me, partner_profile,
+                              household_expenses=LEVEL_MIDPOINTS['expected_expenses_bucket'][
+                                  LEVELS['expected_expenses_bucket'].index(expected_expenses_bucket)])
+            
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Household FIRE Progress", f"{plan['fire_percentage']:.1f}%", f"Grade: {plan['fire_grade']}")
+            col2.metric("Household Wealth When Both Retire", format_currency(plan['projected_wealth']), f"in {plan['retirement_year']}")
+            col3.metric("FIRE Target Reached", str(plan['fire_year']) if plan['fire_year'] else "Not yet", format_currency(plan['fire_number']))
+            
+            joint = plan['timeline']
+            fig_joint = go.Figure()
+            fig_joint.add_trace(go.Bar(x=joint['year'], y=joint['wealth_a'], name='You', marker_color='#667eea',
+                                       customdata=joint['age_a'], hovertemplate='You (age %{customdata}): ¥%{y:,.0f}<extra></extra>'))
+            fig_joint.add_trace(go.Bar(x=joint['year'], y=joint['wealth_b'], name='Partner', marker_color='#f093fb',
+                                       customdata=joint['age_b'], hovertemplate='Partner (age %{customdata}): ¥%{y:,.0f}<extra></extra>'))
+            fig_joint.add_hline(y=plan['fire_number'], line_dash="dash", line_color="#e74c3c",
+                                annotation_text=f"Household FIRE Target: {format_currency(plan['fire_number'])}")
+            fig_joint.update_layout(
+                barmode='stack',
+                title="Combined Wealth by Year",
+                xaxis_title="Year",
+                yaxis_title="Household Wealth (¥)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                font={'color': "white", 'family': "Inter"},
+                height=450
+            )
+            st.plotly_chart(fig_joint, use_container_width=True)
+    
     else:
         st.error("❌ No matching scenario found. Try different parameters!")
 
@@ -1310,7 +1520,7 @@ else:
         
         # Create a sample analysis
         total_scenarios = len(df)
-        if 'status_color' in df.columns:
+        if 'status_color' in getattr(df, 'columns', ()):
             green_pct = (df['status_color'] == 'green').mean() * 100
             yellow_pct = (df['status_color'] == 'yellow').mean() * 100
             red_pct = (df['status_color'] == 'red').mean() * 100
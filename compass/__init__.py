@@ -0,0 +1,5 @@
+"""Scenario grid engine shared by the PFM Compass apps and utilities."""
+
+from .grid import (DIMENSIONS, GRID_SHAPE, GRID_SIZE, LEVELS, LEVEL_MIDPOINTS,
+                   ScenarioGrid, Timelines, flat_index, load_grid, sort_key)
+from .model import ASSUMPTIONS
@@ -0,0 +1,197 @@
+"""NISA / iDeCo / taxable account overlay on the contribution stream.
+
+The grid grows every yen at the gross return.  Here each year's savings
+are routed to iDeCo first (up to its annual limit, until ``ideco_until_age``),
+then NISA (annual and lifetime limits), and the rest to a taxable account:
+
+* NISA and iDeCo grow tax-free (iDeCo's lump sum is assumed to fall within
+  the retirement income deduction);
+* iDeCo contributions are income-deductible; the tax saved at the marginal
+  rate is reinvested in the taxable account;
+* the taxable account pays tax every year on the distributed share of its
+  return and, when valued, on its unrealised gains.
+
+Existing savings start in the taxable account with no embedded gains.
+Between the two limit breakpoints every account receives a constant stream,
+so each account value is a short sum of closed-form annuity terms (the same
+``(g**t - 1) / r`` convention as ``model.wealth_at``), evaluated for any
+array of profiles and elapsed times at once.
+"""
+
+import numpy as np
+
+from . import model
+from .grid import GRID_SHAPE, LEVELS, axis
+
+ACCOUNTS = {
+    'nisa_annual': 3_600_000,        # tsumitate 1.2M + growth 2.4M
+    'nisa_lifetime': 18_000_000,
+    'ideco_annual': 276_000,         # employees without a corporate DC plan
+    'ideco_until_age': 65,
+    'capital_gains_tax': 0.20315,
+    'distributed_share': 0.3,        # share of the taxable return paid out (and taxed) each year
+    'taxable_income_share': 0.7,     # taxable income after employment/social insurance deductions
+    'reinvest_ideco_refund': True,   # put the iDeCo tax saving into the taxable account
+}
+
+# National income tax brackets on taxable income (plus 10% resident tax)
+INCOME_TAX_BRACKETS = [(1_950_000, 0.05), (3_300_000, 0.10), (6_950_000, 0.20), (9_000_000, 0.23),
+                       (18_000_000, 0.33), (40_000_000, 0.40), (np.inf, 0.45)]
+RESIDENT_TAX = 0.10
+RECONSTRUCTION_SURTAX = 0.021
+
+DIMS = ['age_bucket', 'current_savings_bucket', 'income_bucket', 'monthly_savings_bucket', 'retirement_age_bucket']
+
+
+def account_params(**overrides):
+    """Account limits and tax assumptions with overrides applied"""
+    unknown = set(overrides) - set(ACCOUNTS)
+    if unknown:
+        raise KeyError(f"Unknown account assumptions: {sorted(unknown)}")
+    a = dict(ACCOUNTS)
+    a.update(overrides)
+    return a
+
+
+def marginal_rate(income, a):
+    """Marginal income + resident tax rate on the last yen of income"""
+    taxable = np.asarray(income, dtype=np.float64) * a['taxable_income_share']
+    limits = np.array([b for b, _ in INCOME_TAX_BRACKETS])
+    rates = np.array([r for _, r in INCOME_TAX_BRACKETS])
+    national = rates[np.searchsorted(limits, taxable)]
+    return national * (1.0 + RECONSTRUCTION_SURTAX) + RESIDENT_TAX
+
+
+def _annuity(t, rate):
+    t = np.maximum(0.0, t)
+    return (np.power(1.0 + rate, t) - 1.0) / rate if rate else t
+
+
+def _stream(t, start, end, amount, rate):
+    """Value at ``t`` of ``amount`` a year paid in from ``start`` to ``end``"""
+    return amount * (_annuity(t - start, rate) - _annuity(t - np.maximum(start, end), rate))
+
+
+def overlay(age, current_savings, monthly_savings, retirement_age, income, elapsed, p, a,
+            use_nisa=True, use_ideco=True):
+    """After-tax account values at ``elapsed`` years (contributions stop at retirement).
+
+    All inputs broadcast.  Returns ``{'nisa', 'ideco', 'taxable', 'total'}``,
+    with ``taxable`` already net of the tax due on unrealised gains.
+    """
+    age, current_savings, monthly_savings, retirement_age, income, elapsed = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in
+          (age, current_savings, monthly_savings, retirement_age, income, elapsed)))
+    r = p['return_rate']
+    tax = a['capital_gains_tax']
+    share = a['distributed_share']
+    r_taxable = r * (1.0 - share * tax)
+
+    horizon = np.maximum(0.0, retirement_age - age)
+    saving = np.minimum(elapsed, horizon)
+    yearly = monthly_savings * 12.0
+
+    # iDeCo runs until ideco_until_age (or retirement); NISA until its lifetime cap
+    ideco_rate = np.minimum(a['ideco_annual'], yearly) if use_ideco else np.zeros_like(yearly)
+    ideco_end = np.clip(a['ideco_until_age'] - age, 0.0, horizon)
+    nisa_early = np.minimum(a['nisa_annual'], yearly - ideco_rate) if use_nisa else np.zeros_like(yearly)
+    nisa_late = np.minimum(a['nisa_annual'], yearly) if use_nisa else np.zeros_like(yearly)
+    cap = float(a['nisa_lifetime'])
+    early_total = nisa_early * ideco_end
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nisa_end = np.where(early_total >= cap, cap / nisa_early,
+                            ideco_end + np.where(nisa_late > 0, (cap - early_total) / nisa_late, np.inf))
+    nisa_end = np.minimum(np.nan_to_num(nisa_end, nan=0.0, posinf=np.inf), horizon)
+
+    # Segments between the breakpoints, each with constant per-account streams
+    first = np.minimum(ideco_end, nisa_end)
+    second = np.maximum(ideco_end, nisa_end)
+    bounds = [(np.zeros_like(first), first), (first, second), (second, horizon)]
+    deduction = marginal_rate(income, a) if a['reinvest_ideco_refund'] else 0.0
+    nisa = np.zeros_like(elapsed)
+    ideco = np.zeros_like(elapsed)
+    taxable = current_savings * np.power(1.0 + r_taxable, elapsed)
+    paid_in = current_savings + 0.0
+    for start, end in bounds:
+        mid = (start + end) / 2.0
+        i = np.where(mid < ideco_end, ideco_rate, 0.0)
+        n = np.where(mid < nisa_end, np.where(mid < ideco_end, nisa_early, nisa_late), 0.0)
+        rest = yearly - i - n + i * deduction
+        ideco += _stream(elapsed, start, end, i, r)
+        nisa += _stream(elapsed, start, end, n, r)
+        taxable += _stream(elapsed, start, end, rest, r_taxable)
+        paid_in += rest * np.clip(np.minimum(saving, end) - start, 0.0, None)
+
+    # Growth not yet taxed: the undistributed part of the accumulated return
+    deferred = np.maximum(0.0, taxable - paid_in) * (1.0 - share) / (1.0 - share * tax)
+    taxable = taxable - tax * deferred
+    return {'nisa': nisa, 'ideco': ideco, 'taxable': taxable, 'total': nisa + ideco + taxable}
+
+
+def _mesh(midpoints):
+    shape = [len(LEVELS[d]) for d in DIMS]
+    out = []
+    for k, d in enumerate(DIMS):
+        s = [1] * len(DIMS)
+        s[k] = shape[k]
+        out.append(np.asarray(midpoints[d], dtype=np.float64).reshape(s))
+    return out
+
+
+def _to_grid(table):
+    shape = [1] * len(GRID_SHAPE)
+    for d in DIMS:
+        shape[axis(d)] = len(LEVELS[d])
+    return np.broadcast_to(table.reshape(shape), GRID_SHAPE).ravel().astype(np.float32)
+
+
+def add_account_columns(grid, assumptions=None, **overrides):
+    """Attach ``after_tax_wealth``, ``value_of_nisa`` and ``value_of_ideco`` (in place).
+
+    Values are at retirement; the value of a wrapper is the after-tax wealth
+    with it minus the same plan without it.
+    """
+    p = model.params(**(assumptions or {}))
+    a = account_params(**overrides)
+    age, savings, income, monthly, retire = _mesh(grid.midpoints)
+    elapsed = retire - age
+    args = (age, savings, monthly, retire, income, elapsed, p, a)
+    both = overlay(*args)['total']
+    grid.columns['after_tax_wealth'] = _to_grid(both)
+    grid.columns['value_of_nisa'] = _to_grid(both - overlay(*args, use_nisa=False)['total'])
+    grid.columns['value_of_ideco'] = _to_grid(both - overlay(*args, use_ideco=False)['total'])
+    return grid
+
+
+def adjusted_timelines(grid, assumptions=None, chunk=100_000, **overrides):
+    """The grid's wealth timelines with after-tax account values at every point.
+
+    Values are computed once per distinct (age, savings, income, monthly,
+    retirement) cell on its timeline layout, then copied into the grid's CSR
+    layout ``chunk`` scenarios at a time.
+    """
+    p = model.params(**(assumptions or {}))
+    a = account_params(**overrides)
+    age, savings, income, monthly, retire = (np.broadcast_to(v, [len(LEVELS[d]) for d in DIMS]).ravel()
+                                             for v in _mesh(grid.midpoints))
+    layouts = [model.timeline_points(x, r, p)[2] for x, r in zip(age, retire)]
+    width = max(len(l) for l in layouts)
+    elapsed = np.zeros((len(age), width))
+    for k, l in enumerate(layouts):
+        elapsed[k, :len(l)] = l
+        elapsed[k, len(l):] = l[-1]
+    table = overlay(age[:, None], savings[:, None], monthly[:, None], retire[:, None], income[:, None],
+                    elapsed, p, a)['total']
+    table = np.floor(table).astype(np.int32)
+
+    tl = grid.timelines
+    wealth = np.empty_like(tl.wealth)
+    cell_shape = [len(LEVELS[d]) for d in DIMS]
+    for first in range(0, len(tl), chunk):
+        rows = np.arange(first, min(first + chunk, len(tl)))
+        codes = np.unravel_index(rows, GRID_SHAPE)
+        cell = np.ravel_multi_index([codes[axis(d)] for d in DIMS], cell_shape)
+        lengths = np.diff(tl.offsets[first:rows[-1] + 2])
+        position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        wealth[tl.offsets[first]:tl.offsets[rows[-1] + 1]] = table[np.repeat(cell, lengths), position]
+    return tl.with_values(wealth)
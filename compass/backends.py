@@ -0,0 +1,562 @@
+"""Interchangeable storage backends for scenario lookups.
+
+Every backend answers the same four questions about the grid:
+
+    get(sk)                     result dict for one ``combo__...`` sort key
+    get_many(sks)               results in the given order
+    cohort(columns, **buckets)  columns of every scenario matching a partial
+                                profile, in grid order
+    timeline(sk)                the scenario's wealth timeline
+
+Unknown keys give None rather than raising, like ``simple_lookup``.  Results
+use the published schema (the dict ``ScenarioGrid.row`` returns) with NaN
+and null both reported as None, so a backend can be swapped without the
+caller noticing anything but latency and memory:
+
+    grid     a loaded ScenarioGrid (dense, dedup, factorized or parametric)
+    arrow    the parquet export held as one in-memory pyarrow Table
+    mmap     the binary snapshot of ``compass.snapshot``, memory-mapped
+    parquet  point reads from the parquet files on disk (row groups cached)
+    s3       the parquet export mirrored from S3 into a local directory
+    s3range  the parquet export on S3 read page by page with range GETs
+    dynamo   DynamoDB through ``dynamo.DynamoLookup``
+    daemon   the resident lookup daemon of ``compass.daemon``, over a Unix socket
+
+``conformance`` compares any backend against a reference one;
+``utils/bench_backends.py`` runs it and measures each backend.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .grid import (DATA_DIR, DIMENSIONS, GRID_SHAPE, GRID_SIZE, LEVEL_MIDPOINTS, LEVELS, MIDPOINT_COLUMNS,
+                   PK_SUFFIX, level_codes, parse_sort_key, sort_key, table_positions)
+
+ROW_GROUP_CACHE = 8         # decoded parquet row groups kept by ParquetBackend
+LOCATOR_FILE = '.locator.npz'
+
+
+def clean(value):
+    """Backend-neutral scalar: NaN and null are None, numpy scalars are Python ones"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def clean_row(result):
+    return None if result is None else {k: clean(v) for k, v in result.items()}
+
+
+# Per dimension: value cast, level -> code, and the stride of that axis in grid order
+_AXES = [(int if d == 'household_size' else str, {v: k for k, v in enumerate(LEVELS[d])},
+          int(np.prod(GRID_SHAPE[j + 1:]))) for j, d in enumerate(DIMENSIONS)]
+
+
+def position(sk):
+    """Grid position of a sort key, None when it names no scenario.
+
+    Same answer as ``flat_index(**parse_sort_key(sk))`` in plain Python, which is
+    ~20x faster for one key than going through numpy.
+    """
+    parts = sk.split('__') if isinstance(sk, str) else ()
+    if len(parts) != len(DIMENSIONS) + 1 or parts[0] != 'combo':
+        return None
+    i = 0
+    for value, (cast, codes, stride) in zip(parts[1:], _AXES):
+        try:
+            i += codes[cast(value)] * stride
+        except (KeyError, ValueError):
+            return None
+    return i
+
+
+def key_at(i):
+    codes = np.unravel_index(i, GRID_SHAPE)
+    return sort_key(**{d: LEVELS[d][c] for d, c in zip(DIMENSIONS, codes)})
+
+
+def key_columns(i):
+    """The columns a sort key determines: ``pk``, ``sk``, buckets and their midpoints"""
+    codes = np.unravel_index(i, GRID_SHAPE)
+    buckets = {d: LEVELS[d][c] for d, c in zip(DIMENSIONS, codes)}
+    sk = sort_key(**buckets)
+    out = {'pk': f"{sk}:{PK_SUFFIX}", 'sk': sk}
+    out.update(buckets)
+    for d, c in zip(DIMENSIONS, codes):
+        if d in MIDPOINT_COLUMNS:
+            out[MIDPOINT_COLUMNS[d]] = LEVEL_MIDPOINTS[d][c]
+    return out
+
+
+def cohort_rows(**buckets):
+    """Grid positions of every scenario matching a partial profile, in grid order"""
+    unknown = set(buckets) - set(DIMENSIONS)
+    if unknown:
+        raise KeyError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+    axes = [np.array([level_codes(d, buckets[d])]) if d in buckets else np.arange(n)
+            for d, n in zip(DIMENSIONS, GRID_SHAPE)]
+    return np.ravel_multi_index(np.ix_(*axes), GRID_SHAPE).ravel()
+
+
+class Backend:
+    """Base class; subclasses implement at least ``get_many``"""
+
+    name = None
+
+    @classmethod
+    def open(cls, **options):
+        return cls(**options)
+
+    def __len__(self):
+        return GRID_SIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def get(self, sk):
+        return self.get_many([sk])[0]
+
+    def get_many(self, sks):
+        raise NotImplementedError
+
+    def lookup(self, **buckets):
+        return self.get(sort_key(**buckets))
+
+    def timeline(self, sk):
+        result = self.get(sk)
+        return None if result is None else result['wealth_timeline']
+
+    def cohort(self, columns, **buckets):
+        """``{'sk': [...], column: [...]}`` over ``cohort_rows(**buckets)``"""
+        sks = [key_at(i) for i in cohort_rows(**buckets)]
+        results = self.get_many(sks)
+        out = {'sk': sks}
+        for name in columns:
+            out[name] = [r.get(name) for r in results]
+        return out
+
+
+class GridBackend(Backend):
+    """Lookups on a ScenarioGrid already in memory (or memory-mapped)"""
+
+    name = 'grid'
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    @classmethod
+    def open(cls, form='dense', **options):
+        import importlib
+        from .server import LOADERS
+        return cls(importlib.import_module(LOADERS[form]).load_grid(**options))
+
+    def get_many(self, sks):
+        positions = [position(sk) for sk in sks]
+        found = [i for i in positions if i is not None]
+        rows = iter(self.grid.rows(found) if found else ())
+        return [None if i is None else clean_row(next(rows)) for i in positions]
+
+    def timeline(self, sk):
+        i = position(sk)
+        return None if i is None else self.grid.timelines.row(i)
+
+    def cohort(self, columns, **buckets):
+        rows = cohort_rows(**buckets)
+        out = {'sk': [key_at(i) for i in rows]}
+        for name in columns:
+            out[name] = [clean(v) for v in self.grid.decoded(name, rows)]
+        return out
+
+
+class MmapBackend(GridBackend):
+    """The binary snapshot (``compass.snapshot``) mapped read-only; opens in milliseconds"""
+
+    name = 'mmap'
+
+    def __init__(self, path=None):
+        from . import snapshot
+        self.path = path or snapshot.SNAPSHOT_DIR
+        super().__init__(snapshot.load_grid(self.path))
+
+    @classmethod
+    def open(cls, path=None, **options):
+        return cls(path)
+
+
+class ArrowBackend(Backend):
+    """The parquet export as one pyarrow Table, indexed by grid position"""
+
+    name = 'arrow'
+
+    def __init__(self, table):
+        # One chunk per column: ``take`` on the 60-file chunked table costs ~150 ms, on this ~0.6 ms
+        self.table = table.combine_chunks()
+        self.rows = np.empty(GRID_SIZE, dtype=np.int64)
+        self.rows[table_positions(table)] = np.arange(len(table))
+
+    @classmethod
+    def open(cls, path=DATA_DIR, **options):
+        from .grid import read_table
+        return cls(read_table(path))
+
+    def get_many(self, sks):
+        found = {i: position(sk) for i, sk in enumerate(sks)}
+        wanted = [i for i, p in found.items() if p is not None]
+        out = [None] * len(sks)
+        if wanted:
+            records = self.table.take(self.rows[[found[i] for i in wanted]]).to_pylist()
+            for i, record in zip(wanted, records):
+                out[i] = clean_row(record)
+        return out
+
+    def timeline(self, sk):
+        i = position(sk)
+        return None if i is None else self.table.column('wealth_timeline')[int(self.rows[i])].as_py()
+
+    def cohort(self, columns, **buckets):
+        rows = cohort_rows(**buckets)
+        data = self.table.select(list(columns)).take(self.rows[rows]).to_pydict()
+        out = {'sk': [key_at(i) for i in rows]}
+        out.update({name: [clean(v) for v in data[name]] for name in columns})
+        return out
+
+
+def _partitions(path, root):
+    """Hive partition values (``key=value`` directories) of a file below ``root``"""
+    parts = os.path.relpath(os.path.dirname(path), root).split(os.sep)
+    return dict(p.split('=', 1) for p in parts if '=' in p)
+
+
+class ParquetBackend(Backend):
+    """Point reads straight from the parquet files, without loading the table.
+
+    Opening reads only the ten bucket columns to locate every scenario (file,
+    row group and row, about 7 bytes per scenario) and caches that locator in
+    ``<path>/.locator.npz`` (pyarrow skips dot files), so later opens take
+    milliseconds.  A lookup decodes the row group holding it; the last
+    ``cache_groups`` decoded groups are kept.
+    """
+
+    name = 'parquet'
+
+    def __init__(self, path=DATA_DIR, cache_groups=ROW_GROUP_CACHE):
+        import pyarrow.dataset as ds
+
+        self.path = path
+        self.files = sorted(ds.dataset(path, format='parquet', partitioning='hive').files)
+        self.partitions = [_partitions(f, path) for f in self.files]
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._file_locks = [threading.Lock() for _ in self.files]
+        self.file, self.group, self.offset = self._locator()
+        self.cache_groups = cache_groups
+        self._groups = OrderedDict()
+
+    def _locator(self):
+        signature = hashlib.sha1(json.dumps(
+            [(os.path.relpath(f, self.path), os.path.getsize(f), os.path.getmtime(f)) for f in self.files]
+        ).encode()).hexdigest()
+        cache = os.path.join(self.path, LOCATOR_FILE)
+        if os.path.exists(cache):
+            saved = np.load(cache)
+            if str(saved['signature']) == signature:
+                return saved['part'], saved['group'], saved['offset']
+
+        import pyarrow as pa
+        file = np.empty(GRID_SIZE, dtype=np.uint16)
+        group = np.empty(GRID_SIZE, dtype=np.uint16)
+        offset = np.empty(GRID_SIZE, dtype=np.uint32)
+        for k in range(len(self.files)):
+            handle = self._handle(k)
+            bucket_columns = [d for d in DIMENSIONS if d in handle.schema_arrow.names]
+            for g in range(handle.metadata.num_row_groups):
+                table = handle.read_row_group(g, columns=bucket_columns)
+                for name, value in self.partitions[k].items():
+                    if name in DIMENSIONS:
+                        table = table.append_column(name, pa.array([value] * len(table)))
+                positions = table_positions(table)
+                file[positions] = k
+                group[positions] = g
+                offset[positions] = np.arange(len(table))
+        try:
+            with open(f"{cache}.tmp", 'wb') as f:
+                np.savez(f, signature=signature, part=file, group=group, offset=offset)
+            os.replace(f"{cache}.tmp", cache)
+        except OSError:
+            pass    # read-only snapshot directory: rebuild on every open
+        return file, group, offset
+
+    def _handle(self, k):
+        import pyarrow.parquet as pq
+        with self._lock:
+            if k not in self._handles:
+                self._handles[k] = pq.ParquetFile(self.files[k])
+            return self._handles[k]
+
+    def _cached(self, key):
+        with self._lock:
+            table = self._groups.get(key)
+            if table is not None:
+                self._groups.move_to_end(key)
+            return table
+
+    def _row_group(self, k, g):
+        """Decoded row group; safe from several threads (the server reads in an executor)"""
+        table = self._cached((k, g))
+        if table is not None:
+            return table
+        # One read at a time per file: its ParquetFile handle is not shared between concurrent reads
+        with self._file_locks[k]:
+            table = self._cached((k, g))    # decoded by another thread while this one waited
+            if table is None:
+                table = self._handle(k).read_row_group(g)
+                with self._lock:
+                    self._groups[(k, g)] = table
+                    while len(self._groups) > self.cache_groups:
+                        self._groups.popitem(last=False)
+        return table
+
+    def get_many(self, sks):
+        by_group = {}
+        for n, sk in enumerate(sks):
+            i = position(sk)
+            if i is not None:
+                by_group.setdefault((int(self.file[i]), int(self.group[i])), []).append((n, int(self.offset[i])))
+        out = [None] * len(sks)
+        for (k, g), wanted in by_group.items():
+            records = self._row_group(k, g).take([o for _, o in wanted]).to_pylist()
+            for (n, _), record in zip(wanted, records):
+                record.update(self.partitions[k])
+                out[n] = clean_row(record)
+        return out
+
+    def cohort(self, columns, **buckets):
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        rows = cohort_rows(**buckets)
+        condition = None
+        for d, value in buckets.items():
+            term = pc.field(d) == (int(value) if d == 'household_size' else str(value))
+            condition = term if condition is None else condition & term
+        dataset = ds.dataset(self.path, format='parquet', partitioning='hive')
+        table = dataset.to_table(columns=list(DIMENSIONS) + [c for c in columns if c not in DIMENSIONS],
+                                 filter=condition)
+        order = np.argsort(table_positions(table))
+        data = table.take(order).to_pydict()
+        out = {'sk': [key_at(i) for i in rows]}
+        out.update({name: [clean(v) for v in data[name]] for name in columns})
+        return out
+
+    def close(self):
+        with self._lock:
+            self._handles.clear()
+            self._groups.clear()
+
+
+def make_s3_client(endpoint_url=None, region_name=None, max_pool_connections=16):
+    """boto3 S3 client; ``endpoint_url`` points it at MinIO or another S3-compatible stand-in"""
+    import boto3
+    from botocore.config import Config
+
+    config = Config(max_pool_connections=max_pool_connections, retries={'mode': 'adaptive', 'max_attempts': 5})
+    return boto3.client('s3', endpoint_url=endpoint_url,
+                        region_name=region_name or os.environ.get('AWS_REGION', 'ap-northeast-1'), config=config)
+
+
+def mirror(client, bucket, prefix, local_dir, workers=8):
+    """Make ``local_dir`` an exact copy of the parquet files under ``s3://bucket/prefix``.
+
+    Objects whose ETag matches the last sync are skipped and local files no
+    longer in the bucket are removed.  Returns download/skip/delete counts.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    manifest_path = os.path.join(local_dir, '.mirror.json')
+    seen = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            seen = json.load(f)
+    objects = {}
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.parquet'):
+                objects[os.path.relpath(obj['Key'], prefix) if prefix else obj['Key']] = obj['ETag']
+
+    todo = [name for name, etag in objects.items()
+            if seen.get(name) != etag or not os.path.exists(os.path.join(local_dir, name))]
+
+    def download(name):
+        target = os.path.join(local_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        client.download_file(bucket, f"{prefix.rstrip('/')}/{name}" if prefix else name, f"{target}.part")
+        os.replace(f"{target}.part", target)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(download, todo))
+    deleted = 0
+    for name in set(seen) - set(objects):
+        if os.path.exists(os.path.join(local_dir, name)):
+            os.remove(os.path.join(local_dir, name))
+            deleted += 1
+    os.makedirs(local_dir, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(objects, f)
+    return {'downloaded': len(todo), 'skipped': len(objects) - len(todo), 'deleted': deleted}
+
+
+class S3MirrorBackend(ParquetBackend):
+    """Parquet point reads on a local mirror of the S3 export (synced when opened)"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', cache_dir='./s3_mirror', client=None, **client_options):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or make_s3_client(**client_options)
+        self.synced = mirror(self.client, bucket, prefix, cache_dir)
+        super().__init__(cache_dir)
+
+
+class S3RangeBackend(Backend):
+    """Point reads on the S3 export by byte range (``compass.s3range``); nothing is mirrored"""
+
+    name = 's3range'
+
+    def __init__(self, bucket, prefix='', index_dir=None, client=None, workers=16, **client_options):
+        from .s3range import INDEX_DIR, S3Parquet
+        self.client = client or make_s3_client(max_pool_connections=workers, **client_options)
+        self.parquet = S3Parquet(self.client, bucket, prefix, index_dir or INDEX_DIR, workers)
+        self.lookups = 0
+
+    def get_many(self, sks):
+        found = [position(sk) for sk in sks]
+        records = iter(self.parquet.read([i for i in found if i is not None]))
+        out = []
+        for i in found:
+            if i is None:
+                out.append(None)
+                continue
+            self.lookups += 1
+            out.append(clean_row(dict(key_columns(i), **next(records))))
+        return out
+
+    def timeline(self, sk):
+        i = position(sk)
+        if i is None:
+            return None
+        self.lookups += 1
+        return self.parquet.read([i], ['wealth_timeline'])[0]['wealth_timeline']
+
+    def stats(self):
+        """Requests and bytes fetched so far, and bytes per scenario read"""
+        stats = dict(self.parquet.reader.stats, lookups=self.lookups)
+        stats['bytes_per_lookup'] = stats['bytes'] / max(self.lookups, 1)
+        return stats
+
+    def close(self):
+        self.parquet.close()
+
+
+class DynamoBackend(Backend):
+    """DynamoDB lookups (``dynamo.DynamoLookup``); cohorts are fetched with BatchGetItem"""
+
+    name = 'dynamo'
+
+    def __init__(self, lookup=None, **options):
+        from .dynamo import DynamoLookup
+        self.lookup_backend = lookup or DynamoLookup(**options)
+
+    def get_many(self, sks):
+        return [clean_row(r) for r in self.lookup_backend.get_many(sks)]
+
+
+class DaemonBackend(Backend):
+    """Lookups answered by the resident lookup daemon (``daemon.DaemonClient``) over a Unix socket"""
+
+    name = 'daemon'
+
+    def __init__(self, client=None, **options):
+        from .daemon import DaemonClient
+        self.client = client or DaemonClient(**options)
+
+    def close(self):
+        self.client.close()
+
+    def get_many(self, sks):
+        return self.client.get_many(sks)
+
+    def timeline(self, sk):
+        return self.client.timelines([sk])[0]
+
+    def cohort(self, columns, **buckets):
+        return self.client.cohort(columns, **buckets)
+
+
+BACKENDS = {cls.name: cls for cls in
+            (GridBackend, MmapBackend, ArrowBackend, ParquetBackend, S3MirrorBackend, S3RangeBackend,
+              DynamoBackend, DaemonBackend)}
+
+
+def open_backend(name, **options):
+    return BACKENDS[name].open(**options)
+
+
+def _differences(got, expected):
+    if isinstance(got, dict) and isinstance(expected, dict):
+        keys = sorted(set(got) | set(expected))
+        return [k for k in keys if got.get(k, '<missing>') != expected.get(k, '<missing>')]
+    return [] if got == expected else ['value']
+
+
+def conformance(backend, reference, samples=50, seed=0):
+    """Every way ``backend`` disagrees with ``reference`` (an empty list when it conforms).
+
+    Checks single and batched gets (order, duplicates, unknown keys),
+    timelines and a cohort scan on ``samples`` random scenarios.
+    """
+    rng = np.random.default_rng(seed)
+    sks = [key_at(i) for i in rng.choice(GRID_SIZE, samples, replace=False)]
+    failures = []
+
+    def check(what, got, expected):
+        diff = _differences(got, expected)
+        if diff:
+            failures.append(f"{what}: differs in {', '.join(map(str, diff[:8]))}")
+
+    check('len', len(backend), len(reference))
+    for sk in sks:
+        check(f"get({sk})", backend.get(sk), reference.get(sk))
+    check('get(unknown)', backend.get('combo__nope'), None)
+    batch = sks[:20] + ['combo__nope'] + sks[:3]
+    got, expected = backend.get_many(batch), reference.get_many(batch)
+    if len(got) != len(expected):
+        failures.append(f"get_many: {len(got)} results for {len(expected)} keys")
+    for sk, g, e in zip(batch, got, expected):
+        check(f"get_many[{sk}]", g, e)
+    for sk in sks[:10]:
+        check(f"timeline({sk})", backend.timeline(sk), reference.timeline(sk))
+
+    # A cohort of a few hundred scenarios: fix all but three dimensions
+    profile = parse_sort_key(sks[0])
+    free = rng.choice(len(DIMENSIONS), 3, replace=False)
+    buckets = {d: v for k, (d, v) in enumerate(profile.items()) if k not in free}
+    columns = ['fire_percentage', 'projected_wealth', 'fire_grade']
+    got, expected = backend.cohort(columns, **buckets), reference.cohort(columns, **buckets)
+    for name in ['sk'] + columns:
+        check(f"cohort[{name}]", got.get(name), expected.get(name))
+    return failures
@@ -0,0 +1,40 @@
+"""Cohort statistics straight off the dense grid.
+
+Every cohort ("people in their 30s earning ¥4.5M") is a slab of the grid, so
+a statistic per cohort is one reduction over the axes not grouped by.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .grid import DIMENSIONS, GRID_SHAPE, LEVELS, axis
+
+
+def cohort_table(grid, values, by, reduce=np.mean, name=None):
+    """``reduce`` of ``values`` over every axis not in ``by``, as a DataFrame.
+
+    ``values`` is a column name or a flat per-scenario array; NaNs propagate
+    unless ``reduce`` ignores them (e.g. ``np.nanmean``).
+    """
+    if isinstance(values, str):
+        name = name or values
+        values = grid.columns[values]
+    by = [d for d in DIMENSIONS if d in by]
+    other = tuple(axis(d) for d in DIMENSIONS if d not in by)
+    reduced = reduce(np.asarray(values).reshape(GRID_SHAPE), axis=other)
+    rows = list(itertools.product(*(LEVELS[d] for d in by)))
+    frame = pd.DataFrame(rows, columns=by)
+    frame[name or 'value'] = np.asarray(reduced).ravel()
+    return frame
+
+
+def money_runs_out(grid, by, ages=(80, 90, 100)):
+    """Share of each cohort whose savings are exhausted before each age"""
+    depletion = grid.columns['depletion_age']
+    frame = None
+    for age in ages:
+        table = cohort_table(grid, depletion < age, by, name=f'runs_out_before_{age}')
+        frame = table if frame is None else frame.merge(table, on=[d for d in DIMENSIONS if d in by])
+    return frame
@@ -0,0 +1,300 @@
+"""Resident lookup daemon on a Unix domain socket.
+
+One process owns the scenario data (any ``compass.backends`` backend, the
+mmap snapshot by default) and answers lookups for any number of Streamlit or
+API workers on the same box, which then hold no data and start in
+milliseconds.  Frames are binary: a 9-byte header, then a ``marshal`` body
+(plain dicts, lists, strings and numbers; unlike pickle it cannot run code):
+
+    header  uint32 body length, uint32 request id, uint8 op (request) or
+            status (response: 0 ok, 1 error with a message body), big-endian
+    GET       [sk, ...]                -> [result dict or None, ...]
+    TIMELINE  [sk, ...]                -> [timeline or None, ...]
+    COHORT    (columns, {dim: level})  -> {'sk': [...], column: [...]}
+    STATS     None                     -> daemon counters
+
+A client may pipeline: send many frames before reading, then match the
+responses by request id (they come back in order per connection).  The
+daemon batches concurrent lookups: every GET that arrives in the same event
+loop turn, over all connections, is answered by one ``get_many`` on the
+unique keys, which the grid backends serve with one gather per column.
+
+    python -m compass.daemon [--socket /tmp/pfm-compass.sock] [--backend mmap]
+
+``DaemonClient`` is the client, and ``backends.DaemonBackend`` (``PFM_BACKEND=daemon``
+in the app) wraps it as a backend.  ``utils/bench_daemon.py`` compares it with
+in-process lookups.
+"""
+
+import argparse
+import asyncio
+import itertools
+import marshal
+import os
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+HEADER = struct.Struct('!IIB')
+OP_GET, OP_TIMELINE, OP_COHORT, OP_STATS = 1, 2, 3, 4
+OPS = {OP_GET: 'get', OP_TIMELINE: 'timeline', OP_COHORT: 'cohort', OP_STATS: 'stats'}
+OK, ERROR = 0, 1
+SOCKET_PATH = os.environ.get('PFM_DAEMON_SOCKET', os.path.join(tempfile.gettempdir(), 'pfm-compass.sock'))
+MAX_FRAME = 64 << 20         # bytes; larger requests close the connection
+MAX_BATCH = 4096             # pending requests that force a flush before the loop turn ends
+HIGH_WATER = 1 << 20         # unsent response bytes after which a connection stops being read
+
+
+class DaemonError(Exception):
+    """The daemon answered a request with an error"""
+
+
+class LookupDaemon:
+    """Answers framed requests from many connections, batching the GETs of each loop turn"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.pending = []
+        self._scheduled = False
+        self.started_at = time.monotonic()
+        self.counters = {'connections': 0, 'active': 0, 'requests': 0, 'lookups': 0, 'unique_lookups': 0,
+                         'batches': 0, 'max_batch': 0, 'errors': 0}
+
+    async def handle(self, reader, writer):
+        self.counters['connections'] += 1
+        self.counters['active'] += 1
+        try:
+            while True:
+                length, rid, op = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if length > MAX_FRAME:
+                    break
+                self.submit(writer, rid, op, await reader.readexactly(length))
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # CancelledError: shutting down; ending quietly keeps asyncio from logging every open connection
+            pass
+        finally:
+            self.counters['active'] -= 1
+            writer.close()
+
+    def submit(self, writer, rid, op, body):
+        try:
+            args = marshal.loads(body)
+            if op in (OP_GET, OP_TIMELINE) and not (isinstance(args, list) and all(isinstance(k, str) for k in args)):
+                raise DaemonError(f"{OPS[op]} expects a list of sort keys")
+        except (EOFError, ValueError, TypeError, DaemonError) as e:
+            args = e
+        self.pending.append((writer, rid, op, args))
+        self.counters['requests'] += 1
+        if len(self.pending) >= MAX_BATCH:
+            self.flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        """Answer everything pending, with one ``get_many`` for all of its GET keys"""
+        self._scheduled = False
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        requested = [sk for _, _, op, args in batch if op == OP_GET and isinstance(args, list) for sk in args]
+        unique = list(dict.fromkeys(requested))
+        found = dict(zip(unique, self.backend.get_many(unique))) if unique else {}
+        self.counters['lookups'] += len(requested)
+        self.counters['unique_lookups'] += len(unique)
+        self.counters['batches'] += 1
+        self.counters['max_batch'] = max(self.counters['max_batch'], len(batch))
+        for writer, rid, op, args in batch:
+            try:
+                if isinstance(args, Exception):
+                    raise args
+                status, body = OK, marshal.dumps(self.answer(op, args, found))
+            except Exception as e:
+                self.counters['errors'] += 1
+                status, body = ERROR, marshal.dumps(f"{type(e).__name__}: {e}")
+            if not writer.is_closing():
+                writer.write(HEADER.pack(len(body), rid, status) + body)
+
+    def answer(self, op, args, found):
+        if op == OP_GET:
+            return [found[sk] for sk in args]
+        if op == OP_TIMELINE:
+            return [self.backend.timeline(sk) for sk in args]
+        if op == OP_COHORT:
+            columns, buckets = args
+            return self.backend.cohort(list(columns), **buckets)
+        if op == OP_STATS:
+            return self.stats()
+        raise DaemonError(f"Unknown op {op}")
+
+    def stats(self):
+        c = dict(self.counters, backend=self.backend.name, uptime_s=round(time.monotonic() - self.started_at, 1))
+        c['mean_batch'] = round(c['lookups'] / c['batches'], 2) if c['batches'] else 0.0
+        return c
+
+
+def _claim(path):
+    """Remove a stale socket file; refuse to start over a live daemon"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise DaemonError(f"A daemon is already listening on {path}")
+    finally:
+        probe.close()
+
+
+async def serve(backend, path=SOCKET_PATH):
+    """Listen on ``path`` until cancelled (SIGTERM/SIGINT), then remove the socket"""
+    daemon = LookupDaemon(backend)
+    _claim(path)
+    server = await asyncio.start_unix_server(daemon.handle, path)
+    os.chmod(path, 0o660)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, asyncio.current_task().cancel)
+    print(f"🧭 Lookup daemon ({backend.name}) listening on {path}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class DaemonClient:
+    """Blocking client; each thread gets its own connection, opened on first use"""
+
+    def __init__(self, path=SOCKET_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            for part in reversed(conn):
+                part.close()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for sock, stream in connections:
+            stream.close()
+            sock.close()
+        self._local = threading.local()
+
+    def send(self, op, args=None):
+        """Send one request without waiting for the answer; returns its request id"""
+        rid = next(self._ids) & 0xFFFFFFFF
+        body = marshal.dumps(args)
+        self._connection()[0].sendall(HEADER.pack(len(body), rid, op) + body)
+        return rid
+
+    def receive(self):
+        """Next ``(request id, value)`` on this thread's connection"""
+        stream = self._connection()[1]
+        header = stream.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ConnectionError('Lookup daemon closed the connection')
+        length, rid, status = HEADER.unpack(header)
+        value = marshal.loads(stream.read(length))
+        if status != OK:
+            raise DaemonError(value)
+        return rid, value
+
+    def call(self, op, args=None):
+        for attempt in (0, 1):
+            try:
+                rid = self.send(op, args)
+                got, value = self.receive()
+                break
+            except (ConnectionError, BrokenPipeError):
+                # The daemon restarted: reconnect once
+                self._drop()
+                if attempt:
+                    raise
+        if got != rid:
+            self._drop()
+            raise DaemonError(f"Response {got} does not answer request {rid}")
+        return value
+
+    def get(self, sk):
+        return self.call(OP_GET, [sk])[0]
+
+    def get_many(self, sks):
+        return self.call(OP_GET, list(sks))
+
+    def timelines(self, sks):
+        return self.call(OP_TIMELINE, list(sks))
+
+    def cohort(self, columns, **buckets):
+        return self.call(OP_COHORT, (list(columns), buckets))
+
+    def stats(self):
+        return self.call(OP_STATS)
+
+    def pipelined(self, sks, depth=32):
+        """``get`` of each key as its own request, keeping up to ``depth`` requests in flight"""
+        out = [None] * len(sks)
+        slots = {}
+        for k, sk in enumerate(sks):
+            if len(slots) >= depth:
+                rid, value = self.receive()
+                out[slots.pop(rid)] = value[0]
+            slots[self.send(OP_GET, [sk])] = k
+        while slots:
+            rid, value = self.receive()
+            out[slots.pop(rid)] = value[0]
+        return out
+
+
+def main():
+    from .backends import BACKENDS, open_backend
+
+    parser = argparse.ArgumentParser(description='PFM Compass lookup daemon (Unix domain socket)')
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--backend', choices=sorted(set(BACKENDS) - {'daemon'}), default='mmap')
+    parser.add_argument('--form', default=None, help='grid form for --backend grid (dense, dedup, ...)')
+    args = parser.parse_args()
+    if args.backend == 'mmap':
+        from . import snapshot
+        snapshot.ensure()
+    options = {'form': args.form} if args.form else {}
+    started = time.perf_counter()
+    backend = open_backend(args.backend, **options)
+    print(f"📦 {args.backend} backend open in {time.perf_counter() - started:.2f}s", flush=True)
+    try:
+        asyncio.run(serve(backend, args.socket))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Content-addressed deduplication of grid results and timelines.
+
+Most outputs ignore several bucket dimensions (``gender``, ``marital_status``
+and ``household_size`` never change a wealth timeline), so the 1.38M rows
+hold far fewer distinct results.  Whole result rows and the timelines are
+keyed by content: every distinct result tuple (or whole timeline) is stored
+once and each row keeps a small integer reference to it, the narrowest dtype
+that fits.  The columns become views over the tuple table that share that
+one reference array, so lookups go through one extra indirection.
+
+Keys are the raw bytes of a value (a timeline's points, a row's result
+tuple), compared exactly rather than through a lossy hash, so deduplication
+can never merge two different values.
+"""
+
+import numpy as np
+
+from .grid import LazyTimelines, VirtualColumn, load_grid as _load_grid
+
+
+def ref_dtype(count):
+    """Narrowest unsigned dtype able to index ``count`` values"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if count <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def _keys(matrix):
+    """One opaque bytes key per row of a 2-D array"""
+    matrix = np.ascontiguousarray(matrix)
+    return matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+
+class DedupColumn(VirtualColumn):
+    """A column stored as distinct ``values`` plus per-row ``refs``; indexes like an ndarray"""
+
+    def __init__(self, values, refs):
+        self.values = values
+        self.refs = refs
+
+    @classmethod
+    def build(cls, column):
+        values, refs = np.unique(_keys(column.reshape(-1, 1)), return_inverse=True)
+        values = values.view(column.dtype)
+        return cls(values, refs.ravel().astype(ref_dtype(len(values))))
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, index):
+        return self.values[self.refs[index]]
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.values[self.refs]
+        return out if dtype is None else out.astype(dtype)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.refs.nbytes
+
+    def astype(self, dtype):
+        return self.values.astype(dtype)[self.refs]
+
+
+class ResultTuples:
+    """Distinct result rows stored once: ``values[name]`` per column, one per-row ``refs`` for all"""
+
+    def __init__(self, values, refs):
+        self.values = values
+        self.refs = refs
+
+    @classmethod
+    def build(cls, columns):
+        """``columns`` maps names to equal-length 1-D arrays"""
+        raw = np.concatenate([np.ascontiguousarray(c).reshape(len(c), 1).view(np.uint8) for c in columns.values()],
+                             axis=1)
+        _, first, refs = np.unique(_keys(raw), return_index=True, return_inverse=True)
+        return cls({name: c[first] for name, c in columns.items()}, refs.ravel().astype(ref_dtype(len(first))))
+
+    def __len__(self):
+        return len(next(iter(self.values.values())))
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self.values.values()) + self.refs.nbytes
+
+    def column(self, name):
+        return TupleColumn(self.values[name], self.refs, len(self.values))
+
+
+class TupleColumn(DedupColumn):
+    """One column of a ``ResultTuples`` table; its ``refs`` are shared with the table's other columns"""
+
+    def __init__(self, values, refs, sharers):
+        super().__init__(values, refs)
+        self.sharers = sharers
+
+    @property
+    def nbytes(self):
+        # Each column carries its share of the common refs, so the grid total counts them once
+        return self.values.nbytes + self.refs.nbytes // self.sharers
+
+
+class DedupTimelines(LazyTimelines):
+    """Timelines stored once per distinct content, rows point at them through ``refs``"""
+
+    def __init__(self, unique, refs):
+        self.unique = unique
+        self.refs = refs
+
+    @classmethod
+    def build(cls, timelines):
+        lengths = np.diff(timelines.offsets)
+        refs = np.empty(len(lengths), dtype=np.int64)
+        found = []
+        count = 0
+        # Only timelines of the same length can be equal: key each length group by its points
+        for length in np.unique(lengths):
+            rows = np.flatnonzero(lengths == length)
+            points = timelines.offsets[rows][:, None] + np.arange(length)
+            matrix = np.concatenate([timelines.age[points], timelines.wealth[points], timelines.year[points]], axis=1)
+            _, first, inverse = np.unique(_keys(matrix), return_index=True, return_inverse=True)
+            refs[rows] = count + inverse.ravel()
+            count += len(first)
+            found.append(rows[first])
+        representatives = np.concatenate(found)
+        return cls(timelines.take(representatives), refs.astype(ref_dtype(len(representatives))))
+
+    def __len__(self):
+        return len(self.refs)
+
+    @property
+    def nbytes(self):
+        return self.unique.nbytes + self.refs.nbytes
+
+    def row(self, i):
+        return self.unique.row(int(self.refs[i]))
+
+    def take(self, rows):
+        return self.unique.take(self.refs[np.asarray(rows)].astype(np.int64))
+
+    def materialize(self):
+        return self.take(np.arange(len(self)))
+
+
+def deduplicate(grid, columns=None):
+    """Replace the grid's columns and timelines by deduplicated ones (in place).
+
+    Returns ``(grid, report)``; the report has a ``result_tuple`` entry for
+    the table of distinct result rows, one entry per column (distinct values
+    and its share of the bytes) and ``wealth_timeline``, each with the row
+    and distinct counts, ``ratio`` (rows per distinct value) and bytes
+    before/after.
+    """
+    report = {}
+    names = [n for n in (columns or list(grid.columns)) if not isinstance(grid.columns[n], VirtualColumn)]
+    if names:
+        before = {name: grid.columns[name].nbytes for name in names}
+        tuples = ResultTuples.build({name: np.asarray(grid.columns[name]) for name in names})
+        report['result_tuple'] = _entry(len(grid), len(tuples), sum(before.values()),
+                                        tuples.nbytes)
+        for name in names:
+            grid.columns[name] = tuples.column(name)
+            distinct = len(np.unique(tuples.values[name]))
+            report[name] = _entry(len(grid), distinct, before[name], grid.columns[name].nbytes)
+    if grid.timelines is not None and not isinstance(grid.timelines, LazyTimelines):
+        before = grid.timelines.nbytes
+        grid.timelines = DedupTimelines.build(grid.timelines)
+        report['wealth_timeline'] = _entry(len(grid), len(grid.timelines.unique), before, grid.timelines.nbytes)
+    return grid, report
+
+
+def _entry(rows, distinct, before, after):
+    return {'rows': rows, 'distinct': distinct, 'ratio': rows / max(distinct, 1),
+            'bytes_before': before, 'bytes_after': after}
+
+
+def format_report(report):
+    """Plain-text table of a ``deduplicate`` report"""
+    lines = [f"{'column':<28}{'distinct':>10}{'ratio':>10}{'MB before':>11}{'MB after':>10}"]
+    for name, e in report.items():
+        sizes = (f"{e['bytes_before'] / 1e6:>11.2f}{e['bytes_after'] / 1e6:>10.2f}"
+                 if e['bytes_before'] is not None else f"{'-':>11}{'-':>10}")
+        lines.append(f"{name:<28}{e['distinct']:>10,}{e['ratio']:>9.0f}x{sizes}")
+    return '\n'.join(lines)
+
+
+def load_grid(*args, **kwargs):
+    """``grid.load_grid`` followed by ``deduplicate``; returns only the grid"""
+    return deduplicate(_load_grid(*args, **kwargs))[0]
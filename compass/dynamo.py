@@ -0,0 +1,318 @@
+"""DynamoDB copy of the scenario grid.
+
+Items use the published key schema: ``pk`` (``<sk>:<PK_SUFFIX>``) as the
+partition key and ``sk`` (``combo__...``) as the sort key, with every result
+column and the wealth timeline (a list of maps) as attributes.  Items are
+written in the low-level attribute-value format directly, which avoids
+boto3's Decimal round trip.
+
+``export`` streams the grid in fixed segments of rows through a thread pool
+of ``BatchWriteItem`` workers sharing one pooled client.  Unprocessed items
+are retried with jittered exponential backoff that grows while DynamoDB
+keeps throttling and resets once a batch goes through.  Finished segments
+are recorded in a JSON checkpoint, so an interrupted export resumes where it
+stopped.
+
+``DynamoLookup`` is the read side: a ``simple_lookup``-compatible backend
+that keeps no table in memory, only a bounded LRU of recent profiles, and
+fetches neighbour/comparison sets with ``BatchGetItem``.
+
+boto3 is imported lazily; point ``endpoint_url`` at DynamoDB Local (or run
+under moto) to test without AWS.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .grid import DIMENSIONS, GRID_SIZE, LEVELS, PK_SUFFIX, flat_index, sort_key
+
+TABLE_NAME = 'pfm_compass_retirement_predictions'
+BATCH_SIZE = 25             # BatchWriteItem limit
+GET_BATCH_SIZE = 100        # BatchGetItem limit
+CACHE_SIZE = 4096           # profiles kept by DynamoLookup
+SEGMENT_ROWS = 10_000       # rows per checkpointed unit of work
+MAX_ATTEMPTS = 10
+BASE_DELAY = 0.05           # seconds
+MAX_DELAY = 5.0
+
+
+def make_client(endpoint_url=None, region_name=None, max_pool_connections=16):
+    """boto3 DynamoDB client with a connection pool sized for the worker threads"""
+    import boto3
+    from botocore.config import Config
+
+    config = Config(max_pool_connections=max_pool_connections, retries={'mode': 'adaptive', 'max_attempts': 5})
+    return boto3.client('dynamodb', endpoint_url=endpoint_url,
+                        region_name=region_name or os.environ.get('AWS_REGION', 'ap-northeast-1'), config=config)
+
+
+def create_table(client, table=TABLE_NAME):
+    """On-demand table with the ``pk``/``sk`` key schema (no-op if it exists)"""
+    if table in client.list_tables().get('TableNames', []):
+        return
+    client.create_table(
+        TableName=table, BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'},
+                              {'AttributeName': 'sk', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+    )
+    client.get_waiter('table_exists').wait(TableName=table)
+
+
+def key(sk):
+    """Primary key of a scenario in attribute-value format"""
+    return {'pk': {'S': f"{sk}:{PK_SUFFIX}"}, 'sk': {'S': sk}}
+
+
+def to_attribute(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return {'NULL': True}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float)):
+        return {'N': repr(value)}
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, dict):
+        return {'M': {k: to_attribute(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [to_attribute(v) for v in value]}
+    if hasattr(value, 'item'):
+        return to_attribute(value.item())
+    return {'S': str(value)}
+
+
+def from_attribute(attribute):
+    (kind, value), = attribute.items()
+    if kind == 'N':
+        return int(value) if value.lstrip('-').isdigit() else float(value)
+    if kind == 'NULL':
+        return None
+    if kind == 'M':
+        return {k: from_attribute(v) for k, v in value.items()}
+    if kind == 'L':
+        return [from_attribute(v) for v in value]
+    return value
+
+
+def to_item(result):
+    """DynamoDB item for a result dict (``grid.row`` / ``simple_lookup`` shape)"""
+    return {name: to_attribute(value) for name, value in result.items()}
+
+
+def from_item(item):
+    """Result dict back from an item; NaN columns come back as None"""
+    return {name: from_attribute(value) for name, value in item.items()}
+
+
+def write_batch(client, table, items, stats=None):
+    """``BatchWriteItem`` up to 25 items, retrying unprocessed ones with adaptive backoff"""
+    requests = [{'PutRequest': {'Item': item}} for item in items]
+    delay = BASE_DELAY
+    for attempt in range(MAX_ATTEMPTS):
+        response = client.batch_write_item(RequestItems={table: requests})
+        requests = response.get('UnprocessedItems', {}).get(table, [])
+        if not requests:
+            return
+        if stats is not None:
+            stats.add('retried', len(requests))
+        # Full jitter; the ceiling doubles for as long as DynamoDB keeps pushing back
+        time.sleep(random.uniform(0, delay))
+        delay = min(MAX_DELAY, delay * 2)
+    raise RuntimeError(f"{len(requests)} items still unprocessed after {MAX_ATTEMPTS} attempts")
+
+
+class _Stats:
+    def __init__(self):
+        self.counts = {'written': 0, 'retried': 0}
+        self.lock = threading.Lock()
+
+    def add(self, name, n):
+        with self.lock:
+            self.counts[name] += n
+
+
+def _segments(start, stop, size):
+    return [(s, min(s + size, stop)) for s in range(start, stop, size)]
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return {tuple(s) for s in json.load(f)['done']}
+    return set()
+
+
+def save_checkpoint(path, done):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'done': sorted(done), 'updated': time.time()}, f)
+    os.replace(tmp, path)
+
+
+def export_segment(grid, client, table, start, stop, stats):
+    batch = []
+    for i in range(start, stop):
+        batch.append(to_item(grid.row(i)))
+        if len(batch) == BATCH_SIZE:
+            write_batch(client, table, batch, stats)
+            stats.add('written', len(batch))
+            batch = []
+    if batch:
+        write_batch(client, table, batch, stats)
+        stats.add('written', len(batch))
+
+
+def export(grid, client, table=TABLE_NAME, workers=8, checkpoint=None, start=0, stop=GRID_SIZE,
+           segment_rows=SEGMENT_ROWS, progress=None):
+    """Write grid rows ``start:stop`` to ``table``; returns a report dict.
+
+    ``checkpoint`` is a JSON file of finished segments; segments already in it
+    are skipped.  ``progress(report)`` is called after every segment.
+    """
+    done = load_checkpoint(checkpoint)
+    todo = [s for s in _segments(start, stop, segment_rows) if s not in done]
+    stats = _Stats()
+    started = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - started
+        return dict(stats.counts, seconds=elapsed, items_per_second=stats.counts['written'] / max(elapsed, 1e-9),
+                    segments_done=len(done), segments_total=len(_segments(start, stop, segment_rows)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(export_segment, grid, client, table, a, b, stats): (a, b) for a, b in todo}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                segment = pending.pop(future)
+                future.result()
+                done.add(segment)
+                if checkpoint:
+                    save_checkpoint(checkpoint, done)
+                if progress:
+                    progress(report())
+    return report()
+
+
+def verify(grid, client, table=TABLE_NAME, rows=()):
+    """Rows whose DynamoDB item differs from the grid (NaN compared as missing)"""
+    bad = []
+    for i in rows:
+        expected = from_item(to_item(grid.row(int(i))))
+        sk = sort_key(**grid.buckets(int(i)))
+        item = client.get_item(TableName=table, Key=key(sk)).get('Item')
+        if item is None or from_item(item) != expected:
+            bad.append(int(i))
+    return bad
+
+
+class DynamoLookup:
+    """Scenario lookups served from DynamoDB through a bounded in-process LRU.
+
+    Thread-safe: Streamlit sessions can share one instance (and its pooled
+    client).  Missing profiles return None, like ``simple_lookup``.
+    """
+
+    def __init__(self, table=TABLE_NAME, client=None, cache_size=CACHE_SIZE, **client_options):
+        self.table = table
+        self.client = client or make_client(**client_options)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        # The table holds one item per grid cell
+        return GRID_SIZE
+
+    def _cached(self, sk):
+        with self._lock:
+            result = self._cache.get(sk)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._cache.move_to_end(sk)
+            return result
+
+    def _remember(self, sk, result):
+        with self._lock:
+            self._cache[sk] = result
+            self._cache.move_to_end(sk)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, sk):
+        """Result dict for one sort key (None if the table has no such item)"""
+        result = self._cached(sk)
+        if result is None:
+            item = self.client.get_item(TableName=self.table, Key=key(sk)).get('Item')
+            if item is None:
+                return None
+            result = from_item(item)
+            self._remember(sk, result)
+        return result
+
+    def lookup(self, **buckets):
+        return self.get(sort_key(**buckets))
+
+    def get_many(self, sks):
+        """Results for many sort keys, in order, with one ``BatchGetItem`` per 100 uncached keys"""
+        found = {sk: self._cached(sk) for sk in dict.fromkeys(sks)}
+        missing = [sk for sk, result in found.items() if result is None]
+        for start in range(0, len(missing), GET_BATCH_SIZE):
+            keys = [key(sk) for sk in missing[start:start + GET_BATCH_SIZE]]
+            for item in self._batch_get(keys):
+                result = from_item(item)
+                found[result['sk']] = result
+                self._remember(result['sk'], result)
+        return [found[sk] for sk in sks]
+
+    def _batch_get(self, keys):
+        delay = BASE_DELAY
+        for attempt in range(MAX_ATTEMPTS):
+            response = self.client.batch_get_item(RequestItems={self.table: {'Keys': keys}})
+            yield from response.get('Responses', {}).get(self.table, [])
+            keys = response.get('UnprocessedKeys', {}).get(self.table, {}).get('Keys', [])
+            if not keys:
+                return
+            time.sleep(random.uniform(0, delay))
+            delay = min(MAX_DELAY, delay * 2)
+        raise RuntimeError(f"{len(keys)} keys still unprocessed after {MAX_ATTEMPTS} attempts")
+
+    def neighbours(self, dims=None, **buckets):
+        """``{dim: {level: result}}`` for every profile one level away along ``dims``"""
+        flat_index(**buckets)  # validates the profile
+        wanted = []
+        for dim in dims or DIMENSIONS:
+            code = LEVELS[dim].index(type(LEVELS[dim][0])(buckets[dim]))
+            for c in (code - 1, code + 1):
+                if 0 <= c < len(LEVELS[dim]):
+                    wanted.append((dim, LEVELS[dim][c], sort_key(**dict(buckets, **{dim: LEVELS[dim][c]}))))
+        results = self.get_many([sk for _, _, sk in wanted])
+        out = {}
+        for (dim, level, _), result in zip(wanted, results):
+            out.setdefault(dim, {})[level] = result
+        return out
+
+    def cache_info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache), 'max_size': self.cache_size}
+
+
+def simple_lookup(backend, age_bucket, current_savings_bucket, expected_expenses_bucket,
+                  gender, household_size, housing_status, income_bucket,
+                  marital_status, monthly_savings_bucket, retirement_age_bucket):
+    """Drop-in for the apps' ``simple_lookup(df, ...)`` with a ``DynamoLookup`` in place of ``df``"""
+    return backend.lookup(
+        age_bucket=age_bucket, current_savings_bucket=current_savings_bucket,
+        expected_expenses_bucket=expected_expenses_bucket, gender=gender, household_size=household_size,
+        housing_status=housing_status, income_bucket=income_bucket, marital_status=marital_status,
+        monthly_savings_bucket=monthly_savings_bucket, retirement_age_bucket=retirement_age_bucket)
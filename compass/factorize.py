@@ -0,0 +1,181 @@
+"""Functional-dependency discovery and factorised storage of the grid.
+
+Most outputs depend on a few of the ten bucket dimensions (``fire_number``
+only on expenses), yet every column is stored for all 1.38M rows.  A column
+does not depend on a dimension when it is invariant along that grid axis,
+i.e. every slice equals the first one.  Checking each axis on the stored
+values gives the minimal set of dimensions for each column, straight from
+the data; ``recompute.SPECS`` declares what the model expects, and the
+report shows both side by side.
+
+A factorised column keeps only its lower-dimensional table (the first slice
+along every axis it ignores) and gathers from it at lookup time.  Timelines
+are factorised the same way through their content references
+(``dedup.DedupTimelines``), giving one stored timeline per key.
+"""
+
+import numpy as np
+
+from . import recompute
+from .dedup import DedupTimelines
+from .grid import DIMENSIONS, GRID_SHAPE, GRID_SIZE, LazyTimelines, VirtualColumn, axis, load_grid as _load_grid
+
+
+def invariant(values, dim):
+    """Whether grid-shaped ``values`` are the same along ``dim``'s axis"""
+    k = axis(dim)
+    first = values.take([0], axis=k)
+    same = values == first
+    if values.dtype.kind == 'f':
+        same |= np.isnan(values) & np.isnan(first)
+    return bool(same.all())
+
+
+def dependencies(values):
+    """Minimal bucket dimensions a flat grid column depends on"""
+    values = np.asarray(values).reshape(GRID_SHAPE)
+    return [d for d in DIMENSIONS if not invariant(values, d)]
+
+
+def _table(values, dims):
+    """The column restricted to ``dims`` (first level of every other axis)"""
+    values = np.asarray(values).reshape(GRID_SHAPE)
+    index = tuple(slice(None) if d in dims else 0 for d in DIMENSIONS)
+    return np.ascontiguousarray(values[index])
+
+
+def _cells(dims, rows):
+    codes = np.unravel_index(np.asarray(rows), GRID_SHAPE)
+    return tuple(codes[axis(d)] for d in dims)
+
+
+class FactorColumn(VirtualColumn):
+    """A column stored as a table over the dimensions it depends on"""
+
+    def __init__(self, table, dims):
+        self.table = table
+        self.dims = list(dims)
+
+    @classmethod
+    def build(cls, values, dims=None):
+        dims = dependencies(values) if dims is None else dims
+        return cls(_table(values, dims), dims)
+
+    def __getitem__(self, index):
+        return self.table[_cells(self.dims, index)]
+
+    def __array__(self, dtype=None, copy=None):
+        shape = [1] * len(GRID_SHAPE)
+        for d in self.dims:
+            shape[axis(d)] = GRID_SHAPE[axis(d)]
+        out = np.broadcast_to(self.table.reshape(shape), GRID_SHAPE).ravel()
+        return out if dtype is None else out.astype(dtype)
+
+    @property
+    def dtype(self):
+        return self.table.dtype
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+
+class FactorTimelines(LazyTimelines):
+    """One timeline per cell of ``dims``; ``keys`` maps each cell to a row of ``unique``"""
+
+    def __init__(self, unique, keys, dims):
+        self.unique = unique
+        self.keys = keys
+        self.dims = list(dims)
+
+    @classmethod
+    def build(cls, timelines):
+        content = timelines if isinstance(timelines, DedupTimelines) else DedupTimelines.build(timelines)
+        dims = dependencies(content.refs)
+        return cls(content.unique, _table(content.refs, dims), dims)
+
+    def __len__(self):
+        return GRID_SIZE
+
+    @property
+    def nbytes(self):
+        return self.unique.nbytes + self.keys.nbytes
+
+    def row(self, i):
+        return self.unique.row(int(self.keys[_cells(self.dims, i)]))
+
+    def take(self, rows):
+        return self.unique.take(self.keys[_cells(self.dims, rows)].astype(np.int64))
+
+    def materialize(self):
+        return self.take(np.arange(GRID_SIZE))
+
+
+def discover(grid):
+    """``{column: discovered dims}`` for every column, plus ``wealth_timeline``"""
+    found = {name: dependencies(values) for name, values in grid.columns.items()}
+    if grid.timelines is not None:
+        refs = (grid.timelines.refs if isinstance(grid.timelines, DedupTimelines)
+                else DedupTimelines.build(grid.timelines).refs)
+        found['wealth_timeline'] = dependencies(refs)
+    return found
+
+
+def declared(name):
+    """Dimensions the model declares for a column (None when it has no spec)"""
+    if name == 'wealth_timeline':
+        return list(recompute.TIMELINE_DIMS)
+    if name in recompute.SPEC_BY_NAME:
+        return recompute.column_dims(name)
+    return None
+
+
+def factorize(grid):
+    """Store every column (and the timelines) in factorised form (in place).
+
+    Returns ``(grid, report)`` with, per column, the discovered ``dims``, the
+    ``declared`` ones, the number of stored ``cells`` and bytes before/after.
+    """
+    report = {}
+    for name in list(grid.columns):
+        values = grid.columns[name]
+        if isinstance(values, FactorColumn):
+            continue
+        before = values.nbytes
+        grid.columns[name] = FactorColumn.build(values)
+        report[name] = _entry(grid.columns[name].dims, declared(name), grid.columns[name].table.size,
+                              before, grid.columns[name].nbytes)
+    if grid.timelines is not None and not isinstance(grid.timelines, FactorTimelines):
+        before = (grid.timelines.nbytes if not isinstance(grid.timelines, LazyTimelines)
+                  else None)
+        grid.timelines = FactorTimelines.build(grid.timelines)
+        report['wealth_timeline'] = _entry(grid.timelines.dims, declared('wealth_timeline'),
+                                           grid.timelines.keys.size, before, grid.timelines.nbytes)
+    return grid, report
+
+
+def _entry(dims, expected, cells, before, after):
+    return {'dims': dims, 'declared': expected, 'cells': cells, 'bytes_before': before, 'bytes_after': after}
+
+
+def format_report(report):
+    """Plain-text table of a ``factorize`` report"""
+    short = {d: d.replace('_bucket', '') for d in DIMENSIONS}
+    lines = [f"{'column':<28}{'cells':>9}{'KB after':>10}{'MB before':>11}  depends on"]
+    total_before = total_after = 0
+    for name, e in report.items():
+        note = ''
+        if e['declared'] is not None and set(e['declared']) != set(e['dims']):
+            note = f"  (model declares {', '.join(short[d] for d in e['declared']) or 'none'})"
+        before = f"{e['bytes_before'] / 1e6:>11.2f}" if e['bytes_before'] is not None else f"{'-':>11}"
+        lines.append(f"{name:<28}{e['cells']:>9,}{e['bytes_after'] / 1e3:>10.1f}{before}  "
+                     f"{', '.join(short[d] for d in e['dims']) or '-'}{note}")
+        total_before += e['bytes_before'] or 0
+        total_after += e['bytes_after']
+    lines.append(f"{'total':<28}{'':>9}{total_after / 1e3:>10.1f}{total_before / 1e6:>11.2f}")
+    return '\n'.join(lines)
+
+
+def load_grid(*args, **kwargs):
+    """``grid.load_grid`` followed by ``factorize``; returns only the grid"""
+    return factorize(_load_grid(*args, **kwargs))[0]
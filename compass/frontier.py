@@ -0,0 +1,63 @@
+"""Goal-seek frontier tables: how much to save, how much you can spend.
+
+For every combination of the other nine dimensions we store
+
+* the lowest ``monthly_savings_bucket`` from which the plan is green
+  (and the lowest from which it is at least yellow), and
+* the highest ``expected_expenses_bucket`` up to which it stays green.
+
+Each table is one cumulative reduction along a single grid axis, so the
+tables have the grid's shape with that axis dropped and answering a profile
+is one indexed read.  The reduction is a running "ok at this level and every
+level beyond it", so a threshold is only reported where it really holds all
+the way up (savings) or all the way down (expenses).
+"""
+
+import numpy as np
+
+from .grid import CATEGORIES, DIMENSIONS, GRID_SHAPE, LEVELS, axis, level_codes
+
+NOT_REACHABLE = -1
+
+# name -> (axis solved for, worst acceptable status, direction the goal holds in)
+FRONTIERS = {
+    'min_savings_for_green': ('monthly_savings_bucket', 'green', +1),
+    'min_savings_for_yellow': ('monthly_savings_bucket', 'yellow', +1),
+    'max_expenses_for_green': ('expected_expenses_bucket', 'green', -1),
+}
+
+
+def frontier_table(status, dim, worst, direction):
+    """Threshold level code on ``dim`` for every combination of the other axes.
+
+    ``direction=+1`` gives the lowest level from which every higher level is
+    acceptable, ``-1`` the highest level below which every level is.
+    ``NOT_REACHABLE`` where no level qualifies.
+    """
+    ax = axis(dim)
+    ok = np.asarray(status).reshape(GRID_SHAPE) <= CATEGORIES['status_color'].index(worst)
+    if direction > 0:
+        holds = np.flip(np.logical_and.accumulate(np.flip(ok, ax), axis=ax), ax)
+        count = holds.sum(axis=ax, dtype=np.int8)
+        return np.where(count > 0, len(LEVELS[dim]) - count, NOT_REACHABLE).astype(np.int8)
+    holds = np.logical_and.accumulate(ok, axis=ax)
+    return (holds.sum(axis=ax, dtype=np.int8) - 1).astype(np.int8)
+
+
+def frontier_tables(grid):
+    """All ``FRONTIERS`` for a grid snapshot, as ``{name: int8 ndarray}``"""
+    status = grid.columns['status_color']
+    return {name: frontier_table(status, *spec) for name, spec in FRONTIERS.items()}
+
+
+def goal_seek(tables, **buckets):
+    """Frontier levels for one profile (the solved-for bucket itself is ignored).
+
+    Returns ``{name: level label or None}``.
+    """
+    result = {}
+    for name, (dim, _, _) in FRONTIERS.items():
+        index = tuple(level_codes(d, buckets[d]) for d in DIMENSIONS if d != dim)
+        code = int(tables[name][index])
+        result[name] = None if code == NOT_REACHABLE else LEVELS[dim][code]
+    return result
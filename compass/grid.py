@@ -0,0 +1,458 @@
+"""Dense in-memory layout of the 1.38M retirement scenario grid.
+
+Every scenario is one cell of a 10-D grid whose axes are the bucket
+dimensions that make up the DynamoDB sort key (``combo__...``).  Columns are
+kept as flat numpy arrays in C order over those axes, so a profile lookup is
+an index computation instead of a string filter over the whole table, and any
+column can be viewed as an ndarray of shape ``GRID_SHAPE``.
+"""
+
+import os
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_ROOT, 'data', 'pfm_compass_data', 'raw_parquet')
+
+# Axis order follows the sort key: combo__{age}__{savings}__{expenses}__...
+DIMENSIONS = [
+    'age_bucket',
+    'current_savings_bucket',
+    'expected_expenses_bucket',
+    'gender',
+    'household_size',
+    'housing_status',
+    'income_bucket',
+    'marital_status',
+    'monthly_savings_bucket',
+    'retirement_age_bucket',
+]
+
+# Levels in the same (ordinal) order as BUCKET_MAPPINGS in the apps
+LEVELS = {
+    'age_bucket': ['20-29', '30-34', '35-39', '40-44', '45-49', '50'],
+    'current_savings_bucket': ['a', 'b', 'c', 'd', 'e'],
+    'expected_expenses_bucket': ['a', 'b', 'c', 'd', 'e', 'f'],
+    'gender': ['m', 'f'],
+    'household_size': [1, 2, 3, 4],
+    'housing_status': ['rent', 'own_paying', 'own_paid', 'planning'],
+    'income_bucket': ['a', 'b', 'c', 'd', 'e'],
+    'marital_status': ['s', 'm'],
+    'monthly_savings_bucket': ['a', 'b', 'c', 'd', 'e', 'f'],
+    'retirement_age_bucket': ['50-59', '60-64', '65', '70'],
+}
+
+# Bucket dimension -> numeric midpoint column carried in the data
+MIDPOINT_COLUMNS = {
+    'age_bucket': 'age_midpoint',
+    'current_savings_bucket': 'current_savings_midpoint',
+    'expected_expenses_bucket': 'expected_expenses_midpoint',
+    'income_bucket': 'income_midpoint',
+    'monthly_savings_bucket': 'monthly_savings_midpoint',
+    'retirement_age_bucket': 'retirement_age_midpoint',
+}
+
+# Midpoint values per level, as published in the v4 snapshot
+LEVEL_MIDPOINTS = {
+    'age_bucket': [24.5, 32.0, 37.0, 42.0, 47.0, 52.0],
+    'current_savings_bucket': [500_000, 3_000_000, 10_000_000, 32_500_000, 75_000_000],
+    'expected_expenses_bucket': [125_000, 175_500, 225_500, 300_500, 400_500, 500_000],
+    'income_bucket': [2_500_000, 4_500_000, 7_500_000, 10_500_000, 15_000_000],
+    'monthly_savings_bucket': [50_000, 150_000, 250_000, 400_000, 625_000, 875_000],
+    'retirement_age_bucket': [54.5, 62.0, 67.0, 72.0],
+}
+
+GRID_SHAPE = tuple(len(LEVELS[d]) for d in DIMENSIONS)
+GRID_SIZE = int(np.prod(GRID_SHAPE))
+
+# Categorical output columns are held as small integer codes
+CATEGORIES = {
+    'fire_grade': ['A+', 'A', 'B', 'C', 'F'],
+    'traditional_grade': ['A+', 'A', 'B', 'C', 'F'],
+    'status_color': ['green', 'yellow', 'red'],
+}
+
+# Columns that hold one value for the whole snapshot
+SNAPSHOT_COLUMNS = ['calculated_at', 'expires_at', 'version', 'execution_date']
+
+PK_SUFFIX = 'pfm_compass_retirement_predictions_v4_fixed'
+
+_LEVEL_INDEX = {d: {v: i for i, v in enumerate(levels)} for d, levels in LEVELS.items()}
+
+
+def axis(dim):
+    """Position of a bucket dimension in the grid"""
+    return DIMENSIONS.index(dim)
+
+
+def level_codes(dim, values):
+    """Map bucket values (scalar or array) to their level index along ``dim``"""
+    cast = int if dim == 'household_size' else str
+    index = _LEVEL_INDEX[dim]
+    if np.ndim(values) == 0:
+        try:
+            return np.asarray(index[cast(values)], dtype=np.int64)    # 0-d, like the array path
+        except (KeyError, ValueError):
+            raise KeyError(f"Unknown {dim} value: {values!r}") from None
+    values = np.asarray(values, dtype=object)
+    uniques, inverse = np.unique(values.ravel(), return_inverse=True)
+    try:
+        codes = np.array([index[cast(v)] for v in uniques], dtype=np.int64)
+    except (KeyError, ValueError) as e:
+        raise KeyError(f"Unknown {dim} value: {e}") from None
+    return codes[inverse].reshape(values.shape)
+
+
+def flat_index(**buckets):
+    """Grid position of a profile given all ten bucket values"""
+    codes = [level_codes(d, buckets[d]) for d in DIMENSIONS]
+    return np.ravel_multi_index(codes, GRID_SHAPE)
+
+
+def sort_key(**buckets):
+    """DynamoDB sort key for a profile, same format as ``simple_lookup``"""
+    return 'combo__' + '__'.join(str(buckets[d]) for d in DIMENSIONS)
+
+
+def parse_sort_key(sk):
+    """Bucket dict from a ``combo__...`` sort key (values are validated by ``flat_index``)"""
+    parts = sk.split('__')
+    if parts[0] != 'combo' or len(parts) != len(DIMENSIONS) + 1:
+        raise KeyError(f"Not a scenario sort key: {sk!r}")
+    return dict(zip(DIMENSIONS, parts[1:]))
+
+
+def midpoint_mesh(dims, midpoints=None):
+    """Open mesh of level midpoints: one broadcastable array per dimension.
+
+    Axes not listed in ``dims`` have length 1, so a function evaluated on the
+    mesh is computed once per distinct input combination and broadcasts over
+    the rest of the grid.
+    """
+    midpoints = midpoints or LEVEL_MIDPOINTS
+    mesh = {}
+    for d in dims:
+        shape = [1] * len(DIMENSIONS)
+        shape[axis(d)] = len(LEVELS[d])
+        mesh[d] = np.asarray(midpoints[d], dtype=np.float64).reshape(shape)
+    return mesh
+
+
+class Timelines:
+    """Wealth timelines in CSR layout: row ``i`` owns ``offsets[i]:offsets[i+1]``"""
+
+    VALUE = 'wealth'   # key of the value in ``row`` dicts
+
+    def __init__(self, offsets, age, wealth, year):
+        self.offsets = offsets
+        self.age = age
+        self.wealth = wealth
+        self.year = year
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.offsets, self.age, self.wealth, self.year))
+
+    def row(self, i):
+        """Timeline of one scenario as the list-of-dicts shape the apps expect"""
+        s = slice(self.offsets[i], self.offsets[i + 1])
+        return [{'age': int(a), self.VALUE: int(w), 'year': int(y)}
+                for a, w, y in zip(self.age[s], self.wealth[s], self.year[s])]
+
+    def rows(self, indices):
+        """``row`` for many scenarios, gathering each array once"""
+        part = self.take(indices)
+        offsets = part.offsets.tolist()
+        age, value, year = (np.asarray(a).astype(np.int64).tolist() for a in (part.age, part.wealth, part.year))
+        return [[{'age': a, self.VALUE: w, 'year': y}
+                 for a, w, y in zip(age[lo:hi], value[lo:hi], year[lo:hi])]
+                for lo, hi in zip(offsets[:-1], offsets[1:])]
+
+    def with_values(self, values):
+        """Same points with new values (e.g. after-tax or real wealth)"""
+        return type(self)(self.offsets, self.age, values, self.year)
+
+    def take(self, rows):
+        """New Timelines holding ``rows`` in the given order"""
+        rows = np.asarray(rows)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=self.offsets.dtype)
+        np.cumsum(lengths, out=offsets[1:])
+        src = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return type(self)(offsets, self.age[src], self.wealth[src], self.year[src])
+
+
+class VirtualColumn:
+    """A grid column kept in a compact form that indexes like a flat ndarray.
+
+    Subclasses implement ``__getitem__``, ``__array__``, ``dtype`` and ``nbytes``.
+    """
+
+    def __len__(self):
+        return GRID_SIZE
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    def reshape(self, *shape):
+        return np.asarray(self).reshape(*shape)
+
+    def astype(self, dtype):
+        return np.asarray(self).astype(dtype)
+
+    def copy(self):
+        return np.asarray(self)
+
+
+class LazyTimelines(Timelines):
+    """Timelines kept in a compact form; subclasses implement ``row``, ``take`` and ``materialize``.
+
+    The plain CSR arrays are only built (and cached) when code asks for the
+    whole grid at once.
+    """
+
+    _full = None
+
+    def materialize(self):
+        raise NotImplementedError
+
+    def rows(self, indices):
+        return [self.row(int(i)) for i in indices]
+
+    def full(self):
+        if self._full is None:
+            self._full = self.materialize()
+        return self._full
+
+    def with_values(self, values):
+        return self.full().with_values(values)
+
+    @property
+    def offsets(self):
+        return self.full().offsets
+
+    @property
+    def age(self):
+        return self.full().age
+
+    @property
+    def wealth(self):
+        return self.full().wealth
+
+    @property
+    def year(self):
+        return self.full().year
+
+
+class ScenarioGrid:
+    """All scenarios of one snapshot, columns stored flat in grid order"""
+
+    def __init__(self, columns, timelines, meta=None, midpoints=None):
+        self.columns = columns
+        self.timelines = timelines
+        self.meta = dict(meta or {})
+        self.midpoints = dict(midpoints or LEVEL_MIDPOINTS)
+
+    def __len__(self):
+        return GRID_SIZE
+
+    @property
+    def nbytes(self):
+        total = sum(a.nbytes for a in self.columns.values())
+        return total + (self.timelines.nbytes if self.timelines is not None else 0)
+
+    def column(self, name):
+        """View of a column as an ndarray of shape ``GRID_SHAPE``"""
+        return self.columns[name].reshape(GRID_SHAPE)
+
+    def decoded(self, name, rows=None):
+        """Column values with categorical codes mapped back to labels"""
+        values = self.columns[name] if rows is None else self.columns[name][rows]
+        if name in CATEGORIES:
+            return np.asarray(CATEGORIES[name], dtype=object)[values]
+        return values
+
+    def lookup(self, **buckets):
+        """Result dict for one profile, the same shape ``simple_lookup`` returns"""
+        i = int(flat_index(**buckets))
+        return self.row(i)
+
+    def row(self, i):
+        buckets = self.buckets(i)
+        key = sort_key(**buckets)
+        result = {'pk': f"{key}:{PK_SUFFIX}", 'sk': key}
+        result.update(buckets)
+        for dim, col in MIDPOINT_COLUMNS.items():
+            result[col] = self.midpoints[dim][LEVELS[dim].index(buckets[dim])]
+        for name, values in self.columns.items():
+            value = values[i]
+            if name in CATEGORIES:
+                value = CATEGORIES[name][value]
+            result[name] = value.item() if hasattr(value, 'item') else value
+        if self.timelines is not None:
+            result['wealth_timeline'] = self.timelines.row(i)
+        result.update(self.meta)
+        return result
+
+    def rows(self, indices):
+        """``row`` for many positions, with one gather per column instead of one per value"""
+        indices = np.asarray(indices, dtype=np.int64)
+        codes = [c.tolist() for c in np.unravel_index(indices, GRID_SHAPE)]
+        labels = [[LEVELS[d][c] for c in dim_codes] for d, dim_codes in zip(DIMENSIONS, codes)]
+        midpoints = {col: [self.midpoints[dim][c] for c in codes[DIMENSIONS.index(dim)]]
+                     for dim, col in MIDPOINT_COLUMNS.items()}
+        columns = {}
+        for name, values in self.columns.items():
+            taken = np.asarray(values[indices])
+            if name in CATEGORIES:
+                taken = np.asarray(CATEGORIES[name], dtype=object)[taken]
+            columns[name] = taken.tolist()
+        timelines = self.timelines.rows(indices) if self.timelines is not None else None
+        out = []
+        for k in range(len(indices)):
+            buckets = {d: labels[j][k] for j, d in enumerate(DIMENSIONS)}
+            key = sort_key(**buckets)
+            result = {'pk': f"{key}:{PK_SUFFIX}", 'sk': key}
+            result.update(buckets)
+            for col, values in midpoints.items():
+                result[col] = values[k]
+            for name, values in columns.items():
+                result[name] = values[k]
+            if timelines is not None:
+                result['wealth_timeline'] = timelines[k]
+            result.update(self.meta)
+            out.append(result)
+        return out
+
+    def buckets(self, i):
+        codes = np.unravel_index(i, GRID_SHAPE)
+        return {d: LEVELS[d][c] for d, c in zip(DIMENSIONS, codes)}
+
+    @classmethod
+    def from_table(cls, table):
+        """Build from a pyarrow Table of the published dataset (any row order)"""
+        import pyarrow.compute as pc
+
+        positions = table_positions(table)
+        if len(positions) != GRID_SIZE or np.bincount(positions, minlength=GRID_SIZE).max() != 1:
+            raise ValueError(f"Expected one row per grid cell ({GRID_SIZE:,}), got {len(positions):,} rows")
+        order = np.empty(GRID_SIZE, dtype=np.int64)
+        order[positions] = np.arange(GRID_SIZE)
+
+        skip = set(DIMENSIONS) | set(MIDPOINT_COLUMNS.values()) | {'pk', 'sk', 'wealth_timeline'}
+        columns, meta = {}, {}
+        for name in table.column_names:
+            if name in skip:
+                continue
+            col = table.column(name)
+            if name in SNAPSHOT_COLUMNS:
+                meta[name] = col[0].as_py()
+                continue
+            if name in CATEGORIES:
+                values = pc.index_in(col, value_set=_pa_levels(name)).to_numpy(zero_copy_only=False)
+                values = values.astype(np.int8)
+            else:
+                values = col.to_numpy()
+            columns[name] = values[order]
+
+        timelines = None
+        if 'wealth_timeline' in table.column_names:
+            tl = table.column('wealth_timeline').combine_chunks()
+            points = tl.flatten()
+            timelines = Timelines(
+                tl.offsets.to_numpy().astype(np.int64),
+                points.field('age').to_numpy(),
+                points.field('wealth').to_numpy(),
+                points.field('year').to_numpy(),
+            ).take(order)
+        return cls(columns, timelines, meta)
+
+    def to_table(self):
+        """pyarrow Table in the published schema, rows in grid order"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        codes = np.unravel_index(np.arange(GRID_SIZE), GRID_SHAPE)
+        arrays = {}
+        key_parts = []
+        for d, c in zip(DIMENSIONS, codes):
+            labels = pa.array([str(v) for v in LEVELS[d]])
+            key_parts.append(pa.DictionaryArray.from_arrays(c.astype(np.int8), labels).cast(pa.string()))
+        sk = pc.binary_join_element_wise(pa.array(['combo'] * GRID_SIZE), *key_parts, '__')
+        arrays['pk'] = pc.binary_join_element_wise(sk, pa.array([PK_SUFFIX] * GRID_SIZE), ':')
+        arrays['sk'] = sk
+        for d, c, part in zip(DIMENSIONS, codes, key_parts):
+            if d == 'household_size':
+                arrays[d] = pa.array(np.asarray(LEVELS[d], dtype=np.int32)[c])
+            else:
+                arrays[d] = part
+            if d in MIDPOINT_COLUMNS:
+                values = np.asarray(self.midpoints[d])[c]
+                arrays[MIDPOINT_COLUMNS[d]] = pa.array(values.astype(np.float64 if d in ('age_bucket', 'retirement_age_bucket') else np.int32))
+        for name, values in self.columns.items():
+            values = np.asarray(values)
+            if name in CATEGORIES:
+                arrays[name] = pa.DictionaryArray.from_arrays(values, pa.array(CATEGORIES[name])).cast(pa.string())
+            else:
+                arrays[name] = pa.array(values)
+        if self.timelines is not None:
+            tl = self.timelines
+            points = pa.StructArray.from_arrays(
+                [pa.array(tl.age), pa.array(tl.wealth), pa.array(tl.year)], names=['age', 'wealth', 'year'])
+            arrays['wealth_timeline'] = pa.ListArray.from_arrays(pa.array(tl.offsets.astype(np.int32)), points)
+        for name, value in self.meta.items():
+            arrays[name] = pa.array([value] * GRID_SIZE)
+        return pa.table(arrays)
+
+
+def table_positions(table):
+    """Grid position of every row of a pyarrow Table carrying the bucket columns"""
+    import pyarrow.compute as pc
+
+    codes = []
+    for d in DIMENSIONS:
+        col = table.column(d)
+        if d == 'household_size':
+            codes.append(np.searchsorted(LEVELS[d], col.to_numpy()))
+        else:
+            codes.append(pc.index_in(col, value_set=_pa_levels(d)).to_numpy(zero_copy_only=False))
+    return np.ravel_multi_index(codes, GRID_SHAPE)
+
+
+def _pa_levels(name):
+    import pyarrow as pa
+    labels = CATEGORIES.get(name) or LEVELS[name]
+    return pa.array([str(v) for v in labels])
+
+
+def read_table(path=DATA_DIR, columns=None, progress=None):
+    """Read the partitioned parquet snapshot, restoring the partition columns.
+
+    ``progress(stage, fraction)`` is called as record batches arrive.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    if progress is None:
+        return dataset.to_table(columns=columns)
+    total = dataset.count_rows()
+    batches, done = [], 0
+    for batch in dataset.to_batches(columns=columns):
+        batches.append(batch)
+        done += batch.num_rows
+        progress('reading', done / total)
+    return pa.Table.from_batches(batches)
+
+
+def load_grid(path=DATA_DIR, columns=None, progress=None):
+    """Load the snapshot into a ScenarioGrid"""
+    table = read_table(path, columns, progress)
+    if progress is not None:
+        progress('indexing', 1.0)
+    return ScenarioGrid.from_table(table)
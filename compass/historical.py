@@ -0,0 +1,144 @@
+"""Sequence-of-returns risk from historical market paths.
+
+Instead of the grid's fixed return, every scenario is replayed against real
+return sequences: one for each historical start year (the rolling window,
+wrapping around the end of the series) plus block-bootstrapped sequences
+stitched from random runs of consecutive years.  A sequence "survives" if
+the savings built up until retirement then cover expenses (less pension)
+every year up to ``horizon_age``.
+
+The bundled series is S&P 500 total returns (``data/returns/annual_returns.csv``).
+By default its log-returns are re-centred on the model's ``return_rate``, so
+only the order and dispersion of historical years matter, not the US equity
+premium; pass ``recenter=False`` to use the raw series.
+
+Work is sharded by ``age_bucket`` over a process pool; each shard is the
+5-D slab of the other inputs the survival rate depends on.  Within a shard
+the savings phase (which ignores expenses and income) runs once per
+retirement age, and the drawdown is a few in-place array updates per year.
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import model
+from .grid import GRID_SHAPE, LEVELS, REPO_ROOT, axis
+
+RETURNS_FILE = os.path.join(REPO_ROOT, 'data', 'returns', 'annual_returns.csv')
+BLOCK_YEARS = 5
+BOOTSTRAP_SAMPLES = 400
+SEED = 0
+
+# Inputs of the survival rate, in grid order
+DIMS = ['age_bucket', 'current_savings_bucket', 'expected_expenses_bucket',
+        'income_bucket', 'monthly_savings_bucket', 'retirement_age_bucket']
+
+
+def load_returns(path=RETURNS_FILE):
+    """``(years, returns)`` with returns as fractions (0.05 = 5%)"""
+    data = np.loadtxt(path, delimiter=',', skiprows=3, comments='#')
+    return data[:, 0].astype(int), data[:, 1] / 100.0
+
+
+def sequences(returns, length, block=BLOCK_YEARS, samples=BOOTSTRAP_SAMPLES, seed=SEED,
+              recenter_to=None):
+    """Return sequences of ``length`` years, shaped ``(sequences, length)``.
+
+    Rows are every rolling historical start year, then ``samples`` circular
+    block-bootstrap draws of ``block`` consecutive years each.
+    """
+    log_returns = np.log1p(np.asarray(returns, dtype=np.float64))
+    if recenter_to is not None:
+        log_returns = log_returns - log_returns.mean() + np.log1p(recenter_to)
+    n = len(log_returns)
+    steps = np.arange(length)
+    rolling = (np.arange(n)[:, None] + steps[None, :]) % n
+
+    rng = np.random.default_rng(seed)
+    blocks = -(-length // block)
+    starts = rng.integers(0, n, size=(samples, blocks))
+    boot = ((starts[:, :, None] + np.arange(block)[None, None, :]) % n).reshape(samples, -1)[:, :length]
+    return np.expm1(log_returns[np.concatenate([rolling, boot])])
+
+
+def survival_rate(age, retirement_age, current_savings, monthly_savings, expenses, income, p, paths):
+    """Share of return ``paths`` on which the savings last to ``horizon_age``.
+
+    ``age`` and ``retirement_age`` are scalars; the other inputs broadcast
+    against each other.  ``paths`` is ``(sequences, years)``: the first years
+    (the last one possibly partial) grow the savings until retirement, then
+    each following year runs the same drawdown as ``model.drawdown``.
+    """
+    savings_years = max(0.0, retirement_age - age)
+    dt = np.diff(np.append(np.arange(0.0, savings_years, 1.0), savings_years))
+    growth = 1.0 + paths
+
+    # Accumulation only depends on savings and contributions
+    current_savings = np.asarray(current_savings, dtype=np.float64)[..., None]
+    monthly_savings = np.asarray(monthly_savings, dtype=np.float64)[..., None]
+    wealth = np.broadcast_to(current_savings, np.broadcast_shapes(current_savings.shape, monthly_savings.shape))
+    for k, step in enumerate(dt):
+        wealth = wealth * growth[:, k] ** step + model.wealth_at(step, 0.0, monthly_savings, p)
+
+    spend = np.asarray(expenses, dtype=np.float64)[..., None] * 12.0
+    pension = model.annual_pension(np.asarray(income, dtype=np.float64), retirement_age, p)[..., None]
+    shape = np.broadcast_shapes(wealth.shape, spend.shape, pension.shape)
+    balance = np.broadcast_to(wealth, shape).copy()
+    alive = np.ones(shape, dtype=bool)
+    drawdown_years = int(np.ceil(p['horizon_age'] - retirement_age))
+    for j in range(drawdown_years):
+        need = spend - pension if retirement_age + j >= p['pension_age'] else spend
+        # Depleted paths keep being updated but can never become alive again
+        balance -= need
+        alive &= balance >= 0
+        balance *= growth[:, len(dt) + j]
+    return alive.mean(axis=-1)
+
+
+def path_length(midpoints, p):
+    """Years of returns needed by the longest-lived scenario"""
+    ages = np.asarray(midpoints['age_bucket'], dtype=np.float64)
+    retire = np.asarray(midpoints['retirement_age_bucket'], dtype=np.float64)
+    return int(np.ceil(retire.max() - ages.min()) + np.ceil(p['horizon_age'] - retire.min()))
+
+
+def _shard(level, midpoints, p, paths):
+    """Survival rates for one age level over the other five inputs"""
+    def mesh(d):
+        shape = [1] * 4
+        shape[['current_savings_bucket', 'expected_expenses_bucket', 'income_bucket',
+               'monthly_savings_bucket'].index(d)] = len(LEVELS[d])
+        return np.asarray(midpoints[d], dtype=np.float64).reshape(shape)
+    age = float(midpoints['age_bucket'][level])
+    rates = [survival_rate(age, float(retire), mesh('current_savings_bucket'), mesh('monthly_savings_bucket'),
+                           mesh('expected_expenses_bucket'), mesh('income_bucket'), p, paths)
+             for retire in midpoints['retirement_age_bucket']]
+    return np.stack(rates, axis=-1).astype(np.float32)
+
+
+def survival_table(midpoints, assumptions=None, workers=None, recenter=True, **sequence_options):
+    """Survival rate over the six input axes, shape ``(age, savings, expenses, income, monthly, retirement)``"""
+    p = model.params(**(assumptions or {}))
+    _, returns = load_returns()
+    paths = sequences(returns, path_length(midpoints, p),
+                      recenter_to=p['return_rate'] if recenter else None, **sequence_options)
+    levels = range(len(LEVELS['age_bucket']))
+    if workers == 1:
+        shards = [_shard(level, midpoints, p, paths) for level in levels]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(functools.partial(_shard, midpoints=midpoints, p=p, paths=paths), levels))
+    return np.stack(shards)
+
+
+def add_survival_rate(grid, assumptions=None, workers=None, **options):
+    """Attach the per-scenario ``survival_rate`` column (in place)"""
+    table = survival_table(grid.midpoints, assumptions, workers, **options)
+    shape = [1] * len(GRID_SHAPE)
+    for d in DIMS:
+        shape[axis(d)] = len(LEVELS[d])
+    grid.columns['survival_rate'] = np.broadcast_to(table.reshape(shape), GRID_SHAPE).ravel().copy()
+    return grid
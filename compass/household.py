@@ -0,0 +1,85 @@
+"""Joint household plan from two member profiles.
+
+Each member is looked up in the grid on their own buckets; both rows, and
+both stored wealth timelines, are read with a single gather per column.
+The timelines are aligned on the union of their calendar years and added:
+between a member's stored points their wealth is interpolated linearly, and
+after their last point (their retirement) it grows at the return rate only.
+The household is "retired" once both members are, and its FIRE number is
+the sum of the members' FIRE numbers, or covers ``household_expenses`` when
+the household shares one budget.
+"""
+
+import numpy as np
+
+from . import model
+from .grid import flat_index
+
+MEMBER_COLUMNS = ['projected_wealth', 'fire_number', 'fire_percentage', 'traditional_retirement_age',
+                  'status_color', 'fire_grade']
+
+
+def align(years, member_years, member_wealth, return_rate):
+    """A member's stored wealth at ``years``: linear between points, growth only after the last one"""
+    wealth = np.interp(years, member_years, member_wealth)
+    after = years > member_years[-1]
+    wealth[after] = member_wealth[-1] * (1.0 + return_rate) ** (years[after] - member_years[-1])
+    return wealth
+
+
+def joint_plan(grid, member_a, member_b, household_expenses=None, assumptions=None):
+    """Household projection for two member bucket dicts.
+
+    ``household_expenses`` is the monthly spend of the household in
+    retirement; by default the target is the two members' stored FIRE
+    numbers added.  The stored timelines already reflect the default
+    assumptions, so ``assumptions`` only sets the post-retirement growth and
+    the FIRE multiple applied to ``household_expenses``.  Returns
+    ``{'members', 'timeline', 'fire_number', 'retirement_year',
+    'projected_wealth', 'fire_percentage', 'fire_grade', 'fire_year'}``.
+    """
+    if grid.timelines is None:
+        raise ValueError('A joint plan needs a grid with wealth timelines')
+    p = model.params(**(assumptions or {}))
+    rows = np.array([flat_index(**member_a), flat_index(**member_b)], dtype=np.int64)
+    gathered = {name: grid.decoded(name, rows) for name in MEMBER_COLUMNS}
+    members = [{name: values[k].item() if hasattr(values[k], 'item') else values[k]
+                for name, values in gathered.items()} for k in range(2)]
+
+    part = grid.timelines.take(rows)
+    offsets = np.asarray(part.offsets)
+    stored = [tuple(np.asarray(a[offsets[k]:offsets[k + 1]], dtype=dtype)
+                    for a, dtype in ((part.year, np.int64), (part.age, np.int64), (part.wealth, np.float64)))
+              for k in range(2)]
+
+    if household_expenses is None:
+        target = float(sum(m['fire_number'] for m in members))
+    else:
+        target = float(model.fire_number(household_expenses, p))
+
+    # Both members' timeline years; the last one is when the later member retires
+    years = np.union1d(stored[0][0], stored[1][0])
+    wealth = np.stack([align(years, y, w, p['return_rate']) for y, _, w in stored])
+    total = wealth.sum(axis=0)
+    final = float(total[-1])
+    percentage = float(model.fire_percentage(final, target))
+    reached = np.flatnonzero(total >= target)
+
+    timeline = {
+        'year': years.tolist(),
+        'age_a': (stored[0][1][0] + years - stored[0][0][0]).tolist(),
+        'age_b': (stored[1][1][0] + years - stored[1][0][0]).tolist(),
+        'wealth_a': np.floor(wealth[0]).tolist(),
+        'wealth_b': np.floor(wealth[1]).tolist(),
+        'wealth': np.floor(total).tolist(),
+    }
+    return {
+        'members': members,
+        'timeline': timeline,
+        'fire_number': target,
+        'retirement_year': int(years[-1]),
+        'projected_wealth': final,
+        'fire_percentage': percentage,
+        'fire_grade': model.GRADE_LABELS[int(model.fire_grade(percentage))],
+        'fire_year': int(years[reached[0]]) if len(reached) else None,
+    }
@@ -0,0 +1,196 @@
+"""Housing cash flows driven by ``housing_status``.
+
+Yearly housing cost from today's age to ``horizon_age``:
+
+* ``rent``: a share of income, for life;
+* ``own_paid``: upkeep and property tax on the home;
+* ``own_paying``: the rest of a mortgage taken out ``years_owned`` ago, plus upkeep;
+* ``planning``: rent for ``years_to_purchase`` years, then the down payment,
+  a new mortgage and upkeep.
+
+Home prices are ``price_to_income`` x income.  ``prepay_years`` pays any
+mortgage off that many years early (the outstanding balance is re-amortised
+over the shorter term), which answers "what if I pay it off 5 years early".
+
+Costs depend only on age, income and housing status, so the whole grid has
+just 120 distinct timelines.  They are built as one 2-D array expression and
+kept in the same CSR layout as wealth timelines; scenarios map onto them
+through ``scenario_keys``.
+"""
+
+import numpy as np
+
+from . import model
+from .grid import GRID_SHAPE, GRID_SIZE, LEVELS, Timelines, axis
+
+HOUSING = {
+    'rent_share': 0.25,          # rent as a share of income
+    'price_to_income': 5.0,      # home price in years of income
+    'down_payment': 0.10,        # share of the price paid upfront
+    'mortgage_rate': 0.015,      # fixed annual rate
+    'mortgage_years': 35,
+    'years_owned': 5,            # how long ago 'own_paying' households bought
+    'years_to_purchase': 3,      # when 'planning' households buy
+    'upkeep': 0.01,              # maintenance and property tax, share of price per year
+    'prepay_years': 0,           # pay mortgages off this many years early
+}
+
+KEY_DIMS = ['age_bucket', 'housing_status', 'income_bucket']
+
+
+class CostTimelines(Timelines):
+    """Housing-cost timelines; ``wealth`` holds the yearly cost in yen"""
+
+    VALUE = 'cost'
+
+    @property
+    def cost(self):
+        return self.wealth
+
+
+def housing_params(**overrides):
+    """Housing assumptions with overrides applied"""
+    unknown = set(overrides) - set(HOUSING)
+    if unknown:
+        raise KeyError(f"Unknown housing assumptions: {sorted(unknown)}")
+    h = dict(HOUSING)
+    h.update(overrides)
+    return h
+
+
+def mortgage_payment(principal, rate, years):
+    """Level annual payment repaying ``principal`` over ``years``"""
+    years = np.asarray(years, dtype=np.float64)
+    safe = np.maximum(years, 1.0)
+    if rate:
+        payment = principal * rate / (1.0 - (1.0 + rate) ** -safe)
+    else:
+        payment = principal / safe
+    return np.where(years > 0, payment, 0.0)
+
+
+def mortgage_balance(principal, rate, years, paid_years):
+    """Outstanding balance after ``paid_years`` of level payments"""
+    payment = mortgage_payment(principal, rate, years)
+    if not rate:
+        return np.maximum(0.0, principal - payment * paid_years)
+    g = (1.0 + rate) ** paid_years
+    return np.maximum(0.0, principal * g - payment * (g - 1.0) / rate)
+
+
+def yearly_costs(status, age, income, h, p):
+    """Cost of each year from ``age`` to ``horizon_age``, shaped ``(rows, years)``.
+
+    ``status`` holds housing_status codes.  Years past a row's horizon are 0.
+    """
+    status = np.asarray(status)[:, None]
+    income = np.asarray(income, dtype=np.float64)[:, None]
+    age = np.asarray(age, dtype=np.float64)[:, None]
+    span = int(np.ceil(p['horizon_age'] - age.min()))
+    t = np.arange(span)[None, :].astype(np.float64)
+    code = {s: LEVELS['housing_status'].index(s) for s in LEVELS['housing_status']}
+
+    price = income * h['price_to_income']
+    loan = price * (1.0 - h['down_payment'])
+    rate = h['mortgage_rate']
+    rent = income * h['rent_share']
+    upkeep = price * h['upkeep']
+
+    # Existing mortgage: remaining balance re-amortised over the (possibly shortened) remaining term
+    remaining = max(0, h['mortgage_years'] - h['years_owned'])
+    balance = mortgage_balance(loan, rate, h['mortgage_years'], h['years_owned'])
+    term = max(0, remaining - h['prepay_years'])
+    paying = upkeep + np.where(t < term, mortgage_payment(balance, rate, term), 0.0)
+
+    # Planned purchase: rent, then down payment and a new mortgage
+    buy = h['years_to_purchase']
+    new_term = max(0, h['mortgage_years'] - h['prepay_years'])
+    planning = np.where(
+        t < buy, rent,
+        upkeep + np.where(t < buy + new_term, mortgage_payment(loan, rate, new_term), 0.0)
+        + np.where(t == buy, price * h['down_payment'], 0.0))
+
+    cost = np.select(
+        [status == code['rent'], status == code['own_paid'], status == code['own_paying']],
+        [rent, upkeep, paying], planning)
+    return np.where(age + t < p['horizon_age'], cost, 0.0)
+
+
+def _mesh(midpoints):
+    """Flat (age, housing code, income) inputs for every key, in ``KEY_DIMS`` order"""
+    codes = np.unravel_index(np.arange(key_count()), [len(LEVELS[d]) for d in KEY_DIMS])
+    age = np.asarray(midpoints['age_bucket'], dtype=np.float64)[codes[0]]
+    income = np.asarray(midpoints['income_bucket'], dtype=np.float64)[codes[2]]
+    return codes[1], age, income
+
+
+def key_count():
+    return int(np.prod([len(LEVELS[d]) for d in KEY_DIMS]))
+
+
+def build_timelines(midpoints, assumptions=None, **overrides):
+    """CostTimelines for every (age, housing status, income) key, one point per year"""
+    h = housing_params(**overrides)
+    p = model.params(**(assumptions or {}))
+    status, age, income = _mesh(midpoints)
+    costs = yearly_costs(status, age, income, h, p)
+    lengths = np.ceil(p['horizon_age'] - age).astype(np.int64)
+    offsets = np.zeros(len(age) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    keep = np.arange(costs.shape[1])[None, :] < lengths[:, None]
+    t = np.broadcast_to(np.arange(costs.shape[1]), costs.shape)[keep]
+    row_age = np.repeat(age, lengths)
+    return CostTimelines(
+        offsets,
+        np.floor(row_age + t).astype(np.int32),
+        np.round(costs[keep]).astype(np.int32),
+        (p['start_year'] + t).astype(np.int32),
+    )
+
+
+def scenario_keys(rows=None):
+    """Timeline key of each scenario (flat grid index -> row of ``build_timelines``)"""
+    codes = np.unravel_index(np.arange(GRID_SIZE) if rows is None else np.asarray(rows), GRID_SHAPE)
+    return np.ravel_multi_index([codes[axis(d)] for d in KEY_DIMS], [len(LEVELS[d]) for d in KEY_DIMS])
+
+
+def scenario_timelines(timelines, rows):
+    """Per-scenario CSR timelines for the given flat grid rows"""
+    return timelines.take(scenario_keys(rows))
+
+
+def profile_timeline(midpoints, assumptions=None, **buckets_and_overrides):
+    """One profile's housing-cost timeline (list of dicts); housing overrides allowed"""
+    overrides = {k: v for k, v in buckets_and_overrides.items() if k in HOUSING}
+    buckets = {k: v for k, v in buckets_and_overrides.items() if k not in HOUSING}
+    h = housing_params(**overrides)
+    p = model.params(**(assumptions or {}))
+    age = float(midpoints['age_bucket'][LEVELS['age_bucket'].index(buckets['age_bucket'])])
+    income = float(midpoints['income_bucket'][LEVELS['income_bucket'].index(buckets['income_bucket'])])
+    status = LEVELS['housing_status'].index(buckets['housing_status'])
+    costs = yearly_costs([status], [age], [income], h, p)[0]
+    years = int(np.ceil(p['horizon_age'] - age))
+    return [{'age': int(np.floor(age + t)), 'cost': int(round(costs[t])), 'year': int(p['start_year'] + t)}
+            for t in range(years)]
+
+
+def add_housing_columns(grid, assumptions=None, **overrides):
+    """Attach housing cost before and after retirement for every scenario (in place)"""
+    h = housing_params(**overrides)
+    p = model.params(**(assumptions or {}))
+    status, age, income = _mesh(grid.midpoints)
+    cumulative = np.cumsum(yearly_costs(status, age, income, h, p), axis=1)
+    retire = np.asarray(grid.midpoints['retirement_age_bucket'], dtype=np.float64)
+    working = np.clip(np.ceil(retire[None, :] - age[:, None]), 0, cumulative.shape[1]).astype(np.int64)
+    before = np.where(working > 0, np.take_along_axis(cumulative, np.maximum(working - 1, 0), axis=1), 0.0)
+    after = cumulative[:, -1:] - before
+
+    # (age, housing, income, retirement) -> grid shape
+    shape = [1] * len(GRID_SHAPE)
+    for d in KEY_DIMS + ['retirement_age_bucket']:
+        shape[axis(d)] = len(LEVELS[d])
+    order = [len(LEVELS[d]) for d in KEY_DIMS] + [len(retire)]
+    for name, values in (('housing_cost_to_retirement', before), ('housing_cost_in_retirement', after)):
+        table = values.reshape(order).astype(np.float32)
+        grid.columns[name] = np.broadcast_to(table.reshape(shape), GRID_SHAPE).ravel().copy()
+    return grid
@@ -0,0 +1,52 @@
+"""Real (today's yen) view of nominal amounts.
+
+Everything in the grid is nominal yen at the year it refers to.  The real
+view divides each amount by ``(1 + inflation) ** (year - start_year)``.
+Deflators are one cached vector per (inflation, start year), indexed by
+calendar year, so switching a timeline or a target to real yen is a gather
+and a multiply on arrays that are already in memory.
+"""
+
+import functools
+
+import numpy as np
+
+from . import model
+
+INFLATION = 0.02        # BoJ price stability target
+YEARS_BACK = 10         # timeline labels can precede the snapshot year slightly
+YEARS_AHEAD = 100
+
+
+@functools.lru_cache(maxsize=32)
+def deflator(inflation=INFLATION, start_year=model.ASSUMPTIONS['start_year']):
+    """Read-only ``(first_year, factors)``: ``factors[y - first_year]`` converts year-``y`` yen to today's"""
+    years = np.arange(-YEARS_BACK, YEARS_AHEAD + 1, dtype=np.float64)
+    factors = np.power(1.0 + inflation, -years)
+    factors.flags.writeable = False
+    return start_year - YEARS_BACK, factors
+
+
+def deflate(values, years, inflation=INFLATION, start_year=model.ASSUMPTIONS['start_year'], dtype=None):
+    """``values`` (nominal at ``years``) in today's yen; inputs broadcast"""
+    first, factors = deflator(float(inflation), int(start_year))
+    index = np.clip(np.asarray(years) - first, 0, len(factors) - 1)
+    return np.multiply(values, factors[index], dtype=dtype)
+
+
+def view(values, years, real, inflation=INFLATION, start_year=model.ASSUMPTIONS['start_year']):
+    """``values`` unchanged for the nominal view, deflated for the real one"""
+    if not real:
+        return values
+    return deflate(values, years, inflation, start_year)
+
+
+def real_timelines(timelines, inflation=INFLATION, start_year=model.ASSUMPTIONS['start_year']):
+    """Same timelines with every point in today's yen (float32 values)"""
+    values = deflate(timelines.wealth, timelines.year, inflation, start_year, dtype=np.float32)
+    return timelines.with_values(values)
+
+
+def real_target(target, retirement_year, inflation=INFLATION, start_year=model.ASSUMPTIONS['start_year']):
+    """A target reached at ``retirement_year`` (e.g. ``fire_number``) in today's yen"""
+    return deflate(target, retirement_year, inflation, start_year)
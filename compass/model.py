@@ -0,0 +1,198 @@
+"""Vectorised retirement model behind the published scenario grid.
+
+These formulas reproduce the v4 snapshot from the bucket midpoints alone,
+exactly except ``projected_wealth``: the export stores it as float32 computed
+at float32 precision, so 5,760 of the 1,382,400 cells differ from the float64
+formula cast to float32 by one float32 step (at most 0.5 yen).
+All functions take numpy arrays that broadcast against each other (usually
+the open mesh from ``grid.midpoint_mesh``) plus an assumptions dict.
+"""
+
+import numpy as np
+
+ASSUMPTIONS = {
+    'return_rate': 0.03,           # annual growth of invested savings
+    'start_year': 2025,            # calendar year of the snapshot
+    'timeline_step': 3,            # years between wealth timeline points
+    'fire_multiple': 25,           # years of expenses needed (4% rule)
+    'pension_age': 65,             # public pension starts (claim age)
+    'pension_replacement': 0.30,   # pension as a share of income
+    'pension_model': 'replacement',  # 'replacement' (v4) or 'nenkin' (see pension.py)
+    'career_start_age': 22,        # first year of kosei nenkin enrolment ('nenkin' only)
+    'retirement_age_cap': 80,      # latest traditional retirement age reported
+    'horizon_age': 100,            # drawdown is followed up to this age
+}
+
+GRADE_LABELS = ['A+', 'A', 'B', 'C', 'F']
+STATUS_LABELS = ['green', 'yellow', 'red']
+
+
+def params(**overrides):
+    """Model assumptions with overrides applied"""
+    unknown = set(overrides) - set(ASSUMPTIONS)
+    if unknown:
+        raise KeyError(f"Unknown assumptions: {sorted(unknown)}")
+    p = dict(ASSUMPTIONS)
+    p.update(overrides)
+    return p
+
+
+def growth_factors(years, p):
+    """(1+r)**t and the matching annuity factor for t years of contributions"""
+    r = p['return_rate']
+    g = np.power(1.0 + r, years)
+    annuity = (g - 1.0) / r if r else np.asarray(years, dtype=np.float64) * 1.0
+    return g, annuity
+
+
+def wealth_at(years, current_savings, monthly_savings, p):
+    """Wealth after ``years`` of growth with monthly savings paid in yearly"""
+    g, annuity = growth_factors(years, p)
+    return current_savings * g + monthly_savings * 12.0 * annuity
+
+
+def fire_number(expenses, p):
+    return expenses * 12.0 * p['fire_multiple']
+
+
+def annual_pension(income, retirement_age, p):
+    """Public pension per year once it is claimed at ``pension_age``"""
+    if p['pension_model'] == 'nenkin':
+        from .pension import annual_benefit
+        return annual_benefit(income, retirement_age, p['pension_age'], p['career_start_age'])
+    if p['pension_model'] != 'replacement':
+        raise ValueError(f"Unknown pension_model: {p['pension_model']!r}")
+    return income * p['pension_replacement']
+
+
+def traditional_number(expenses, income, retirement_age, p):
+    """Assets needed to bridge to the pension age and cover any pension shortfall"""
+    annual = expenses * 12.0
+    bridge = annual * np.maximum(0.0, p['pension_age'] - retirement_age)
+    shortfall = np.maximum(0.0, annual - annual_pension(income, retirement_age, p)) * p['fire_multiple']
+    return bridge + shortfall
+
+
+def projected_wealth(age, current_savings, monthly_savings, retirement_age, p):
+    return wealth_at(retirement_age - age, current_savings, monthly_savings, p)
+
+
+def traditional_retirement_age(age, current_savings, monthly_savings, expenses, income, p):
+    """Earliest whole age at which wealth covers ``traditional_number`` (capped)"""
+    cap = float(p['retirement_age_cap'])
+    age, current_savings, monthly_savings, expenses, income = np.broadcast_arrays(
+        age, current_savings, monthly_savings, expenses, income)
+    best = np.full(age.shape, cap)
+    start = int(np.floor(age.min()))
+    for candidate in range(int(cap) - 1, start - 1, -1):
+        x = float(candidate)
+        need = traditional_number(expenses, income, x, p)
+        have = wealth_at(np.maximum(0.0, x - age), current_savings, monthly_savings, p)
+        best = np.where((x >= np.floor(age)) & (have >= need), x, best)
+    return best
+
+
+def drawdown(retirement_age, wealth, expenses, income, p):
+    """Spend down ``wealth`` from retirement to ``horizon_age``.
+
+    Each year starts by withdrawing a year of expenses, less the pension once
+    ``pension_age`` is reached, and the rest grows at ``return_rate``.
+    Returns ``(depletion_age, terminal_wealth)``: the first age whose
+    withdrawal can no longer be covered (NaN if the money lasts) and the
+    wealth left at the horizon (0 once depleted).
+    """
+    retirement_age, wealth, expenses, income = np.broadcast_arrays(
+        np.asarray(retirement_age, dtype=np.float64), np.asarray(wealth, dtype=np.float64),
+        np.asarray(expenses, dtype=np.float64), np.asarray(income, dtype=np.float64))
+    horizon = float(p['horizon_age'])
+    growth = 1.0 + p['return_rate']
+    spend = expenses * 12.0
+    pension = annual_pension(income, retirement_age, p)
+    balance = wealth.copy()
+    depleted = np.full(balance.shape, np.nan)
+    years = int(np.ceil(horizon - retirement_age.min())) if balance.size else 0
+    for k in range(years):
+        at = retirement_age + k
+        active = (at < horizon) & np.isnan(depleted)
+        need = spend - np.where(at >= p['pension_age'], pension, 0.0)
+        short = active & (balance < need)
+        depleted[short] = at[short]
+        balance = np.where(active & ~short, (balance - need) * growth, balance)
+    return depleted, np.where(np.isnan(depleted), balance, 0.0)
+
+
+def fire_percentage(projected, fire_target):
+    return np.round(np.minimum(100.0, projected / fire_target * 100.0), 1)
+
+
+def fire_grade(percentage):
+    """Grade codes into GRADE_LABELS"""
+    return np.select(
+        [percentage >= 90, percentage > 80, percentage >= 70, percentage >= 60],
+        [0, 1, 2, 3], 4).astype(np.int8)
+
+
+def early_retirement_ready(target_age, traditional_age):
+    return np.maximum(0.0, target_age - traditional_age)
+
+
+def late_retirement(target_age, traditional_age):
+    return np.maximum(0.0, traditional_age - target_age)
+
+
+def traditional_grade(early, late):
+    """Grade codes into GRADE_LABELS"""
+    return np.select([early >= 5, late == 0, late <= 3, late <= 7], [0, 1, 2, 3], 4).astype(np.int8)
+
+
+def status_color(grade):
+    """Status codes into STATUS_LABELS: A+/A green, B/C yellow, F red"""
+    return np.select([grade <= 1, grade <= 3], [0, 1], 2).astype(np.int8)
+
+
+def timeline_points(age, retirement_age, p):
+    """Ages, years and elapsed time of the timeline points for one profile"""
+    step = int(p['timeline_step'])
+    horizon = retirement_age - age
+    ages, years, elapsed = [], [], []
+    for x in range(int(age), int(retirement_age) + 1, step):
+        t = max(0.0, x - age)
+        if t > horizon:
+            break
+        ages.append(x)
+        elapsed.append(t)
+        years.append(int(p['start_year'] + x - age))
+    if not elapsed or elapsed[-1] != horizon:
+        ages.append(int(retirement_age))
+        elapsed.append(horizon)
+        years.append(int(p['start_year'] + horizon))
+    return np.array(ages, dtype=np.int32), np.array(years, dtype=np.int32), np.array(elapsed)
+
+
+def build_timelines(age, retirement_age, current_savings, monthly_savings, p):
+    """CSR timelines for flat per-row inputs.
+
+    Point layout depends only on (age, retirement_age), so rows are grouped by
+    that pair and each group is filled with one 2-D array expression.
+    """
+    from .grid import Timelines
+
+    age = np.asarray(age, dtype=np.float64)
+    retirement_age = np.asarray(retirement_age, dtype=np.float64)
+    pairs, group = np.unique(np.stack([age, retirement_age], axis=1), axis=0, return_inverse=True)
+    group = group.ravel()
+    layouts = [timeline_points(a, r, p) for a, r in pairs]
+    lengths = np.array([len(l[0]) for l in layouts])[group]
+    offsets = np.zeros(len(age) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    out_age = np.empty(offsets[-1], dtype=np.int32)
+    out_year = np.empty(offsets[-1], dtype=np.int32)
+    out_wealth = np.empty(offsets[-1], dtype=np.int32)
+    for k, (ages, years, elapsed) in enumerate(layouts):
+        rows = np.flatnonzero(group == k)
+        pos = offsets[rows][:, None] + np.arange(len(ages))
+        out_age[pos] = ages
+        out_year[pos] = years
+        wealth = wealth_at(elapsed[None, :], current_savings[rows, None], monthly_savings[rows, None], p)
+        out_wealth[pos] = np.floor(wealth)
+    return Timelines(offsets, out_age, out_wealth, out_year)
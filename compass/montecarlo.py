@@ -0,0 +1,127 @@
+"""Monte Carlo wealth paths around the deterministic projection.
+
+The grid uses one fixed return rate.  Here each year's growth is drawn from
+a lognormal whose mean matches that rate, so with zero volatility a path is
+exactly ``model.wealth_at``.  All paths are simulated at once as a
+``(paths, steps)`` array: log-returns are cumulatively summed into growth
+factors and the yearly contributions are folded in with one more cumsum, so
+there is no Python loop over paths or years.
+
+``fan_chart`` is memoised per profile and parameters; ``submit_fan_chart``
+runs it in a shared process pool so a UI thread can wait on a future.
+"""
+
+import functools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import model
+
+PATHS = 10_000
+VOLATILITY = 0.15
+SEED = 0
+PERCENTILES = (10, 50, 90)
+
+_POOL = None
+_FUTURES = OrderedDict()
+_MAX_FUTURES = 128
+_LOCK = threading.Lock()      # app sessions submit from their own threads
+
+
+def time_grid(horizon):
+    """Elapsed years of every simulated point: 0, 1, 2, ... and the horizon itself"""
+    whole = np.arange(0.0, np.floor(horizon) + 1.0)
+    return whole if whole[-1] == horizon else np.append(whole, horizon)
+
+
+def simulate(current_savings, monthly_savings, horizon, paths=PATHS, volatility=VOLATILITY,
+             seed=SEED, return_rate=None):
+    """Wealth on every path at every point of ``time_grid(horizon)``.
+
+    Returns ``(elapsed, wealth)`` with ``wealth`` shaped ``(paths, len(elapsed))``.
+    Contributions for a step are the deterministic annuity for its length, so
+    only growth is random.
+    """
+    p = model.params(return_rate=model.ASSUMPTIONS['return_rate'] if return_rate is None else return_rate)
+    elapsed = time_grid(max(0.0, float(horizon)))
+    dt = np.diff(elapsed)
+    rng = np.random.default_rng(seed)
+
+    drift = (np.log1p(p['return_rate']) - 0.5 * volatility ** 2) * dt
+    log_growth = drift + volatility * np.sqrt(dt) * rng.standard_normal((paths, len(dt)))
+    growth = np.exp(np.cumsum(log_growth, axis=1))
+
+    # W_t = G_t * (W_0 + sum_{s<=t} c_s / G_s)
+    contributions = model.wealth_at(dt, 0.0, monthly_savings, p)
+    deposits = np.cumsum(contributions / growth, axis=1)
+    wealth = np.empty((paths, len(elapsed)))
+    wealth[:, 0] = current_savings
+    wealth[:, 1:] = growth * (current_savings + deposits)
+    return elapsed, wealth
+
+
+@functools.lru_cache(maxsize=256)
+def fan_chart(age, retirement_age, current_savings, monthly_savings, expected_expenses,
+              paths=PATHS, volatility=VOLATILITY, seed=SEED, return_rate=None):
+    """Percentile bands and FIRE-success probability for one profile.
+
+    Inputs are bucket midpoints (plain floats, so results can be memoised).
+    Returns a dict of lists: ``age``, ``year``, ``p10``/``p50``/``p90`` and the
+    deterministic ``expected`` line, plus ``fire_number`` and
+    ``success_probability`` (share of paths at or above it at retirement).
+    """
+    elapsed, wealth = simulate(current_savings, monthly_savings, retirement_age - age,
+                               paths, volatility, seed, return_rate)
+    bands = np.percentile(wealth, PERCENTILES, axis=0)
+    p = model.params(return_rate=model.ASSUMPTIONS['return_rate'] if return_rate is None else return_rate)
+    target = float(model.fire_number(expected_expenses, p))
+    result = {
+        'age': (age + elapsed).tolist(),
+        'year': (p['start_year'] + elapsed).astype(int).tolist(),
+        'expected': model.wealth_at(elapsed, current_savings, monthly_savings, p).tolist(),
+        'fire_number': target,
+        'success_probability': float((wealth[:, -1] >= target).mean()),
+        'paths': paths,
+    }
+    for q, band in zip(PERCENTILES, bands):
+        result[f'p{q}'] = band.tolist()
+    return result
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 1) - 1)))
+    return _POOL
+
+
+def submit_fan_chart(*args, **kwargs):
+    """``fan_chart`` in the background process pool, as a ``concurrent.futures.Future``.
+
+    Identical requests share one future, so repeated reruns of the UI script
+    wait on (or immediately get) the same result.
+    """
+    key = (args, tuple(sorted(kwargs.items())))
+    with _LOCK:
+        future = _FUTURES.get(key)
+        if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+            future = _pool().submit(fan_chart, *args, **kwargs)
+            _FUTURES[key] = future
+            _evict()
+        else:
+            _FUTURES.move_to_end(key)
+    return future
+
+
+def _evict():
+    """Drop the oldest entries over ``_MAX_FUTURES``, finished ones first (call with ``_LOCK`` held)"""
+    while len(_FUTURES) > _MAX_FUTURES:
+        done = next((k for k, f in _FUTURES.items() if f.done()), None)
+        if done is None:
+            _FUTURES.popitem(last=False)
+        else:
+            del _FUTURES[done]
@@ -0,0 +1,190 @@
+"""Wealth timelines regenerated from the model instead of stored.
+
+Every ``wealth_timeline`` is ``model.build_timelines`` of the scenario's
+age, savings, monthly savings and retirement midpoints.  ``fit`` checks
+that for the whole grid, chunk by chunk, and keeps the stored timeline only
+for the rows that do not reproduce bit for bit (the residuals).  The result,
+``ParametricTimelines``, is a drop-in ``Timelines`` that holds just those
+residuals and rebuilds any other row on request.
+
+The growth factors of a row only depend on its point layout, which is the
+same vector whatever the batch, so regenerated rows are identical to the
+ones ``fit`` compared against.
+"""
+
+import os
+
+import numpy as np
+
+from . import model
+from .grid import DATA_DIR, GRID_SIZE, LazyTimelines, ScenarioGrid, Timelines, load_grid as _load_grid, read_table
+from .recompute import TIMELINE_PARAMS, _row_inputs
+
+CHUNK = 200_000
+RESIDUALS_FILE = os.path.join(os.path.dirname(DATA_DIR), 'timeline_residuals.npz')
+
+
+def _build(rows, midpoints, p):
+    age, savings, monthly, retirement = _row_inputs(np.asarray(rows), midpoints)
+    return model.build_timelines(age, retirement, savings, monthly, p)
+
+
+def mismatched_rows(timelines, midpoints, p, chunk=CHUNK):
+    """Grid rows whose stored timeline differs from the regenerated one"""
+    bad = []
+    for first in range(0, len(timelines), chunk):
+        rows = np.arange(first, min(first + chunk, len(timelines)))
+        fresh = _build(rows, midpoints, p)
+        stored = slice(timelines.offsets[first], timelines.offsets[rows[-1] + 1])
+        lengths = np.diff(timelines.offsets[first:rows[-1] + 2])
+        same = lengths == np.diff(fresh.offsets)
+        # Rows with the same layout are compared point by point, then reduced per row
+        kept = np.flatnonzero(same)
+        if len(kept) == len(rows):
+            a = Timelines(lengths.cumsum() - lengths, *(getattr(timelines, n)[stored] for n in ('age', 'wealth', 'year')))
+            b = fresh
+        else:
+            a, b = timelines.take(rows[kept]), fresh.take(kept)
+        diff = (a.age != b.age) | (a.wealth != b.wealth) | (a.year != b.year)
+        same[kept] = ~np.logical_or.reduceat(diff, b.offsets[:-1])
+        bad.append(rows[~same])
+    return np.concatenate(bad) if bad else np.zeros(0, dtype=np.int64)
+
+
+class ParametricTimelines(LazyTimelines):
+    """Timelines rebuilt from midpoints, with stored residual rows.
+
+    ``row`` and ``take`` regenerate only what they return.
+    """
+
+    def __init__(self, midpoints, assumptions, residual_rows, residuals, size=GRID_SIZE):
+        self.midpoints = dict(midpoints)
+        self.assumptions = {k: assumptions[k] for k in TIMELINE_PARAMS}
+        self.residual_rows = np.asarray(residual_rows, dtype=np.int64)
+        self.residuals = residuals
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.residual_rows.nbytes + (self.residuals.nbytes if self.residuals is not None else 0)
+
+    def _p(self):
+        return model.params(**self.assumptions)
+
+    def _residual(self, rows):
+        """Position in ``residuals`` of each row, -1 for regenerated rows"""
+        rows = np.asarray(rows)
+        if not len(self.residual_rows):
+            return np.full(rows.shape, -1)
+        pos = np.minimum(np.searchsorted(self.residual_rows, rows), len(self.residual_rows) - 1)
+        return np.where(self.residual_rows[pos] == rows, pos, -1)
+
+    def row(self, i):
+        k = int(self._residual([i])[0])
+        if k >= 0:
+            return self.residuals.row(k)
+        return _build([i], self.midpoints, self._p()).row(0)
+
+    def take(self, rows):
+        rows = np.asarray(rows)
+        out = _build(rows, self.midpoints, self._p())
+        k = self._residual(rows)
+        stored = np.flatnonzero(k >= 0)
+        if not len(stored):
+            return out
+        # Swap in the residual rows, rebuilding the CSR around their lengths
+        patch = self.residuals.take(k[stored])
+        lengths = np.diff(out.offsets)
+        lengths[stored] = np.diff(patch.offsets)
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        from_patch = np.zeros(len(rows), dtype=bool)
+        from_patch[stored] = True
+        source = np.repeat(from_patch, lengths)
+        arrays = []
+        for name in ('age', 'wealth', 'year'):
+            values = np.empty(offsets[-1], dtype=getattr(out, name).dtype)
+            values[~source] = getattr(out, name)[np.repeat(~from_patch, np.diff(out.offsets))]
+            values[source] = getattr(patch, name)
+            arrays.append(values)
+        return Timelines(offsets, *arrays)
+
+    def materialize(self):
+        """Plain ``Timelines`` for every row"""
+        return self.take(np.arange(self.size))
+
+
+def fit(timelines, midpoints, assumptions=None, chunk=CHUNK):
+    """``ParametricTimelines`` equivalent to ``timelines``, with the mismatches as residuals"""
+    p = model.params(**(assumptions or {}))
+    rows = mismatched_rows(timelines, midpoints, p, chunk)
+    residuals = timelines.take(rows) if len(rows) else None
+    return ParametricTimelines(midpoints, p, rows, residuals, len(timelines))
+
+
+def drop_timelines(grid, assumptions=None, chunk=CHUNK):
+    """Replace the grid's stored timelines by a fitted ``ParametricTimelines`` (in place).
+
+    Returns ``(grid, report)`` with the residual count and bytes before/after.
+    """
+    before = grid.timelines.nbytes
+    fitted = fit(grid.timelines, grid.midpoints, assumptions, chunk)
+    grid.timelines = fitted
+    return grid, {'rows': len(fitted), 'residual_rows': len(fitted.residual_rows),
+                  'bytes_before': before, 'bytes_after': fitted.nbytes}
+
+
+def save_residuals(timelines, path):
+    """Write the residual rows (and the assumptions they were fitted with) to ``path`` (.npz)"""
+    r = timelines.residuals
+    arrays = {'rows': timelines.residual_rows, 'size': np.array(timelines.size)}
+    if r is not None:
+        arrays.update(offsets=r.offsets, age=r.age, wealth=r.wealth, year=r.year)
+    for name, value in timelines.assumptions.items():
+        arrays[f"p_{name}"] = np.array(value)
+    for name, values in timelines.midpoints.items():
+        arrays[f"m_{name}"] = np.asarray(values, dtype=np.float64)
+    np.savez_compressed(path, **arrays)
+
+
+def load_residuals(path):
+    """``ParametricTimelines`` from a file written by ``save_residuals``"""
+    with np.load(path) as data:
+        residuals = None
+        if 'offsets' in data:
+            residuals = Timelines(data['offsets'], data['age'], data['wealth'], data['year'])
+        assumptions = {k[2:]: data[k].item() for k in data.files if k.startswith('p_')}
+        midpoints = {k[2:]: data[k].tolist() for k in data.files if k.startswith('m_')}
+        return ParametricTimelines(midpoints, assumptions, data['rows'], residuals, int(data['size']))
+
+
+def _save_residuals_atomic(timelines, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        save_residuals(timelines, f)
+    os.replace(tmp, path)
+
+
+def load_grid(path=DATA_DIR, residuals=RESIDUALS_FILE, progress=None):
+    """Load the snapshot without its ``wealth_timeline`` column, timelines from ``residuals``.
+
+    On the first load there is no residuals file yet: the full snapshot is
+    read once, fitted, and the residuals written for the next load.
+    """
+    import pyarrow.dataset as ds
+
+    if not os.path.exists(residuals):
+        grid, _ = drop_timelines(_load_grid(path, progress=progress))
+        _save_residuals_atomic(grid.timelines, residuals)
+        return grid
+
+    names = ds.dataset(path, format='parquet', partitioning='hive').schema.names
+    table = read_table(path, [n for n in names if n != 'wealth_timeline'], progress)
+    if progress is not None:
+        progress('indexing', 1.0)
+    grid = ScenarioGrid.from_table(table)
+    grid.timelines = load_residuals(residuals)
+    return grid
@@ -0,0 +1,137 @@
+"""Precomputed "path to green" for every scenario in the grid.
+
+For each cell we store how many one-bucket changes of controllable inputs
+(the same moves as ``sensitivity``) it takes to reach a green scenario, and
+which move to make first.  Both come from one multi-source breadth-first
+distance transform seeded at every green cell, run with whole-array shifts
+along the controllable axes rather than a per-cell search.  At request time
+the full path is read by following the stored moves, one lookup per step.
+"""
+
+import threading
+import weakref
+
+import numpy as np
+
+from .grid import CATEGORIES, GRID_SHAPE, LEVELS, axis, flat_index
+from .sensitivity import NOMINAL, STRIDES
+
+GREEN = CATEGORIES['status_color'].index('green')
+UNREACHABLE = np.iinfo(np.int8).max
+NO_MOVE = -1
+
+# (distance, move) per grid, kept beside the grid rather than in its columns
+_TRANSFORMS = weakref.WeakKeyDictionary()
+_TRANSFORMS_LOCK = threading.Lock()
+
+# Candidate first moves, in order of preference when several are equally short
+GREEN_MOVES = (
+    [('monthly_savings_bucket', +1), ('expected_expenses_bucket', -1), ('retirement_age_bucket', +1),
+     ('monthly_savings_bucket', -1), ('expected_expenses_bucket', +1), ('retirement_age_bucket', -1)]
+    + [('housing_status', code) for code in range(len(LEVELS['housing_status']))]
+)
+
+
+def _shift(mask, ax, step):
+    """``out[i] = mask[i + step]`` along ``ax``, False where that is off the grid"""
+    out = np.zeros_like(mask)
+    src = [slice(None)] * mask.ndim
+    dst = [slice(None)] * mask.ndim
+    if step > 0:
+        src[ax], dst[ax] = slice(step, None), slice(None, -step)
+    else:
+        src[ax], dst[ax] = slice(None, step), slice(-step, None)
+    out[tuple(dst)] = mask[tuple(src)]
+    return out
+
+
+def _reaches(frontier, dim, step):
+    """Cells whose ``(dim, step)`` move lands on the frontier"""
+    ax = axis(dim)
+    if dim in NOMINAL:
+        # step is the target level: every cell on that axis sees frontier[..., step, ...]
+        target = np.take(frontier, [step], axis=ax)
+        return np.broadcast_to(target, frontier.shape)
+    return _shift(frontier, ax, step)
+
+
+def distance_transform(status):
+    """Distance to green and suggested first move for every cell.
+
+    ``status`` is the status_color code column (flat or grid-shaped).
+    Returns ``(distance, move)`` as flat int8 arrays: distance 0 for green
+    cells, ``UNREACHABLE`` if no sequence of moves gets there; move is an
+    index into ``GREEN_MOVES`` or ``NO_MOVE``.
+    """
+    green = np.asarray(status).reshape(GRID_SHAPE) == GREEN
+    distance = np.where(green, 0, UNREACHABLE).astype(np.int8)
+    move = np.full(GRID_SHAPE, NO_MOVE, dtype=np.int8)
+    frontier = green
+    level = 0
+    while frontier.any():
+        level += 1
+        unvisited = distance == UNREACHABLE
+        reached = np.zeros(GRID_SHAPE, dtype=bool)
+        for code, (dim, step) in enumerate(GREEN_MOVES):
+            hit = _reaches(frontier, dim, step) & unvisited & ~reached
+            move[hit] = code
+            reached |= hit
+        distance[reached] = level
+        frontier = reached
+    return distance.ravel(), move.ravel()
+
+
+def green_transform(grid):
+    """``(distance, move)`` for ``grid``, computed once and shared by every caller.
+
+    Grids are shared across app sessions, so this never writes to
+    ``grid.columns``; columns already attached with ``add_path_to_green``
+    are used as they are.
+    """
+    if 'green_distance' in grid.columns:
+        return grid.columns['green_distance'], grid.columns['green_move']
+    with _TRANSFORMS_LOCK:
+        transform = _TRANSFORMS.get(grid)
+        if transform is None:
+            transform = _TRANSFORMS[grid] = distance_transform(grid.columns['status_color'])
+    return transform
+
+
+def add_path_to_green(grid):
+    """Attach ``green_distance``/``green_move`` columns to a grid (in place)"""
+    distance, move = distance_transform(grid.columns['status_color'])
+    grid.columns['green_distance'] = distance
+    grid.columns['green_move'] = move
+    return grid
+
+
+def apply_move(index, code):
+    """Flat index reached from ``index`` by ``GREEN_MOVES[code]``"""
+    dim, step = GREEN_MOVES[code]
+    if dim in NOMINAL:
+        here = np.unravel_index(index, GRID_SHAPE)[axis(dim)]
+        step = step - int(here)
+    return int(index) + step * STRIDES[dim]
+
+
+def path_to_green(grid, **buckets):
+    """Bucket changes that turn the profile green, shortest first.
+
+    Returns a list of ``{'dimension', 'from_level', 'to_level'}`` steps
+    (empty if already green) or ``None`` if green is out of reach.
+    """
+    distance, move = green_transform(grid)
+    index = int(flat_index(**buckets))
+    if distance[index] == UNREACHABLE:
+        return None
+    steps = []
+    while distance[index] > 0:
+        code = int(move[index])
+        dim = GREEN_MOVES[code][0]
+        nxt = apply_move(index, code)
+        here = np.unravel_index(index, GRID_SHAPE)[axis(dim)]
+        there = np.unravel_index(nxt, GRID_SHAPE)[axis(dim)]
+        steps.append({'dimension': dim, 'from_level': LEVELS[dim][here], 'to_level': LEVELS[dim][there]})
+        index = nxt
+    return steps
+
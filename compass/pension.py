@@ -0,0 +1,109 @@
+"""Japanese public pension (kokumin + kosei nenkin) estimates.
+
+The v4 grid approximates the pension as a flat share of income from 65.
+This module estimates the actual benefit instead:
+
+* kokumin nenkin (basic pension): the full amount scaled by years of
+  contributions (compulsory from 20 to 60, so 40 years by default);
+* kosei nenkin (employees' pension): average standard remuneration x
+  5.481/1000 x months enrolled, for the working years from
+  ``career_start_age`` to retirement (enrolment ends at 70);
+* claim age 60-75: -0.4% per month claimed before 65, +0.7% per month
+  deferred after it.
+
+Income is taken as a flat career average (no wage growth), capped at the
+standard remuneration ceilings.  Every function is vectorised.
+
+Select it in the model with ``pension_model='nenkin'``; ``pension_age`` is
+then the claim age, so ``by_claim_age`` can recompute the traditional
+retirement results of the whole grid for each claim age.
+"""
+
+import numpy as np
+
+from . import model
+
+BASIC_FULL_ANNUAL = 831_700          # FY2025 basic pension for 40 full years
+BASIC_FULL_YEARS = 40
+KOSEI_ACCRUAL = 5.481 / 1000         # per month of enrolment
+MONTHLY_REMUNERATION_CAP = 650_000   # top standard monthly remuneration grade
+BONUS_CAP = 1_500_000 * 2            # standard bonus cap (per payment) x two bonuses a year
+KOSEI_END_AGE = 70
+
+STANDARD_CLAIM_AGE = 65
+CLAIM_AGES = range(60, 76)
+EARLY_REDUCTION = 0.004              # per month claimed before 65
+DEFERRAL_INCREASE = 0.007            # per month deferred after 65
+
+
+def working_years(retirement_age, career_start_age):
+    """Years of kosei nenkin enrolment for a career ending at ``retirement_age``"""
+    end = np.minimum(retirement_age, KOSEI_END_AGE)
+    return np.maximum(0.0, end - career_start_age)
+
+
+def basic_pension(contribution_years=BASIC_FULL_YEARS):
+    """Annual kokumin nenkin at 65"""
+    return BASIC_FULL_ANNUAL * np.minimum(contribution_years, BASIC_FULL_YEARS) / BASIC_FULL_YEARS
+
+
+def employee_pension(income, years):
+    """Annual kosei nenkin (earnings-related part) at 65"""
+    pensionable = np.minimum(income, MONTHLY_REMUNERATION_CAP * 12 + BONUS_CAP)
+    return pensionable / 12.0 * KOSEI_ACCRUAL * years * 12.0
+
+
+def claim_factor(claim_age):
+    """Benefit multiplier for claiming at ``claim_age`` (1.0 at 65)"""
+    claim_age = np.clip(claim_age, CLAIM_AGES[0], CLAIM_AGES[-1])
+    months = (claim_age - STANDARD_CLAIM_AGE) * 12.0
+    return np.where(months < 0, 1.0 + EARLY_REDUCTION * months, 1.0 + DEFERRAL_INCREASE * months)
+
+
+def annual_benefit(income, retirement_age, claim_age, career_start_age=22, contribution_years=BASIC_FULL_YEARS):
+    """Total annual public pension from ``claim_age``"""
+    kosei = employee_pension(income, working_years(retirement_age, career_start_age))
+    return (basic_pension(contribution_years) + kosei) * claim_factor(claim_age)
+
+
+def by_claim_age(grid, claim_ages=CLAIM_AGES, columns=('traditional_retirement_age', 'status_color'),
+                 assumptions=None):
+    """Traditional-retirement results of the whole grid for each claim age.
+
+    Returns ``{claim_age: {column: flat array}}``, each from an in-memory
+    recompute of the grid with the nenkin pension claimed at that age.
+    """
+    from .recompute import recompute
+
+    results = {}
+    for claim_age in claim_ages:
+        overrides = dict(assumptions or {}, pension_model='nenkin', pension_age=claim_age)
+        updated, _ = recompute(grid, overrides)
+        results[claim_age] = {name: updated.columns[name] for name in columns}
+    return results
+
+
+def profile_by_claim_age(grid, claim_ages=CLAIM_AGES, assumptions=None, **buckets):
+    """Pension and traditional results for one profile at every claim age (no grid recompute)"""
+    from .grid import LEVELS
+
+    p = model.params(**dict(assumptions or {}, pension_model='nenkin'))
+    mids = {d: float(grid.midpoints[d][LEVELS[d].index(buckets[d])]) for d in grid.midpoints}
+    age, retire = mids['age_bucket'], mids['retirement_age_bucket']
+    rows = []
+    for claim_age in claim_ages:
+        q = dict(p, pension_age=claim_age)
+        tra = float(model.traditional_retirement_age(
+            age, mids['current_savings_bucket'], mids['monthly_savings_bucket'],
+            mids['expected_expenses_bucket'], mids['income_bucket'], q))
+        late = model.late_retirement(retire, tra)
+        grade = model.traditional_grade(model.early_retirement_ready(retire, tra), late)
+        rows.append({
+            'claim_age': claim_age,
+            'annual_pension': float(model.annual_pension(mids['income_bucket'], retire, q)),
+            'traditional_number': float(model.traditional_number(
+                mids['expected_expenses_bucket'], mids['income_bucket'], retire, q)),
+            'traditional_retirement_age': tra,
+            'status_color': model.STATUS_LABELS[int(model.status_color(grade))],
+        })
+    return rows
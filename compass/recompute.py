@@ -0,0 +1,305 @@
+"""Dependency-aware recomputation of the scenario grid.
+
+Each output column declares the bucket dimensions (through their midpoints),
+the assumptions and the upstream columns it is computed from.  When some
+assumptions or bucket midpoints change, only the columns downstream of the
+change are recomputed, and only over the grid slices whose inputs actually
+moved.  Every other column of the new grid is the very same array object as in
+the old one.
+
+    new_grid, report = recompute(grid, assumptions={'pension_replacement': 0.28})
+    new_grid, report = recompute(grid, midpoints={'expected_expenses_bucket': [...]})
+"""
+
+import time
+
+import numpy as np
+
+from . import model
+from .grid import (DIMENSIONS, GRID_SHAPE, GRID_SIZE, LEVEL_MIDPOINTS, LEVELS,
+                   MIDPOINT_COLUMNS, ScenarioGrid, axis)
+
+AGE = 'age_bucket'
+SAVINGS = 'current_savings_bucket'
+EXPENSES = 'expected_expenses_bucket'
+INCOME = 'income_bucket'
+MONTHLY = 'monthly_savings_bucket'
+RETIREMENT = 'retirement_age_bucket'
+
+PENSION_PARAMS = ['pension_age', 'pension_replacement', 'pension_model', 'career_start_age']
+
+
+class ColumnSpec:
+    """How one output column is derived.
+
+    ``dims`` are bucket dimensions read through their midpoints, ``inputs``
+    upstream columns, ``params`` assumptions.  ``compute`` receives the
+    midpoint arrays, then the input arrays, then the assumptions dict.
+    """
+
+    def __init__(self, name, dims, params, compute, inputs=(), dtype=np.float64):
+        self.name = name
+        self.dims = list(dims)
+        self.params = list(params)
+        self.inputs = list(inputs)
+        self.compute = compute
+        self.dtype = dtype
+
+
+SPECS = [
+    ColumnSpec('fire_number', [EXPENSES], ['fire_multiple'],
+               lambda e, p: model.fire_number(e, p), dtype=np.float32),
+    ColumnSpec('traditional_number', [EXPENSES, INCOME, RETIREMENT],
+               ['fire_multiple'] + PENSION_PARAMS,
+               lambda e, i, r, p: model.traditional_number(e, i, r, p), dtype=np.float32),
+    ColumnSpec('projected_wealth', [AGE, SAVINGS, MONTHLY, RETIREMENT], ['return_rate'],
+               lambda a, s, m, r, p: model.projected_wealth(a, s, m, r, p), dtype=np.float32),
+    ColumnSpec('traditional_retirement_age', [AGE, SAVINGS, MONTHLY, EXPENSES, INCOME],
+               ['return_rate', 'fire_multiple', 'retirement_age_cap'] + PENSION_PARAMS,
+               lambda a, s, m, e, i, p: model.traditional_retirement_age(a, s, m, e, i, p),
+               dtype=np.float32),
+    # fire_percentage is derived from the exact (float64) wealth, not the stored float32
+    ColumnSpec('fire_percentage', [AGE, SAVINGS, MONTHLY, RETIREMENT, EXPENSES],
+               ['return_rate', 'fire_multiple'],
+               lambda a, s, m, r, e, p: model.fire_percentage(
+                   model.projected_wealth(a, s, m, r, p), model.fire_number(e, p))),
+    ColumnSpec('fire_achievable', [], [], lambda pw, fn, p: pw >= fn,
+               inputs=['projected_wealth', 'fire_number'], dtype=np.bool_),
+    ColumnSpec('fire_grade', [], [], lambda pct, p: model.fire_grade(pct),
+               inputs=['fire_percentage'], dtype=np.int8),
+    ColumnSpec('early_retirement_ready', [RETIREMENT], [],
+               lambda r, tra, p: model.early_retirement_ready(r, tra),
+               inputs=['traditional_retirement_age']),
+    ColumnSpec('late_retirement', [RETIREMENT], [],
+               lambda r, tra, p: model.late_retirement(r, tra),
+               inputs=['traditional_retirement_age']),
+    ColumnSpec('on_time_retirement', [RETIREMENT], [], lambda r, tra, p: tra <= r,
+               inputs=['traditional_retirement_age'], dtype=np.bool_),
+    ColumnSpec('traditional_grade', [], [], lambda e, l, p: model.traditional_grade(e, l),
+               inputs=['early_retirement_ready', 'late_retirement'], dtype=np.int8),
+    ColumnSpec('status_color', [], [], lambda g, p: model.status_color(g),
+               inputs=['traditional_grade'], dtype=np.int8),
+    # Post-retirement drawdown, from the exact wealth at retirement
+    ColumnSpec('depletion_age', [AGE, SAVINGS, MONTHLY, RETIREMENT, EXPENSES, INCOME],
+               ['return_rate', 'horizon_age'] + PENSION_PARAMS,
+               lambda a, s, m, r, e, i, p: model.drawdown(
+                   r, model.projected_wealth(a, s, m, r, p), e, i, p)[0], dtype=np.float32),
+    ColumnSpec('terminal_wealth', [AGE, SAVINGS, MONTHLY, RETIREMENT, EXPENSES, INCOME],
+               ['return_rate', 'horizon_age'] + PENSION_PARAMS,
+               lambda a, s, m, r, e, i, p: model.drawdown(
+                   r, model.projected_wealth(a, s, m, r, p), e, i, p)[1], dtype=np.float32),
+]
+
+# Columns computed here that the v4 snapshot does not carry
+DERIVED = ['depletion_age', 'terminal_wealth']
+
+SPEC_BY_NAME = {s.name: s for s in SPECS}
+
+# Timelines are CSR rather than a grid column and are handled separately
+TIMELINE_DIMS = [AGE, SAVINGS, MONTHLY, RETIREMENT]
+TIMELINE_PARAMS = ['return_rate', 'start_year', 'timeline_step']
+
+
+def column_dims(name):
+    """All bucket dimensions a column depends on, directly or via its inputs"""
+    spec = SPEC_BY_NAME[name]
+    dims = set(spec.dims)
+    for upstream in spec.inputs:
+        dims |= set(column_dims(upstream))
+    return [d for d in DIMENSIONS if d in dims]
+
+
+def column_params(name):
+    spec = SPEC_BY_NAME[name]
+    params = set(spec.params)
+    for upstream in spec.inputs:
+        params |= column_params(upstream)
+    return params
+
+
+def plan(assumptions=None, midpoints=None, base_assumptions=None, base_midpoints=None):
+    """Work out which columns need recomputing, and over which levels.
+
+    Returns ``{column: region}`` in dependency order, where ``region`` maps
+    each dimension whose midpoints changed to the affected level indices.
+    A changed assumption invalidates the whole column; a changed midpoint
+    only the slices at the changed levels.  ``'wealth_timeline'`` appears in
+    the plan when the timelines are affected.
+    """
+    base_assumptions = base_assumptions or model.ASSUMPTIONS
+    base_midpoints = base_midpoints or LEVEL_MIDPOINTS
+    changed_params = {k for k, v in (assumptions or {}).items() if base_assumptions.get(k) != v}
+    changed_levels = {}
+    for dim, values in (midpoints or {}).items():
+        if dim not in MIDPOINT_COLUMNS:
+            raise KeyError(f"{dim} has no midpoint column")
+        if len(values) != len(LEVELS[dim]):
+            raise ValueError(f"{dim} needs {len(LEVELS[dim])} midpoints, got {len(values)}")
+        moved = np.flatnonzero(np.asarray(values, dtype=np.float64) != np.asarray(base_midpoints[dim], dtype=np.float64))
+        if len(moved):
+            changed_levels[dim] = moved
+
+    result = {}
+    for spec in SPECS:
+        region = _region(column_dims(spec.name), column_params(spec.name), changed_params, changed_levels)
+        if region is not None:
+            result[spec.name] = region
+    region = _region(TIMELINE_DIMS, set(TIMELINE_PARAMS), changed_params, changed_levels)
+    if region is not None:
+        result['wealth_timeline'] = region
+    return result
+
+
+def _region(dims, params, changed_params, changed_levels):
+    if params & changed_params:
+        return {}
+    touched = {d: changed_levels[d] for d in dims if d in changed_levels}
+    if not touched:
+        return None
+    if len(touched) > 1:
+        # Several moved axes: the affected set is a union of slabs, which we
+        # cover with the full column rather than enumerating the overlaps
+        return {}
+    return touched
+
+
+def recompute(grid, assumptions=None, midpoints=None, base_assumptions=None, base_midpoints=None):
+    """New ScenarioGrid with only the affected columns/slices recomputed.
+
+    ``base_assumptions``/``base_midpoints`` describe what ``grid`` was built
+    with (defaults: the published snapshot).  Returns ``(grid, report)``
+    where ``report`` maps recomputed column -> cells written and seconds.
+    """
+    p = model.params(**dict(base_assumptions or {}, **(assumptions or {})))
+    mids = dict(base_midpoints or LEVEL_MIDPOINTS)
+    mids.update(midpoints or {})
+    work = plan(assumptions, midpoints, base_assumptions, base_midpoints)
+    # Derived columns the grid does not carry yet are left for add_columns
+    work = {n: r for n, r in work.items() if n == 'wealth_timeline' or n in grid.columns}
+
+    columns = dict(grid.columns)
+    report = {}
+    for name, region in work.items():
+        started = time.perf_counter()
+        if name == 'wealth_timeline':
+            timelines, cells = _recompute_timelines(grid, region, mids, p)
+        else:
+            columns[name], cells = _recompute_column(SPEC_BY_NAME[name], columns, region, mids, p)
+        report[name] = {'cells': cells, 'seconds': time.perf_counter() - started}
+    new_grid = ScenarioGrid(columns, grid.timelines, grid.meta, mids)
+    if 'wealth_timeline' in work:
+        new_grid.timelines = timelines
+    return new_grid, report
+
+
+def add_columns(grid, names=DERIVED, assumptions=None):
+    """Compute model columns a loaded snapshot lacks and attach them (in place)"""
+    p = model.params(**(assumptions or {}))
+    for spec in SPECS:
+        if spec.name in names and spec.name not in grid.columns:
+            grid.columns[spec.name], _ = _recompute_column(spec, grid.columns, {}, grid.midpoints, p)
+    return grid
+
+
+def build(assumptions=None, midpoints=None, with_timelines=True):
+    """Full rebuild of every column from the model (the baseline to beat).
+
+    Matches the v4 snapshot except ``projected_wealth`` on 5,760 cells, one
+    float32 step (at most 0.5 yen) apart; see ``compass.model``.
+    """
+    p = model.params(**(assumptions or {}))
+    mids = dict(LEVEL_MIDPOINTS)
+    mids.update(midpoints or {})
+    columns = {}
+    for spec in SPECS:
+        columns[spec.name], _ = _recompute_column(spec, columns, {}, mids, p)
+    timelines = None
+    if with_timelines:
+        timelines = _full_timelines(mids, p)
+    return ScenarioGrid(columns, timelines, midpoints=mids)
+
+
+def _levels(dim, region):
+    return region[dim] if dim in region else np.arange(len(LEVELS[dim]))
+
+
+def _recompute_column(spec, columns, region, mids, p):
+    dims = column_dims(spec.name)
+    levels = [_levels(d, region) for d in DIMENSIONS]
+
+    # Evaluate on the reduced mesh: affected levels on the column's own axes,
+    # a single entry on every axis the column does not depend on
+    args = []
+    for d in spec.dims:
+        shape = [1] * len(DIMENSIONS)
+        shape[axis(d)] = len(levels[axis(d)])
+        args.append(np.asarray(mids[d], dtype=np.float64)[levels[axis(d)]].reshape(shape))
+    for upstream in spec.inputs:
+        values = columns[upstream].reshape(GRID_SHAPE)
+        for ax, d in enumerate(DIMENSIONS):
+            idx = levels[ax] if d in dims else [0]
+            values = np.take(values, idx, axis=ax)
+        args.append(values)
+    local = np.asarray(spec.compute(*args, p)).astype(spec.dtype)
+
+    if not region:
+        full = np.broadcast_to(local, GRID_SHAPE).ravel().copy()
+        return full, GRID_SIZE
+    out = columns[spec.name].copy().reshape(GRID_SHAPE)
+    index = np.ix_(*levels)
+    target_shape = tuple(len(l) for l in levels)
+    out[index] = np.broadcast_to(local, target_shape)
+    return out.ravel(), int(np.prod(target_shape))
+
+
+def _row_inputs(rows, mids):
+    codes = np.unravel_index(rows, GRID_SHAPE)
+    return [np.asarray(mids[d], dtype=np.float64)[codes[axis(d)]] for d in TIMELINE_DIMS]
+
+
+def _full_timelines(mids, p):
+    age, savings, monthly, retirement = _row_inputs(np.arange(GRID_SIZE), mids)
+    return model.build_timelines(age, retirement, savings, monthly, p)
+
+
+def _recompute_timelines(grid, region, mids, p):
+    if not region or grid.timelines is None:
+        return _full_timelines(mids, p), GRID_SIZE
+    # Only rows on the changed levels get new timelines; the rest are copied
+    # through unchanged when the CSR arrays are stitched back together
+    (dim, moved), = region.items()
+    codes = np.unravel_index(np.arange(GRID_SIZE), GRID_SHAPE)[axis(dim)]
+    rows = np.flatnonzero(np.isin(codes, moved))
+    age, savings, monthly, retirement = _row_inputs(rows, mids)
+    fresh = model.build_timelines(age, retirement, savings, monthly, p)
+
+    old = grid.timelines
+    lengths = np.diff(old.offsets)
+    lengths[rows] = np.diff(fresh.offsets)
+    offsets = np.zeros(GRID_SIZE + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    keep = np.ones(GRID_SIZE, dtype=bool)
+    keep[rows] = False
+    kept = np.flatnonzero(keep)
+
+    arrays = []
+    for name in ('age', 'wealth', 'year'):
+        out = np.empty(offsets[-1], dtype=getattr(old, name).dtype)
+        _scatter(out, offsets, kept, getattr(old, name), old.offsets)
+        _scatter(out, offsets, rows, getattr(fresh, name), fresh.offsets, packed=True)
+        arrays.append(out)
+    from .grid import Timelines
+    return Timelines(offsets, *arrays), len(rows)
+
+
+def _scatter(out, offsets, rows, values, src_offsets, packed=False):
+    """Copy CSR rows from ``values`` into ``out`` at the new ``offsets``"""
+    if packed:
+        starts = src_offsets[:-1]
+        lengths = np.diff(src_offsets)
+    else:
+        starts = src_offsets[rows]
+        lengths = src_offsets[rows + 1] - starts
+    total = int(lengths.sum())
+    within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    out[np.repeat(offsets[rows], lengths) + within] = values[np.repeat(starts, lengths) + within]
@@ -0,0 +1,487 @@
+"""Point lookups on the S3 parquet export with HTTP byte-range reads.
+
+Nothing is downloaded up front.  For every part file the footer and its page
+index (the offset index parquet-mr writes next to the footer) are fetched
+once and cached in ``index_dir``, keyed by ETag, along with a locator giving
+the part file and row of every scenario.  A lookup then resolves to one data
+page per column and fetches those pages, plus any dictionary page it has not
+seen yet, with concurrent range GETs through one pooled client.  Pages are
+decoded here rather than by pyarrow, which can only read whole column
+chunks.  The key columns (``pk``, ``sk``, buckets and midpoints) are never
+fetched: the sort key already holds them.
+
+The decoder covers what the export uses: data pages v1 and v2, PLAIN and
+dictionary encodings, the codecs pyarrow ships, flat columns and lists of
+structs.  ``RangeReader.stats`` counts requests and bytes so the cost of a
+lookup can be reported in bytes.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .grid import DIMENSIONS, GRID_SIZE, MIDPOINT_COLUMNS, table_positions
+
+INDEX_DIR = './s3_index'
+TAIL_BYTES = 64 * 1024      # first guess at footer + page index size
+MERGE_GAP = 4 * 1024        # ranges closer than this are fetched as one
+WORKERS = 16
+KEY_COLUMNS = {'pk', 'sk'} | set(DIMENSIONS) | set(MIDPOINT_COLUMNS.values())
+CODECS = {0: None, 1: 'snappy', 2: 'gzip', 4: 'brotli', 6: 'zstd'}
+
+
+# Thrift compact protocol, just enough for FileMetaData, OffsetIndex and PageHeader.
+# Structs decode to {field id: value}.
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def _value(buf, pos, kind):
+    if kind in (1, 2):
+        return kind == 1, pos
+    if kind == 3:
+        return struct.unpack_from('<b', buf, pos)[0], pos + 1
+    if kind in (4, 5, 6):
+        n, pos = _varint(buf, pos)
+        return _zigzag(n), pos
+    if kind == 7:
+        return struct.unpack_from('<d', buf, pos)[0], pos + 8
+    if kind == 8:
+        n, pos = _varint(buf, pos)
+        return bytes(buf[pos:pos + n]), pos + n
+    if kind in (9, 10):
+        header = buf[pos]
+        pos += 1
+        size, element = header >> 4, header & 0x0f
+        if size == 15:
+            size, pos = _varint(buf, pos)
+        out = []
+        for _ in range(size):
+            if element in (1, 2):
+                out.append(buf[pos] == 1)
+                pos += 1
+            else:
+                value, pos = _value(buf, pos, element)
+                out.append(value)
+        return out, pos
+    if kind == 11:
+        size, pos = _varint(buf, pos)
+        out = {}
+        if size:
+            types = buf[pos]
+            pos += 1
+            for _ in range(size):
+                k, pos = _value(buf, pos, types >> 4)
+                out[k], pos = _value(buf, pos, types & 0x0f)
+        return out, pos
+    if kind == 12:
+        return read_struct(buf, pos)
+    raise ValueError(f"Unknown thrift type {kind}")
+
+
+def read_struct(buf, pos=0):
+    """One compact-protocol struct at ``pos``; returns ``(fields, end)``"""
+    fields = {}
+    last = 0
+    while True:
+        header = buf[pos]
+        pos += 1
+        if header == 0:
+            return fields, pos
+        kind, delta = header & 0x0f, header >> 4
+        if delta:
+            field = last + delta
+        else:
+            n, pos = _varint(buf, pos)
+            field = _zigzag(n)
+        fields[field], pos = _value(buf, pos, kind)
+        last = field
+
+
+# Page decoding
+
+def _hybrid(buf, pos, end, width, count):
+    """RLE / bit-packed hybrid run of ``count`` integers of ``width`` bits"""
+    out = np.zeros(count, dtype=np.int64)
+    if width == 0:
+        return out
+    n = 0
+    byte_width = (width + 7) // 8
+    powers = 1 << np.arange(width, dtype=np.int64)
+    while n < count and pos < end:
+        header, pos = _varint(buf, pos)
+        if header & 1:
+            nbytes = (header >> 1) * width
+            bits = np.unpackbits(np.frombuffer(buf, np.uint8, nbytes, pos), bitorder='little')
+            values = bits.reshape(-1, width) @ powers
+            take = min(len(values), count - n)
+            out[n:n + take] = values[:take]
+            pos += nbytes
+        else:
+            value = int.from_bytes(buf[pos:pos + byte_width], 'little')
+            pos += byte_width
+            take = min(header >> 1, count - n)
+            out[n:n + take] = value
+        n += take
+    return out
+
+
+def _plain(buf, pos, physical, count):
+    if physical == 0:
+        bits = np.unpackbits(np.frombuffer(buf, np.uint8, (count + 7) // 8, pos), bitorder='little')
+        return bits[:count].astype(bool)
+    if physical in (1, 2, 4, 5):
+        dtype = {1: '<i4', 2: '<i8', 4: '<f4', 5: '<f8'}[physical]
+        return np.frombuffer(buf, dtype, count, pos)
+    if physical == 6:
+        out = np.empty(count, dtype=object)
+        for i in range(count):
+            n = int.from_bytes(buf[pos:pos + 4], 'little')
+            out[i] = bytes(buf[pos + 4:pos + 4 + n]).decode()
+            pos += 4 + n
+        return out
+    raise NotImplementedError(f"Parquet physical type {physical}")
+
+
+def _decompress(body, codec, size):
+    if CODECS[codec] is None:
+        return body
+    import pyarrow as pa
+    return pa.Codec(CODECS[codec]).decompress(body, decompressed_size=size).to_pybytes()
+
+
+def _levels(data, pos, max_level, count):
+    """Length-prefixed level run of a v1 data page"""
+    if max_level == 0:
+        return np.zeros(count, dtype=np.int64), pos
+    length = int.from_bytes(data[pos:pos + 4], 'little')
+    return _hybrid(data, pos + 4, pos + 4 + length, max_level.bit_length(), count), pos + 4 + length
+
+
+def _values(data, pos, encoding, leaf, count, dictionary):
+    if encoding == 0:
+        return _plain(data, pos, leaf['type'], count)
+    if encoding in (2, 8):
+        indices = _hybrid(data, pos + 1, len(data), data[pos], count)
+        return dictionary[indices]
+    if encoding == 3 and leaf['type'] == 0:
+        return _hybrid(data, pos + 4, len(data), 1, count).astype(bool)
+    raise NotImplementedError(f"Parquet encoding {encoding}")
+
+
+def decode_pages(buf, leaf, codec, dictionary=None):
+    """Every page in ``buf``: ``(dictionary, repetition levels, definition levels, values)``"""
+    pos = 0
+    reps, defs, values = [], [], []
+    while pos < len(buf):
+        header, pos = read_struct(buf, pos)
+        body = buf[pos:pos + header[3]]
+        pos += header[3]
+        if header[1] == 2:
+            data = _decompress(body, codec, header[2])
+            dictionary = _plain(data, 0, leaf['type'], header[7][1])
+        elif header[1] == 0:
+            page = header[5]
+            data = _decompress(body, codec, header[2])
+            rep, p = _levels(data, 0, leaf['max_rep'], page[1])
+            dfn, p = _levels(data, p, leaf['max_def'], page[1])
+            count = int(np.count_nonzero(dfn == leaf['max_def']))
+            reps.append(rep), defs.append(dfn)
+            values.append(_values(data, p, page[2], leaf, count, dictionary))
+        elif header[1] == 3:
+            page = header[8]
+            n, rep_len, def_len = page[1], page.get(6, 0), page.get(5, 0)
+            rep = (_hybrid(body, 0, rep_len, leaf['max_rep'].bit_length(), n) if leaf['max_rep']
+                   else np.zeros(n, dtype=np.int64))
+            dfn = (_hybrid(body, rep_len, rep_len + def_len, leaf['max_def'].bit_length(), n) if leaf['max_def']
+                   else np.zeros(n, dtype=np.int64))
+            data = body[rep_len + def_len:]
+            if page.get(7, True):
+                data = _decompress(data, codec, header[2] - rep_len - def_len)
+            count = int(np.count_nonzero(dfn == leaf['max_def']))
+            reps.append(rep), defs.append(dfn)
+            values.append(_values(data, 0, page[4], leaf, count, dictionary))
+    if not values:
+        return dictionary, None, None, None
+    return dictionary, np.concatenate(reps), np.concatenate(defs), np.concatenate(values)
+
+
+class Page:
+    """Decoded levels and values of one data page, starting at row ``first_row`` of its row group"""
+
+    def __init__(self, leaf, first_row, rep, dfn, values):
+        self.leaf = leaf
+        self.first_row = first_row
+        self.values = values
+        self.present = dfn == leaf['max_def']
+        self.before = np.concatenate([[0], np.cumsum(self.present)])
+        self.dfn = dfn
+        self.starts = np.append(np.flatnonzero(rep == 0), len(rep))
+
+    def row(self, r):
+        """Value of row ``r`` (row-group numbering); a list of element values for repeated leaves"""
+        k = r - self.first_row
+        a, b = self.starts[k], self.starts[k + 1]
+        if not self.leaf['max_rep']:
+            return self.values[self.before[a]] if self.present[a] else None
+        if self.dfn[a] < self.leaf['list_def']:
+            # No elements: a null list, or an empty one when the list itself is defined
+            return None if self.dfn[a] < self.leaf['list_def'] - 1 else []
+        out = []
+        for i in range(a, b):
+            out.append(self.values[self.before[i]] if self.present[i] else None)
+        return out
+
+
+def _leaves(schema):
+    """Leaf columns by dotted path with physical type and max definition/repetition levels"""
+    leaves = {}
+    pos = 1
+
+    def walk(path, max_def, max_rep, list_def):
+        nonlocal pos
+        element = schema[pos]
+        pos += 1
+        repetition = element.get(3, 0)
+        path = path + (element[4].decode(),)
+        max_def += repetition != 0
+        if repetition == 2:
+            max_rep += 1
+            list_def = max_def
+        children = element.get(5, 0)
+        if not children:
+            leaves['.'.join(path)] = {'type': element[1], 'max_def': max_def, 'max_rep': max_rep,
+                                      'list_def': list_def}
+        for _ in range(children):
+            walk(path, max_def, max_rep, list_def)
+
+    for _ in range(schema[0].get(5, 0)):
+        walk((), 0, 0, None)
+    return leaves
+
+
+def _merge(ranges):
+    """Coalesce ``(start, stop)`` ranges that are within MERGE_GAP of each other"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start - merged[-1][1] <= MERGE_GAP:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+class RangeReader:
+    """Byte-range GETs on one bucket through a pooled client, with request/byte counters"""
+
+    def __init__(self, client, bucket, workers=WORKERS):
+        self.client = client
+        self.bucket = bucket
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.stats = {'requests': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key, start, stop):
+        body = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{stop - 1}")['Body'].read()
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(body)
+        return body
+
+    def get_ranges(self, wanted):
+        """``{(key, start, stop): bytes}`` for every wanted range, fetched concurrently after coalescing"""
+        merged = []
+        by_key = {}
+        for key, start, stop in wanted:
+            by_key.setdefault(key, []).append((start, stop))
+        for key, ranges in by_key.items():
+            merged += [(key, a, b) for a, b in _merge(ranges)]
+        bodies = dict(zip(merged, self.pool.map(lambda r: self.get(*r), merged)))
+        out = {}
+        for key, start, stop in wanted:
+            for (k, a, b), body in bodies.items():
+                if k == key and a <= start and stop <= b:
+                    out[(key, start, stop)] = body[start - a:stop - a]
+                    break
+        return out
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def read_part_index(reader, key, size):
+    """Footer and offset index of one part file as a JSON-able dict"""
+    tail_start = max(0, size - TAIL_BYTES)
+    tail = reader.get(key, tail_start, size)
+    if tail[-4:] != b'PAR1':
+        raise ValueError(f"{key} is not a parquet file")
+    footer_length = int.from_bytes(tail[-8:-4], 'little')
+    if footer_length + 8 > len(tail):
+        tail_start = size - footer_length - 8
+        tail = reader.get(key, tail_start, size)
+    meta, _ = read_struct(tail, len(tail) - 8 - footer_length)
+
+    chunks = [c for g in meta[4] for c in g[1]]
+    located = [c for c in chunks if 4 in c]
+    page_index, base = tail, tail_start
+    if located:
+        lo = min(c[4] for c in located)
+        if lo < tail_start:
+            page_index, base = reader.get(key, lo, max(c[4] + c[5] for c in located)), lo
+
+    groups = []
+    first = 0
+    for g in meta[4]:
+        columns = {}
+        for c in g[1]:
+            m = c[3]
+            start = m.get(11) or m[9]
+            stop = start + m[7]
+            if 4 in c:
+                locations = read_struct(page_index, c[4] - base)[0][1]
+                pages = [[p[1], p[1] + p[2], p[3]] for p in locations]
+            else:
+                pages = [[m[9], stop, 0]]   # no page index: the whole chunk is one "page"
+            columns['.'.join(p.decode() for p in m[3])] = {
+                'codec': m[4], 'dictionary': [start, pages[0][0]] if m.get(11) else None, 'pages': pages}
+        groups.append({'first_row': first, 'num_rows': g[3], 'columns': columns})
+        first += g[3]
+    return {'key': key, 'size': size, 'leaves': _leaves(meta[2]), 'row_groups': groups}
+
+
+class S3Parquet:
+    """Row reads from the parquet part files under ``s3://bucket/prefix`` by page-sized range GETs"""
+
+    def __init__(self, client, bucket, prefix='', index_dir=INDEX_DIR, workers=WORKERS):
+        self.reader = RangeReader(client, bucket, workers)
+        self.prefix = prefix
+        self.index_dir = index_dir
+        self._dictionaries = {}
+        self._lock = threading.Lock()
+
+        objects = []
+        for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            objects += [o for o in page.get('Contents', []) if o['Key'].endswith('.parquet')]
+        objects.sort(key=lambda o: o['Key'])
+        self.parts = list(self.reader.pool.map(self._part_index, objects))
+        self.partitions = [dict(p.split('=', 1) for p in os.path.dirname(part['key'][len(prefix):]).split('/')
+                                if '=' in p) for part in self.parts]
+        self.file, self.group, self.row = self._locator(objects)
+
+    def _cache_path(self, *parts):
+        os.makedirs(self.index_dir, exist_ok=True)
+        return os.path.join(self.index_dir, hashlib.sha1('\0'.join(parts).encode()).hexdigest() + '.json')
+
+    def _part_index(self, obj):
+        path = self._cache_path(obj['Key'], obj['ETag'])
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        index = read_part_index(self.reader, obj['Key'], obj['Size'])
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(index, f)
+        os.replace(f"{path}.tmp", path)
+        return index
+
+    def _locator(self, objects):
+        """Part file, row group and row of every grid position (cached per set of ETags)"""
+        path = self._cache_path('locator', *(f"{o['Key']}:{o['ETag']}" for o in objects))[:-5] + '.npz'
+        if os.path.exists(path):
+            saved = np.load(path)
+            return saved['part'], saved['group'], saved['row']
+        import pyarrow as pa
+
+        file = np.empty(GRID_SIZE, dtype=np.uint16)
+        group = np.empty(GRID_SIZE, dtype=np.uint16)
+        row = np.empty(GRID_SIZE, dtype=np.uint32)
+        for k, part in enumerate(self.parts):
+            for g, rg in enumerate(part['row_groups']):
+                stored = [d for d in DIMENSIONS if d in rg['columns']]
+                chunks = {d: (part['key'], *self._chunk(rg['columns'][d])) for d in stored}
+                bodies = self.reader.get_ranges(chunks.values())
+                columns = {d: decode_pages(bodies[chunks[d]], part['leaves'][d], rg['columns'][d]['codec'])[3]
+                           for d in stored}
+                columns.update({d: [self.partitions[k][d]] * rg['num_rows'] for d in DIMENSIONS if d not in stored})
+                positions = table_positions(pa.table(columns))
+                file[positions] = k
+                group[positions] = g
+                row[positions] = np.arange(rg['num_rows'])
+        np.savez(path, part=file, group=group, row=row)
+        return file, group, row
+
+    @staticmethod
+    def _chunk(column):
+        start = column['dictionary'][0] if column['dictionary'] else column['pages'][0][0]
+        return start, column['pages'][-1][1]
+
+    def read(self, positions, columns=None):
+        """Records (dicts of top-level columns) for grid ``positions``; key columns are left out"""
+        plan = []
+        wanted = set()
+        for i in positions:
+            k, g, r = int(self.file[i]), int(self.group[i]), int(self.row[i])
+            part = self.parts[k]
+            rg = part['row_groups'][g]
+            leaves = [p for p in rg['columns'] if p.split('.')[0] not in KEY_COLUMNS
+                      and (columns is None or p.split('.')[0] in columns)]
+            for path in leaves:
+                column = rg['columns'][path]
+                page = max(n for n, p in enumerate(column['pages']) if p[2] <= r)
+                start, stop = column['pages'][page][:2]
+                wanted.add((part['key'], start, stop))
+                if column['dictionary'] and (k, g, path) not in self._dictionaries:
+                    wanted.add((part['key'], *column['dictionary']))
+                plan.append((k, g, r, path, page))
+        bodies = self.reader.get_ranges(wanted)
+
+        pages = {}
+        for k, g, r, path, page in plan:
+            if (k, g, path, page) in pages:
+                continue
+            part = self.parts[k]
+            column = part['row_groups'][g]['columns'][path]
+            leaf = part['leaves'][path]
+            dictionary = self._dictionaries.get((k, g, path))
+            if dictionary is None and column['dictionary']:
+                dictionary = decode_pages(bodies[(part['key'], *column['dictionary'])], leaf, column['codec'])[0]
+                with self._lock:
+                    self._dictionaries[(k, g, path)] = dictionary
+            start, stop, first_row = column['pages'][page]
+            _, rep, dfn, values = decode_pages(bodies[(part['key'], start, stop)], leaf, column['codec'], dictionary)
+            pages[(k, g, path, page)] = Page(leaf, first_row, rep, dfn, values)
+
+        records = {}
+        for k, g, r, path, page in plan:
+            record = records.setdefault((k, g, r), dict(self.partitions[k]))
+            value = pages[(k, g, path, page)].row(r)
+            name, _, rest = path.partition('.')
+            if not rest:
+                record[name] = value
+            elif rest.startswith('list.element.'):
+                field = rest[len('list.element.'):]
+                items = record.setdefault(name, None if value is None else [{} for _ in value])
+                for item, v in zip(items or [], value or []):
+                    item[field] = v
+            else:
+                raise NotImplementedError(f"Nested column {path}")
+        return [records.get((int(self.file[i]), int(self.group[i]), int(self.row[i]))) for i in positions]
+
+    def close(self):
+        self.reader.close()
@@ -0,0 +1,80 @@
+"""One-step neighbourhood sensitivity for a profile.
+
+A "neighbour" is the same profile with one controllable bucket moved one
+level up or down.  Because the grid is dense, every neighbour is the base
+cell plus a fixed stride, so the whole neighbourhood is a single fancy-index
+read per column.
+"""
+
+import numpy as np
+
+from .grid import CATEGORIES, GRID_SHAPE, LEVELS, axis, flat_index
+
+# Buckets a user can act on (the rest describe who they are)
+CONTROLLABLE = [
+    'monthly_savings_bucket',
+    'expected_expenses_bucket',
+    'retirement_age_bucket',
+    'housing_status',
+]
+
+# housing_status has no natural order, so every other status is a neighbour
+NOMINAL = {'housing_status'}
+
+STRIDES = {d: int(np.prod(GRID_SHAPE[axis(d) + 1:])) for d in CONTROLLABLE}
+
+REPORTED = ['fire_percentage', 'status_color', 'traditional_retirement_age', 'projected_wealth']
+
+
+def neighbour_moves(base_index, dims=CONTROLLABLE):
+    """(dimension, from_code, to_code, flat_index) for every one-step move"""
+    codes = np.unravel_index(base_index, GRID_SHAPE)
+    moves = []
+    for dim in dims:
+        here = int(codes[axis(dim)])
+        if dim in NOMINAL:
+            targets = [c for c in range(len(LEVELS[dim])) if c != here]
+        else:
+            targets = [c for c in (here - 1, here + 1) if 0 <= c < len(LEVELS[dim])]
+        for there in targets:
+            moves.append((dim, here, there, base_index + (there - here) * STRIDES[dim]))
+    return moves
+
+
+def sensitivity(grid, dims=CONTROLLABLE, **buckets):
+    """Effect of each one-bucket move on the profile's outcome.
+
+    Returns ``{'base': {...}, 'moves': {...}}`` where ``moves`` holds
+    parallel lists (ready for ``pd.DataFrame``) with the move, the
+    neighbour's values and the change versus the base profile.
+    """
+    base = int(flat_index(**buckets))
+    moves = neighbour_moves(base, dims)
+    index = np.array([base] + [m[3] for m in moves], dtype=np.int64)
+
+    values = {name: grid.columns[name][index] for name in REPORTED}
+    fire = values['fire_percentage'].astype(np.float64)
+    tra = values['traditional_retirement_age'].astype(np.float64)
+    status = values['status_color']
+    labels = CATEGORIES['status_color']
+
+    moves_table = {
+        'dimension': [m[0] for m in moves],
+        'from_level': [LEVELS[m[0]][m[1]] for m in moves],
+        'to_level': [LEVELS[m[0]][m[2]] for m in moves],
+        'direction': ['change' if m[0] in NOMINAL else ('up' if m[2] > m[1] else 'down') for m in moves],
+        'fire_percentage': fire[1:].tolist(),
+        'fire_percentage_change': (fire[1:] - fire[0]).round(1).tolist(),
+        'status_color': [labels[s] for s in status[1:]],
+        'status_changed': (status[1:] != status[0]).tolist(),
+        'traditional_retirement_age': tra[1:].tolist(),
+        'retirement_age_change': (tra[1:] - tra[0]).tolist(),
+        'projected_wealth': values['projected_wealth'][1:].astype(np.float64).tolist(),
+    }
+    base_values = {
+        'fire_percentage': float(fire[0]),
+        'status_color': labels[status[0]],
+        'traditional_retirement_age': float(tra[0]),
+        'projected_wealth': float(values['projected_wealth'][0]),
+    }
+    return {'base': base_values, 'moves': moves_table}
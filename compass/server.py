@@ -0,0 +1,382 @@
+"""Async JSON scoring API over the scenario grid.
+
+One process loads the grid once and serves every lookup through
+``flat_index``, an O(1) position in the dense grid.  Loading takes a few
+seconds, so it runs in the background: within a fraction of a second of
+starting the server answers scenario and timeline lookups with parquet
+point reads (``backends.ParquetBackend``), then switches to the grid once it
+is in memory.  Cohorts need the whole grid and wait for it.  The HTTP/1.1 layer is a small
+``asyncio`` streams server: persistent connections, gzip or zstd response
+compression (zstd when the ``zstandard`` package is installed), and plain
+JSON in and out.
+
+    GET  /scenario?age_bucket=30-34&...   or  /scenario?sk=combo__...
+    POST /scenarios   {"profiles": [{...}, ...]}  or  {"keys": ["combo__...", ...]}
+    GET  /timeline?<same as /scenario>
+    GET  /cohort?column=fire_percentage&by=age_bucket,income_bucket&stat=mean
+    GET  /ready   200 once lookups are served ("mode": "interim" or "full"), 503 before
+    GET  /health  200 while the process is up, with the load progress
+
+Run with ``python -m compass.server --port 8080``; ``utils/bench_server.py``
+measures requests per second against it.
+"""
+
+import argparse
+import asyncio
+import functools
+import gzip
+import json
+import math
+import threading
+import time
+import traceback
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from .backends import key_at
+from .grid import DIMENSIONS, flat_index, parse_sort_key, sort_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_COMPRESS = 1024          # bytes; smaller bodies are sent as is
+KEEP_ALIVE_TIMEOUT = 15      # seconds an idle connection is kept open
+MAX_BATCH = 1000
+MAX_BODY = 1 << 20           # bytes; larger request bodies are refused with 413 unread
+STATS = {'mean': np.mean, 'median': np.median, 'min': np.min, 'max': np.max,
+         'nanmean': np.nanmean, 'std': np.std}
+LOADERS = {
+    'dense': 'compass.grid',
+    'dedup': 'compass.dedup',
+    'factorized': 'compass.factorize',
+    'parametric': 'compass.parametric',
+    'mmap': 'compass.snapshot',
+}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _clean(value):
+    """JSON-safe scalar: NaN becomes null, numpy scalars become Python ones"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class ScoringService:
+    """Lookups, batches, cohorts and timelines for one loaded grid.
+
+    Until the grid is loaded, lookups go to ``interim`` (a storage backend,
+    see ``open_interim``) when there is one.  The pair is swapped as one
+    ``sources`` tuple that lookups read in one step, so none sees neither;
+    lookups made through ``call_interim`` keep the interim backend open until
+    they finish.
+    """
+
+    def __init__(self, grid=None, interim=None):
+        self.sources = (grid, interim)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._retired = None
+        self.loaded_at = time.time() if grid is not None else None
+        self.started_at = time.time()
+        self.progress = {'stage': 'ready' if grid is not None else 'waiting', 'fraction': float(grid is not None)}
+
+    @property
+    def grid(self):
+        return self.sources[0]
+
+    @property
+    def interim(self):
+        return self.sources[1]
+
+    @property
+    def ready(self):
+        return self.grid is not None
+
+    @property
+    def serving(self):
+        return self.grid is not None or self.interim is not None
+
+    @property
+    def mode(self):
+        return 'full' if self.grid is not None else 'interim' if self.interim is not None else None
+
+    def _report(self, stage, fraction):
+        self.progress = {'stage': stage, 'fraction': round(fraction, 3)}
+
+    def open_interim(self, **kwargs):
+        from .backends import ParquetBackend
+        started = time.perf_counter()
+        interim = ParquetBackend(**kwargs)
+        self.sources = (self.grid, interim)
+        return time.perf_counter() - started
+
+    def load(self, form='dense', **kwargs):
+        import importlib
+        started = time.perf_counter()
+        grid = importlib.import_module(LOADERS[form]).load_grid(progress=self._report, **kwargs)
+        with self._lock:
+            interim = self.interim
+            self.sources = (grid, None)
+            if interim is not None and self._in_flight:
+                # Lookups still reading it: the last one to finish closes it
+                self._retired, interim = interim, None
+        self.loaded_at = time.time()
+        self.progress = {'stage': 'ready', 'fraction': 1.0}
+        if interim is not None:
+            interim.close()
+        return time.perf_counter() - started
+
+    def call_interim(self, fn, *args):
+        """``fn(*args)`` in a worker thread while the grid loads; ``load`` defers closing the interim backend"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                retired = self._retired if not self._in_flight else None
+                if retired is not None:
+                    self._retired = None
+            if retired is not None:
+                retired.close()
+
+    def status(self):
+        return {'mode': self.mode, 'progress': self.progress, 'uptime': round(time.time() - self.started_at, 3),
+                'loaded_at': self.loaded_at}
+
+    def _index(self, query):
+        try:
+            buckets = parse_sort_key(query['sk']) if 'sk' in query else query
+        except KeyError as e:
+            raise HTTPError(400, str(e.args[0])) from None
+        missing = [d for d in DIMENSIONS if d not in buckets]
+        if missing:
+            raise HTTPError(400, f"Missing bucket(s): {', '.join(missing)}")
+        try:
+            return int(flat_index(**buckets))
+        except KeyError as e:
+            raise HTTPError(400, str(e.args[0])) from None
+
+    def _rows(self, indices):
+        grid, interim = self.sources
+        if grid is None:
+            # Still loading: one batched point read for every valid index
+            found = iter(interim.get_many([key_at(i) for i in indices if i is not None]))
+            return [None if i is None else next(found) for i in indices]
+        return [None if i is None else {k: _clean(v) for k, v in grid.row(i).items()} for i in indices]
+
+    def scenario(self, query):
+        return self._rows([self._index(query)])[0]
+
+    def scenarios(self, body):
+        items = body.get('profiles')
+        if items is None:
+            keys = body.get('keys', [])
+            if not isinstance(keys, list) or not all(isinstance(sk, str) for sk in keys):
+                raise HTTPError(400, '"keys" must be a list of sort key strings')
+            items = [{'sk': sk} for sk in keys]
+        elif not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPError(400, '"profiles" must be a list of objects')
+        if len(items) > MAX_BATCH:
+            raise HTTPError(413, f"At most {MAX_BATCH} lookups per batch")
+        indices = []
+        for item in items:
+            try:
+                indices.append(self._index(item))
+            except HTTPError:
+                indices.append(None)
+        return {'results': self._rows(indices)}
+
+    def timeline(self, query):
+        i = self._index(query)
+        grid, interim = self.sources
+        if grid is None:
+            return {'sk': key_at(i), 'wealth_timeline': interim.timeline(key_at(i))}
+        return {'sk': sort_key(**grid.buckets(i)), 'wealth_timeline': grid.timelines.row(i)}
+
+    def cohort(self, query):
+        if self.grid is None:
+            raise HTTPError(503, f"Cohorts need the full grid, still loading ({self.progress['stage']})")
+        column = query.get('column')
+        if column not in self.grid.columns:
+            raise HTTPError(400, f"Unknown column: {column!r}")
+        by = tuple(d for d in query.get('by', '').split(',') if d)
+        unknown = [d for d in by if d not in DIMENSIONS]
+        if unknown:
+            raise HTTPError(400, f"Unknown dimension(s): {', '.join(unknown)}")
+        stat = query.get('stat', 'mean')
+        if stat not in STATS:
+            raise HTTPError(400, f"stat must be one of {', '.join(STATS)}")
+        return self._cohort(column, by, stat)
+
+    @functools.lru_cache(maxsize=256)
+    def _cohort(self, column, by, stat):
+        from .cohorts import cohort_table
+        frame = cohort_table(self.grid, column, list(by), reduce=STATS[stat])
+        records = frame.to_dict(orient='records')
+        return {'column': column, 'by': list(by), 'stat': stat,
+                'rows': [{k: _clean(v) for k, v in r.items()} for r in records]}
+
+
+def _encode(payload, accept):
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    if len(body) < MIN_COMPRESS:
+        return body, None
+    if zstandard is not None and 'zstd' in accept:
+        return zstandard.ZstdCompressor(level=3).compress(body), 'zstd'
+    if 'gzip' in accept:
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
+
+
+async def _read_request(reader):
+    """``(method, target, headers, body)``, or None when the client closed the connection.
+
+    ``body`` is None when Content-Length is over ``MAX_BODY``; it is left unread.
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, version = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    headers[':version'] = version
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        return method, target, headers, None
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def make_handler(service):
+    routes = {
+        ('GET', '/scenario'): lambda q, b: service.scenario(q),
+        ('POST', '/scenarios'): lambda q, b: service.scenarios(b),
+        ('GET', '/timeline'): lambda q, b: service.timeline(q),
+        ('GET', '/cohort'): lambda q, b: service.cohort(q),
+    }
+
+    async def respond(method, target, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, dict(service.status(), status='ok')
+        if url.path == '/ready':
+            if not service.serving:
+                return 503, dict(service.status(), ready=False)
+            return 200, dict(service.status(), ready=True)
+        route = routes.get((method, url.path))
+        if route is None:
+            if any(path == url.path for _, path in routes):
+                return 405, {'error': f"{method} not allowed on {url.path}"}
+            return 404, {'error': f"No route {url.path}"}
+        if not service.serving:
+            return 503, {'error': 'Grid is still loading'}
+        try:
+            payload = json.loads(body) if body else {}
+            query = dict(parse_qsl(url.query))
+            if service.grid is None:
+                # Interim parquet reads take tens of milliseconds: run them in a worker thread so the
+                # loop keeps answering /health, /ready and other connections meanwhile
+                loop = asyncio.get_running_loop()
+                return 200, await loop.run_in_executor(None, service.call_interim, route, query, payload)
+            return 200, route(query, payload)
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except (ValueError, AttributeError, TypeError) as e:
+            return 400, {'error': f"Bad request: {e}"}
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                if body is None:
+                    # The body is still on the wire, so the connection cannot carry another request
+                    status, payload = 413, {'error': f"Request body over {MAX_BODY:,} bytes"}
+                    headers['connection'] = 'close'
+                else:
+                    try:
+                        status, payload = await respond(method, target, body)
+                    except Exception as e:
+                        # Whatever slipped past validation, the client gets an answer and the connection lives on
+                        traceback.print_exc()
+                        status, payload = 500, {'error': f"Internal error: {type(e).__name__}"}
+                data, encoding = _encode(payload, headers.get('accept-encoding', ''))
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and headers[':version'] == 'HTTP/1.1')
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", 'Content-Type: application/json',
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if encoding:
+                    head += [f"Content-Encoding: {encoding}", 'Vary: Accept-Encoding']
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            # Dropped mid-body, malformed, or a header block over the stream limit: just close
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(service, host='127.0.0.1', port=8080, form='dense', interim=True, **load_options):
+    """Start listening at once, load the grid in a worker thread, then serve forever.
+
+    With ``interim`` lookups are answered from parquet point reads while the
+    grid loads.
+    """
+    server = await asyncio.start_server(make_handler(service), host, port, reuse_address=True)
+    print(f"🛰️  Listening on http://{host}:{port} (not ready until the grid is loaded)")
+    if not service.ready:
+        loop = asyncio.get_running_loop()
+        if interim and service.interim is None:
+            seconds = await loop.run_in_executor(None, service.open_interim)
+            print(f"⚡ Serving point reads from parquet after {seconds:.2f}s while the grid loads")
+        seconds = await loop.run_in_executor(None, functools.partial(service.load, form, **load_options))
+        print(f"✅ Ready: {len(service.grid):,} scenarios loaded ({form}) in {seconds:.1f}s")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PFM Compass scoring API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--form', choices=sorted(LOADERS), default='dense',
+                        help='in-memory form of the grid (see compass.dedup / factorize / parametric / snapshot)')
+    parser.add_argument('--no-interim', action='store_true',
+                        help='answer 503 until the grid is loaded instead of serving parquet point reads')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(ScoringService(), args.host, args.port, args.form, interim=not args.no_interim))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
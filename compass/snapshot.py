@@ -0,0 +1,85 @@
+"""Binary snapshot of the grid for memory-mapped loading.
+
+A snapshot is a directory of plain ``.npy`` files, one per column plus the
+four timeline CSR arrays, and a ``snapshot.json`` with the snapshot metadata
+and midpoints.  ``load_grid`` maps the arrays read-only instead of reading
+them, so opening is near-instant, only the pages a lookup touches are read,
+and every process mapping the same snapshot shares one copy in the page
+cache.
+
+Build it once from the parquet export with ``save_grid(load_grid())`` (or
+``python -m compass.snapshot``).
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .grid import DATA_DIR, REPO_ROOT, ScenarioGrid, Timelines, load_grid as _load_grid
+
+SNAPSHOT_DIR = os.path.join(REPO_ROOT, 'data', 'pfm_compass_data', 'snapshot')
+MANIFEST = 'snapshot.json'
+TIMELINE_ARRAYS = ['offsets', 'age', 'wealth', 'year']
+
+
+def save_grid(grid, path=SNAPSHOT_DIR):
+    """Write ``grid`` (any in-memory form) as a binary snapshot, replacing ``path`` atomically"""
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, values in grid.columns.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(np.asarray(values)))
+    if grid.timelines is not None:
+        for name in TIMELINE_ARRAYS:
+            np.save(os.path.join(tmp, f"timeline_{name}.npy"), getattr(grid.timelines, name))
+    manifest = {'columns': list(grid.columns), 'timelines': grid.timelines is not None,
+                'meta': grid.meta, 'midpoints': grid.midpoints}
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return path
+
+
+def exists(path=SNAPSHOT_DIR):
+    return os.path.exists(os.path.join(path, MANIFEST))
+
+
+def load_grid(path=SNAPSHOT_DIR, mmap=True, progress=None):
+    """ScenarioGrid over a binary snapshot; arrays are read-only memory maps unless ``mmap=False``"""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    mode = 'r' if mmap else None
+    columns = {}
+    for k, name in enumerate(manifest['columns']):
+        columns[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+        if progress is not None:
+            progress('reading', (k + 1) / len(manifest['columns']))
+    timelines = None
+    if manifest['timelines']:
+        timelines = Timelines(*(np.load(os.path.join(path, f"timeline_{name}.npy"), mmap_mode=mode)
+                                for name in TIMELINE_ARRAYS))
+    return ScenarioGrid(columns, timelines, manifest['meta'], manifest['midpoints'])
+
+
+def ensure(path=SNAPSHOT_DIR, source=DATA_DIR):
+    """Build the snapshot from the parquet export unless it is already there"""
+    if not exists(path):
+        save_grid(_load_grid(source), path)
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Write the binary (mmap) grid snapshot')
+    parser.add_argument('--source', default=DATA_DIR)
+    parser.add_argument('--out', default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    save_grid(_load_grid(args.source), args.out)
+    print(f"💾 Snapshot written to {args.out} in {time.perf_counter() - started:.1f}s")
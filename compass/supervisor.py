@@ -0,0 +1,389 @@
+"""Run N app or API workers on one box behind a local TCP proxy.
+
+One process runs the whole request path (script execution, lookups, JSON
+encoding) under one GIL, so a single worker uses one core however many the
+box has.  The supervisor starts ``--workers`` processes on a port range and
+spreads connections over the ready ones:
+
+    server  ``compass.server --form mmap``: the scoring API
+    app     the Streamlit app through ``compass.warmup`` with
+            ``PFM_BACKEND=mmap``, so no worker holds the pandas table
+
+Every worker maps the same binary snapshot (``compass.snapshot``, built once
+here before any worker starts), so the scenario data sits in the page cache
+once; each worker adds only its interpreter and private state.  Workers that
+exit, fail their ``/ready`` check several times in a row, or are still not
+ready ``START_TIMEOUT`` after starting (a hung warm-up), are restarted with
+backoff.
+
+The proxy forwards raw TCP, so Streamlit's websocket works through it.  The
+``ip`` balance pins a client address to one worker (a Streamlit session and
+its media requests must reach the same process); ``least`` picks the worker
+with the fewest open connections.  ``--no-proxy`` only runs the port range,
+for an external balancer.  ``GET /workers`` on ``--status-port`` reports
+per-worker state, restarts, connections, bytes, CPU and memory (RSS and PSS,
+where the shared snapshot is split between the processes mapping it).
+
+    python -m compass.supervisor --kind server --workers 4 --port 8080
+    python -m compass.supervisor --kind app --workers 4 --port 8501 --app bling/app.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import zlib
+
+from . import snapshot
+from .grid import REPO_ROOT
+
+KINDS = ['server', 'app']
+BALANCES = ['least', 'ip']
+CHECK_INTERVAL = 2.0         # seconds between /ready checks
+MAX_FAILURES = 3             # failed checks in a row before a running worker is restarted
+START_TIMEOUT = 300.0        # seconds a new worker has to pass its first /ready check
+BACKOFF = (1.0, 30.0)        # restart delay: first, max (doubles per quick crash)
+STABLE_AFTER = 60.0          # seconds up after which the backoff resets
+CHUNK = 65536
+
+
+def _proc_stats(pid):
+    """CPU seconds, RSS and PSS (MB) of a process from /proc; zeros where unavailable"""
+    cpu = rss = pss = 0.0
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('Pss:'):
+                    pss = int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return cpu, rss, pss
+
+
+class Worker:
+    """One worker process on ``port``, restarted by the supervisor when it dies"""
+
+    def __init__(self, index, cmd, port, ready_port, env=None):
+        self.index = index
+        self.cmd = cmd
+        self.port = port
+        self.ready_port = ready_port
+        self.env = env
+        self.proc = None
+        self.state = 'stopped'
+        self.restarts = 0
+        self.last_exit = None
+        self.started_at = None
+        self.failures = 0
+        self.backoff = BACKOFF[0]
+        self.retry_at = 0.0
+        self.active = self.connections = self.bytes_in = self.bytes_out = 0
+        self._cpu = (time.monotonic(), 0.0)
+        self.cpu_percent = 0.0
+
+    def start(self):
+        self.proc = subprocess.Popen(self.cmd, env=self.env, cwd=REPO_ROOT)
+        self.state = 'starting'
+        self.started_at = time.monotonic()
+        self.failures = 0
+        self._cpu = (time.monotonic(), 0.0)
+
+    def stop(self, timeout=10):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.state = 'stopped'
+
+    async def terminate(self, timeout=10):
+        """``stop`` for the event loop: polls for the exit so the proxy keeps running meanwhile"""
+        self.state = 'stopping'    # out of the proxy's rotation from now on
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            deadline = time.monotonic() + timeout
+            while self.proc.poll() is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if self.proc.poll() is None:
+                self.proc.kill()
+                while self.proc.poll() is None:
+                    await asyncio.sleep(0.1)
+        self.state = 'stopped'
+
+    def exited(self):
+        """Exit code if the process has ended since the last call, else None"""
+        if self.proc is None or self.state in ('stopping', 'stopped', 'waiting'):
+            return None
+        return self.proc.poll()
+
+    async def schedule_restart(self, reason):
+        await self.terminate()
+        self.last_exit = reason
+        quick = time.monotonic() - (self.started_at or 0) < STABLE_AFTER
+        self.backoff = min(self.backoff * 2, BACKOFF[1]) if quick else BACKOFF[0]
+        self.retry_at = time.monotonic() + self.backoff
+        self.state = 'waiting'
+        print(f"💥 worker {self.index} (:{self.port}) {reason}; restarting in {self.backoff:.0f}s", flush=True)
+
+    def sample(self):
+        """Update ``cpu_percent`` since the last sample; returns (rss, pss) in MB"""
+        if self.proc is None or self.proc.poll() is not None:
+            self.cpu_percent = 0.0
+            return 0.0, 0.0
+        cpu, rss, pss = _proc_stats(self.proc.pid)
+        now = time.monotonic()
+        then, before = self._cpu
+        if now > then and cpu >= before:
+            self.cpu_percent = 100 * (cpu - before) / (now - then)
+        self._cpu = (now, cpu)
+        return rss, pss
+
+    def status(self):
+        rss, pss = self.sample()
+        return {'worker': self.index, 'port': self.port, 'pid': self.proc.pid if self.proc else None,
+                'state': self.state, 'restarts': self.restarts, 'last_exit': self.last_exit,
+                'uptime_s': round(time.monotonic() - self.started_at, 1) if self.started_at else None,
+                'active': self.active, 'connections': self.connections,
+                'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                'cpu_percent': round(self.cpu_percent, 1), 'rss_mb': round(rss, 1), 'pss_mb': round(pss, 1)}
+
+
+def worker_commands(kind, count, base_port, app=None, health_base=None, extra=()):
+    """``(cmd, port, ready_port, env)`` for each of ``count`` workers on consecutive ports"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    out = []
+    for k in range(count):
+        port = base_port + k
+        if kind == 'server':
+            cmd = [sys.executable, '-m', 'compass.server', '--port', str(port), '--form', 'mmap', '--no-interim',
+                   *extra]
+            out.append((cmd, port, port, env))
+        else:
+            health = health_base + k
+            cmd = [sys.executable, '-m', 'compass.warmup', app, '--health-port', str(health),
+                   '--server.port', str(port), '--server.address', '127.0.0.1', '--server.headless', 'true',
+                   *extra]
+            out.append((cmd, port, health, dict(env, PFM_BACKEND=env.get('PFM_BACKEND', 'mmap'))))
+    return out
+
+
+async def _ready(port, timeout=2.0):
+    """True if ``GET /ready`` on localhost:port answers 200"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(b"GET /ready HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        return line.split(b' ')[1:2] == [b'200']
+    except (OSError, asyncio.TimeoutError, IndexError):
+        return False
+    finally:
+        writer.close()
+
+
+class Supervisor:
+    """Starts the workers, keeps them running and proxies connections to the ready ones"""
+
+    def __init__(self, workers, balance='least'):
+        self.workers = workers
+        self.balance = balance
+        self.started_at = time.monotonic()
+        self._next = 0
+
+    def pick(self, client_host):
+        ready = [w for w in self.workers if w.state == 'ready']
+        if not ready:
+            return None
+        if self.balance == 'ip':
+            # Stable over the full worker list, so a restart elsewhere does not move this client
+            w = self.workers[zlib.crc32(client_host.encode()) % len(self.workers)]
+            if w.state == 'ready':
+                return w
+        least = min(w.active for w in ready)
+        candidates = [w for w in ready if w.active == least]
+        self._next += 1
+        return candidates[self._next % len(candidates)]
+
+    async def _pipe(self, reader, writer, worker, attr):
+        try:
+            while True:
+                data = await reader.read(CHUNK)
+                if not data:
+                    break
+                setattr(worker, attr, getattr(worker, attr) + len(data))
+                writer.write(data)
+                await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except OSError:
+                pass
+
+    async def handle(self, reader, writer):
+        client_host = (writer.get_extra_info('peername') or ('',))[0]
+        worker = self.pick(client_host)
+        if worker is None:
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', worker.port)
+        except OSError:
+            worker.failures += 1
+            writer.close()
+            return
+        worker.active += 1
+        worker.connections += 1
+        try:
+            await asyncio.gather(self._pipe(reader, upstream_writer, worker, 'bytes_in'),
+                                 self._pipe(upstream_reader, writer, worker, 'bytes_out'))
+        finally:
+            worker.active -= 1
+
+    async def watch(self):
+        """Restart workers that exit or stop answering ``/ready``; promote those that become ready"""
+        while True:
+            now = time.monotonic()
+            for w in self.workers:
+                code = w.exited()
+                if code is not None:
+                    await w.schedule_restart(f"exited with {code}")
+                    continue
+                if w.state == 'waiting' and now >= w.retry_at:
+                    w.restarts += 1
+                    w.start()
+                    continue
+                if w.state in ('starting', 'ready'):
+                    if await _ready(w.ready_port):
+                        if w.state == 'starting':
+                            print(f"✅ worker {w.index} ready on :{w.port} after "
+                                  f"{now - w.started_at:.1f}s", flush=True)
+                        w.state, w.failures = 'ready', 0
+                    elif w.state == 'ready':
+                        w.failures += 1
+                        if w.failures >= MAX_FAILURES:
+                            await w.schedule_restart(f"failed {w.failures} readiness checks")
+                    elif now - w.started_at > START_TIMEOUT:
+                        await w.schedule_restart(f"not ready {START_TIMEOUT:.0f}s after starting")
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    def status(self):
+        workers = [w.status() for w in self.workers]
+        return {'uptime_s': round(time.monotonic() - self.started_at, 1), 'balance': self.balance,
+                'ready': sum(w['state'] == 'ready' for w in workers), 'workers': workers,
+                'rss_mb': round(sum(w['rss_mb'] for w in workers), 1),
+                'pss_mb': round(sum(w['pss_mb'] for w in workers), 1)}
+
+    async def handle_status(self, reader, writer):
+        try:
+            line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            path = line.split(b' ')[1] if line.count(b' ') >= 2 else b''
+            code, reason = (200, 'OK') if path in (b'/workers', b'/health') else (404, 'Not Found')
+            if path == b'/ready' and any(w.state == 'ready' for w in self.workers):
+                code, reason = 200, 'OK'
+            elif path == b'/ready':
+                code, reason = 503, 'Service Unavailable'
+            body = json.dumps(self.status()).encode()
+            writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            print(format_status(self.status()), flush=True)
+
+    async def run(self, host=None, port=None, status_port=None, report_every=0):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            # Stop the workers too rather than leaving them orphaned
+            loop.add_signal_handler(sig, asyncio.current_task().cancel)
+        for w in self.workers:
+            w.start()
+        servers = []
+        if port is not None:
+            servers.append(await asyncio.start_server(self.handle, host, port, reuse_address=True))
+            print(f"🔀 Proxying http://{host}:{port} to {len(self.workers)} workers "
+                  f"(:{self.workers[0].port}-{self.workers[-1].port}, {self.balance})", flush=True)
+        if status_port is not None:
+            servers.append(await asyncio.start_server(self.handle_status, host, status_port, reuse_address=True))
+            print(f"📋 Worker status on http://{host}:{status_port}/workers", flush=True)
+        tasks = [asyncio.create_task(self.watch())]
+        if report_every:
+            tasks.append(asyncio.create_task(self.report(report_every)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for server in servers:
+                server.close()
+            for w in self.workers:
+                w.stop()
+
+
+def format_status(status):
+    lines = [f"{'worker':>6}{'port':>7}{'state':>10}{'restarts':>10}{'active':>8}{'conns':>8}"
+             f"{'MB out':>9}{'CPU %':>7}{'RSS MB':>8}{'PSS MB':>8}"]
+    for w in status['workers']:
+        lines.append(f"{w['worker']:>6}{w['port']:>7}{w['state']:>10}{w['restarts']:>10}{w['active']:>8}"
+                     f"{w['connections']:>8}{w['bytes_out'] / 1e6:>9.1f}{w['cpu_percent']:>7.0f}"
+                     f"{w['rss_mb']:>8.0f}{w['pss_mb']:>8.0f}")
+    lines.append(f"{'total':>6}{'':>58}{status['rss_mb']:>8.0f}{status['pss_mb']:>8.0f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kind', choices=KINDS, default='server')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='127.0.0.1', help='proxy and status address (0.0.0.0 for the app)')
+    parser.add_argument('--port', type=int, default=8080, help='proxy port')
+    parser.add_argument('--worker-port', type=int, default=None, help='first worker port (default: --port + 1)')
+    parser.add_argument('--health-port', type=int, default=None,
+                        help='first app worker /ready port (default: after the worker ports)')
+    parser.add_argument('--status-port', type=int, default=None, help='default: --port + 1000')
+    parser.add_argument('--balance', choices=BALANCES, default=None, help='default: ip for app, least for server')
+    parser.add_argument('--app', default=os.path.join(REPO_ROOT, 'bling', 'app.py'))
+    parser.add_argument('--no-proxy', action='store_true', help='run the port range only (external balancer)')
+    parser.add_argument('--report-every', type=float, default=60, help='seconds between status tables (0: never)')
+    args, extra = parser.parse_known_args()
+
+    worker_port = args.worker_port or args.port + 1
+    health_port = args.health_port or worker_port + args.workers
+    if not snapshot.exists():
+        print(f"💾 Building the binary snapshot at {snapshot.SNAPSHOT_DIR}...", flush=True)
+    snapshot.ensure()
+
+    workers = [Worker(k, cmd, port, ready_port, env) for k, (cmd, port, ready_port, env)
+               in enumerate(worker_commands(args.kind, args.workers, worker_port, args.app, health_port, extra))]
+    supervisor = Supervisor(workers, args.balance or ('ip' if args.kind == 'app' else 'least'))
+    try:
+        asyncio.run(supervisor.run(args.host, None if args.no_proxy else args.port,
+                                   args.status_port or args.port + 1000, args.report_every))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
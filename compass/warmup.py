@@ -0,0 +1,323 @@
+"""Warm-up for the Streamlit app: do the first request's slow work at startup.
+
+A fresh process pays for everything on its first page view: importing
+pandas, pyarrow and plotly, reading the scenario table, building the grid
+with its derived columns, scanning the table for the profile's sort key, and
+plotly's first figure (which loads its validators and default template).
+``run()`` does all of that up front, step by step:
+
+    imports   the heavy modules
+    data      the scenario table (S3 through awswrangler, else local parquet),
+              or the ``PFM_BACKEND`` lookup backend when one is set
+    grid      the scenario grid with derived and account columns, mapped
+              from the binary snapshot (written on the first start)
+    indexes   sort key -> row index over the table; grid pages faulted in
+    figures   one figure of each kind the app draws, rendered to JSON
+
+Loaded objects live in a process-wide registry (``resource``) that the app's
+cached loaders read too, so warm-up and an early first session never load
+the same thing twice.  ``python -m compass.warmup bling/app.py`` warms up in
+the background, serves ``/health`` and ``/ready`` on a side port and runs
+Streamlit in the same process.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .grid import DATA_DIR, REPO_ROOT
+
+STEPS = ['imports', 'data', 'grid', 'indexes', 'figures']
+CRITICAL = ['data', 'grid', 'indexes']    # /ready stays 503 unless all of these are done
+HEAVY_MODULES = ['pandas', 'pyarrow', 'pyarrow.dataset', 'plotly.graph_objects', 'plotly.express',
+                 'plotly.subplots', 'plotly.io']
+S3_PATH = ("s3://jp-data-lake-experimental-production/lakehouse_experimental_jp_production/"
+           "pfm_compass_retirement_predictions_internal_v1/")
+LOCAL_PATHS = [os.path.join(REPO_ROOT, 'data', 'pfm_compass_data', 'retirement_scenarios_FIXED_v4_alternative.parquet'),
+               DATA_DIR]
+HEALTH_PORT = 8502
+
+_resources = {}
+_lock = threading.Lock()
+_status = {'state': 'idle', 'started': None, 'finished': None, 'steps': {}}
+
+
+def resource(name, loader):
+    """Process-wide object built once by ``loader``; concurrent callers wait for that one load.
+
+    A failed load is not kept, so the next caller tries again.
+    """
+    with _lock:
+        entry = _resources.get(name)
+        owner = entry is None
+        if owner:
+            entry = _resources[name] = {'done': threading.Event(), 'value': None, 'error': None}
+    if owner:
+        try:
+            entry['value'] = loader()
+        except Exception as e:
+            entry['error'] = e
+            with _lock:
+                _resources.pop(name, None)
+        finally:
+            entry['done'].set()
+    else:
+        entry['done'].wait()
+    if entry['error'] is not None:
+        raise entry['error']
+    return entry['value']
+
+
+def read_data():
+    """S3 through awswrangler, else the local file, else the local parquet export"""
+    import pandas as pd
+    try:
+        import awswrangler as wr
+        return wr.s3.read_parquet(path=S3_PATH, dataset=True, partition_filter=None)
+    except Exception:
+        pass
+    for path in LOCAL_PATHS:
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+    raise FileNotFoundError(f"No scenario table at {S3_PATH} or {', '.join(LOCAL_PATHS)}")
+
+
+def read_grid():
+    """Grid from the mmap snapshot (written on first start), else straight from parquet"""
+    from . import snapshot
+    from .accounts import add_account_columns
+    from .grid import load_grid
+    from .recompute import add_columns
+
+    try:
+        base = snapshot.load_grid(snapshot.ensure())
+    except OSError:
+        base = load_grid()
+    return add_account_columns(add_columns(base))
+
+
+def data():
+    """The scenario table the app shows"""
+    return resource('data', read_data)
+
+
+def grid():
+    """The app's scenario grid (derived and account columns added)"""
+    return resource('grid', read_grid)
+
+
+def backend():
+    """Lookup backend named by ``PFM_BACKEND`` (e.g. ``mmap``), which the app reads instead of the table"""
+    name = os.environ.get('PFM_BACKEND')
+    if not name:
+        return None
+    from .backends import open_backend
+    return resource('backend', lambda: open_backend(name))
+
+
+def build_sk_index(df):
+    import pandas as pd
+    index = pd.Index(df['sk'])
+    index.is_unique    # builds the hash table that get_indexer uses
+    return index
+
+
+def sk_index(df):
+    """``pandas.Index`` over ``df['sk']``, built once per table"""
+    return resource(f"sk_index:{id(df)}", lambda: build_sk_index(df))
+
+
+def render_figures():
+    """Build and serialise one figure of each kind the app draws (gauge, bands, bars, radar)"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    figures = [
+        go.Figure(go.Indicator(mode='gauge+number', value=50, gauge={'axis': {'range': [0, 100]}})),
+        go.Figure([go.Scatter(x=[30, 65], y=[0, 1], mode='lines'),
+                   go.Scatter(x=[30, 65], y=[0, 2], fill='tonexty', mode='lines')]),
+        go.Figure(go.Bar(x=[1.0], y=['a'], orientation='h')),
+        go.Figure(go.Scatterpolar(r=[1, 2, 3], theta=['a', 'b', 'c'], fill='toself')),
+        make_subplots(rows=1, cols=2),
+    ]
+    return [f.to_json() for f in figures]
+
+
+def _imports():
+    import importlib
+    loaded = []
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return f"{len(loaded)}/{len(HEAVY_MODULES)} modules"
+
+
+def _uses_table():
+    """The app holds the pandas table unless it reads DynamoDB or a ``PFM_BACKEND`` (see ``bling/app.py``)"""
+    return not (os.environ.get('PFM_DYNAMODB_TABLE') or os.environ.get('PFM_BACKEND'))
+
+
+def _uses_grid():
+    if os.environ.get('PFM_DYNAMODB_TABLE'):
+        return False
+    return not os.environ.get('PFM_BACKEND') or hasattr(backend(), 'grid')
+
+
+def _data():
+    if not _uses_table():
+        return f"{backend().name} backend open" if backend() is not None else 'skipped (DynamoDB backend)'
+    return f"{len(data()):,} rows"
+
+
+def _grid():
+    if not _uses_grid():
+        return 'skipped (no grid with this backend)'
+    return f"{len(grid().columns)} columns"
+
+
+def _indexes():
+    import numpy as np
+    done = []
+    if _uses_grid():
+        for values in grid().columns.values():
+            np.asarray(values).sum()    # fault memory-mapped pages in now rather than on the first lookup
+        done.append('grid pages touched')
+    if _uses_table():
+        try:
+            done.append(f"{len(sk_index(data())):,} sort keys indexed")
+        except Exception:
+            done.append('no table')
+    return ', '.join(done) or 'skipped'
+
+
+def _figures():
+    return f"{len(resource('figures', render_figures))} figure kinds rendered"
+
+
+_STEP_FUNCTIONS = {'imports': _imports, 'data': _data, 'grid': _grid, 'indexes': _indexes, 'figures': _figures}
+
+
+def run(steps=STEPS):
+    """Run the warm-up steps in order; returns ``status()``.
+
+    A failing step is recorded and the rest still run; the state ends ``failed``
+    unless every ``CRITICAL`` step is done.
+    """
+    _status.update(state='warming', started=time.time(), finished=None)
+    for step in steps:
+        _status['steps'][step] = {'state': 'running'}
+        started = time.perf_counter()
+        try:
+            detail, state = _STEP_FUNCTIONS[step](), 'done'
+        except Exception as e:
+            detail, state = f"{type(e).__name__}: {e}", 'failed'
+        _status['steps'][step] = {'state': state, 'seconds': round(time.perf_counter() - started, 3),
+                                  'detail': detail}
+    _status.update(state='ready' if _critical_done() else 'failed', finished=time.time())
+    return status()
+
+
+def start(steps=STEPS):
+    """``run`` in a daemon thread"""
+    thread = threading.Thread(target=run, args=(steps,), name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def status():
+    return json.loads(json.dumps(_status))
+
+
+def _critical_done():
+    return all(_status['steps'].get(step, {}).get('state') == 'done' for step in CRITICAL)
+
+
+def ready():
+    """Warm-up finished and the data, grid and indexes are loaded"""
+    return _status['state'] == 'ready' and _critical_done()
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            code = 200
+        elif self.path == '/ready':
+            code = 200 if ready() else 503
+        else:
+            code = 404
+        body = json.dumps(dict(status(), ready=ready())).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_health(port=HEALTH_PORT, host='0.0.0.0'):
+    """``/health`` (200 while up) and ``/ready`` (503 until warm, or for good if warm-up failed) on a side port"""
+    server = ThreadingHTTPServer((host, port), _HealthHandler)
+    threading.Thread(target=server.serve_forever, name='health', daemon=True).start()
+    return server
+
+
+def first_request(profile=None):
+    """The work of the app's first "Analyze": profile lookup, grid row with neighbours, figures"""
+    from .grid import DIMENSIONS, LEVELS, flat_index, sort_key
+
+    profile = profile or {d: LEVELS[d][len(LEVELS[d]) // 2] for d in DIMENSIONS}
+    if backend() is not None:
+        backend().lookup(**profile)
+    elif _uses_table():
+        try:
+            df = data()
+            row = sk_index(df).get_indexer([sort_key(**profile)])[0]
+            if row >= 0:
+                df.iloc[row].to_dict()
+        except Exception:
+            pass
+    if _uses_grid():
+        g = grid()
+        g.row(int(flat_index(**profile)))
+        for dim in DIMENSIONS:
+            g.row(int(flat_index(**dict(profile, **{dim: LEVELS[dim][0]}))))
+    try:
+        resource('figures', render_figures)
+    except ImportError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Warm up, serve /health and /ready, and run the Streamlit app in this process',
+        usage='python -m compass.warmup APP.py [--health-port 8502] [streamlit options, e.g. --server.port 8501]')
+    parser.add_argument('app', nargs='?', default=os.path.join(REPO_ROOT, 'bling', 'app.py'))
+    parser.add_argument('--health-port', type=int, default=HEALTH_PORT)
+    parser.add_argument('--steps', default=','.join(STEPS),
+                        help=f"/ready stays 503 unless {', '.join(CRITICAL)} are among them and succeed")
+    parser.add_argument('--no-streamlit', action='store_true', help='warm up, print the timings and exit')
+    args, streamlit_args = parser.parse_known_args()
+    steps = [s for s in args.steps.split(',') if s]
+
+    if args.no_streamlit:
+        print(json.dumps(run(steps), indent=2))
+        return
+    serve_health(args.health_port)
+    print(f"🔥 Warming up ({', '.join(steps)}); readiness on http://0.0.0.0:{args.health_port}/ready")
+    start(steps)
+    from streamlit.web import cli as stcli
+    sys.argv = ['streamlit', 'run', args.app, *streamlit_args]
+    sys.exit(stcli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -46,7 +46,18 @@ USEREOF
 sudo -u ec2-user bash << 'STARTEOF'
 cd /home/ec2-user/pfm-compass-app
 source ~/.bashrc
-nohup /home/ec2-user/.local/bin/streamlit run app.py --server.port 8501 --server.address 0.0.0.0 > streamlit.log 2>&1 &
+SNAPSHOT=data/pfm_compass_data/snapshot/snapshot.json
+RAW=data/pfm_compass_data/raw_parquet
+if [ -d compass ] && [ -d bling ] && { [ -f $SNAPSHOT ] || [ -d $RAW ]; }; then
+    # Full repo with local data: one warmed-up worker per core on 8511+, all mapping one snapshot (built
+    # from raw_parquet on first start), behind a proxy on 8501 that restarts crashed workers; readiness
+    # and per-worker load on :8502/ready and /workers.  This serves bling/app.py, not app.py: bling reads
+    # the shared snapshot (PFM_BACKEND=mmap), whereas app.py caches the whole table in every worker.
+    nohup python3 -m compass.supervisor --kind app --app bling/app.py --workers $(nproc) --host 0.0.0.0 --port 8501 --status-port 8502 --worker-port 8511 > streamlit.log 2>&1 &
+else
+    # app.py alone, or no local scenario data to build the snapshot from: a single Streamlit process
+    nohup /home/ec2-user/.local/bin/streamlit run app.py --server.port 8501 --server.address 0.0.0.0 > streamlit.log 2>&1 &
+fi
 STARTEOF
 
 echo "Streamlit setup completed" >> /var/log/user-data.log
@@ -121,6 +132,21 @@ aws ec2 authorize-security-group-ingress \
     --cidr 10.0.0.0/16 \
     --region $REGION
 
+# Warm-up readiness probe (/health, /ready) from both company VPCs
+aws ec2 authorize-security-group-ingress \
+    --group-id $SECURITY_GROUP_ID \
+    --protocol tcp \
+    --port 8502 \
+    --cidr 172.31.0.0/16 \
+    --region $REGION
+
+aws ec2 authorize-security-group-ingress \
+    --group-id $SECURITY_GROUP_ID \
+    --protocol tcp \
+    --port 8502 \
+    --cidr 10.0.0.0/16 \
+    --region $REGION
+
 echo "✅ Security group created: $SECURITY_GROUP_ID"
 
 # Launch instance
@@ -158,6 +184,8 @@ echo "📊 Your PFM Compass app will be available at:"
 echo "   🔗 http://$PUBLIC_IP:8501"
 echo ""
 echo "⏳ Please wait 2-3 minutes for the app to fully initialize"
+echo "   Once the full app is uploaded, it is warm when this returns 200:"
+echo "   curl -s http://$PUBLIC_IP:8502/ready"
 echo ""
 echo "🔧 Instance details:"
 echo "   📍 Instance ID: $INSTANCE_ID"
@@ -174,6 +202,10 @@ echo "   scp -i ${KEY_NAME}.pem app.py ec2-user@$PUBLIC_IP:~/pfm-compass-app/app
 echo ""
 echo "🔄 To restart the app after uploading:"
 echo "   ssh -i ${KEY_NAME}.pem ec2-user@$PUBLIC_IP 'cd ~/pfm-compass-app && pkill streamlit && nohup ~/.local/bin/streamlit run app.py --server.port 8501 --server.address 0.0.0.0 > streamlit.log 2>&1 &'"
+echo "   or, with the full repo (compass/, bling/ and data/pfm_compass_data/raw_parquet) uploaded, bling/app.py"
+echo "   on one worker per core with /ready on 8502:"
+echo "   ssh -i ${KEY_NAME}.pem ec2-user@$PUBLIC_IP 'cd ~/pfm-compass-app && pkill -f \"streamlit|compass.supervisor\"; nohup python3 -m compass.supervisor --kind app --app bling/app.py --workers \$(nproc) --host 0.0.0.0 --port 8501 --status-port 8502 --worker-port 8511 > streamlit.log 2>&1 &'"
+echo "   per-worker load: curl -s http://$PUBLIC_IP:8502/workers"
 echo ""
 
 # Clean up temp files
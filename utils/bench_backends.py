@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Compare the storage backends of compass/backends.py on latency and memory.
+
+Each backend runs in its own process, so its memory is measured alone:
+open time, resident memory once open and after the workload, and p50/p99
+latency of single gets, 100-key batches, timelines and cohort scans, and
+for s3range the bytes fetched per scenario read.
+With --check every backend is also run through the conformance suite
+against the in-memory grid.
+
+    python utils/bench_backends.py
+    python utils/bench_backends.py --backends mmap,parquet --check
+
+    # MinIO as the local S3 stand-in (docker run -p 9000:9000 minio/minio server /data);
+    # --s3-upload copies the local parquet export into the bucket first
+    python utils/bench_backends.py --backends s3,s3range --s3-bucket pfm-compass --s3-prefix raw_parquet/ \\
+        --s3-endpoint-url http://localhost:9000 --s3-upload
+    python utils/bench_backends.py --backends dynamo --dynamodb-endpoint http://localhost:8000
+    python -m compass.daemon & python utils/bench_backends.py --backends daemon --check
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass import DIMENSIONS, GRID_SIZE, backends, daemon, grid, snapshot
+
+
+def rss_mb():
+    """Current resident set size (peak if /proc is unavailable)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(fn, args_list):
+    out = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        out.append(time.perf_counter() - started)
+    ms = np.array(out) * 1000
+    return {'p50': float(np.percentile(ms, 50)), 'p99': float(np.percentile(ms, 99))}
+
+
+def options(args, name):
+    if name == 'grid':
+        return {'form': args.form}
+    if name == 'mmap':
+        return {'path': args.snapshot}
+    if name == 's3':
+        return {'bucket': args.s3_bucket, 'prefix': args.s3_prefix, 'cache_dir': args.cache_dir,
+                'endpoint_url': args.s3_endpoint_url}
+    if name == 's3range':
+        return {'bucket': args.s3_bucket, 'prefix': args.s3_prefix, 'index_dir': args.index_dir,
+                'endpoint_url': args.s3_endpoint_url}
+    if name == 'dynamo':
+        return {'table': args.dynamodb_table, 'endpoint_url': args.dynamodb_endpoint}
+    if name == 'daemon':
+        return {'path': args.socket}
+    return {}
+
+
+def run_one(args, name):
+    """Measure one backend in this process; returns a JSON-able dict"""
+    base = rss_mb()
+    started = time.perf_counter()
+    backend = backends.open_backend(name, **options(args, name))
+    report = {'backend': name, 'open_s': time.perf_counter() - started, 'rss_open_mb': rss_mb() - base}
+
+    rng = np.random.default_rng(0)
+    sks = [backends.key_at(i) for i in rng.integers(0, GRID_SIZE, args.lookups)]
+    report['get'] = timed(backend.get, [(sk,) for sk in sks])
+    report['get_many_100'] = timed(backend.get_many, [(sks[k:k + 100],) for k in range(0, len(sks), 100)] * 3)
+    report['timeline'] = timed(backend.timeline, [(sk,) for sk in sks[:100]])
+    cohorts = []
+    for sk in sks[:args.cohorts]:
+        profile = backends.parse_sort_key(sk)
+        # Fix seven dimensions: a cohort of a few hundred scenarios
+        cohorts.append(({d: profile[d] for d in DIMENSIONS[:7]},))
+    report['cohort'] = timed(lambda b: backend.cohort(['fire_percentage', 'projected_wealth'], **b), cohorts)
+    report['rss_after_mb'] = rss_mb() - base
+    if hasattr(backend, 'stats'):
+        report['stats'] = backend.stats()
+
+    if args.check:
+        reference = backends.GridBackend.open()
+        report['failures'] = backends.conformance(backend, reference)
+    backend.close()
+    return report
+
+
+def upload(args):
+    """Copy the local parquet export to ``s3://bucket/prefix`` (e.g. into MinIO for testing)"""
+    client = backends.make_s3_client(args.s3_endpoint_url)
+    try:
+        client.create_bucket(Bucket=args.s3_bucket)
+    except (client.exceptions.BucketAlreadyOwnedByYou, client.exceptions.BucketAlreadyExists):
+        pass
+    root = grid.DATA_DIR
+    for folder, _, files in os.walk(root):
+        for f in files:
+            if f.endswith('.parquet'):
+                path = os.path.join(folder, f)
+                client.upload_file(path, args.s3_bucket, args.s3_prefix + os.path.relpath(path, root))
+    print(f"☁️  Uploaded {root} to s3://{args.s3_bucket}/{args.s3_prefix}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='grid,mmap,arrow,parquet',
+                        help=f"comma-separated, from {', '.join(backends.BACKENDS)}")
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--cohorts', type=int, default=20)
+    parser.add_argument('--check', action='store_true', help='run the conformance suite against the grid')
+    parser.add_argument('--form', default='dense', help='in-memory form for the grid backend')
+    parser.add_argument('--snapshot', default=snapshot.SNAPSHOT_DIR, help='binary snapshot for mmap (built if missing)')
+    parser.add_argument('--s3-bucket', default=None)
+    parser.add_argument('--s3-prefix', default='')
+    parser.add_argument('--s3-endpoint-url', default=None, help='e.g. http://localhost:9000 for MinIO')
+    parser.add_argument('--s3-upload', action='store_true', help='upload the local parquet export to the bucket first')
+    parser.add_argument('--cache-dir', default='./s3_mirror')
+    parser.add_argument('--index-dir', default='./s3_index', help='footer/page index cache for s3range')
+    parser.add_argument('--dynamodb-table', default='pfm_compass_retirement_predictions')
+    parser.add_argument('--dynamodb-endpoint', default=None)
+    parser.add_argument('--socket', default=daemon.SOCKET_PATH, help='lookup daemon socket (python -m compass.daemon)')
+    parser.add_argument('--one', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_one(args, args.one)))
+        return
+
+    names = [n for n in args.backends.split(',') if n]
+    if 'mmap' in names and not snapshot.exists(args.snapshot):
+        print(f"💾 Building the binary snapshot at {args.snapshot}...")
+        snapshot.ensure(args.snapshot)
+
+    if args.s3_upload:
+        upload(args)
+
+    reports = []
+    for name in names:
+        print(f"⏱️  {name}...", flush=True)
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--one', name],
+                               capture_output=True, text=True)
+        if child.returncode != 0:
+            print(f"  ❌ {name} failed:\n{child.stderr.strip().splitlines()[-1] if child.stderr else ''}")
+            continue
+        reports.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'backend':<9}{'open s':>8}{'RSS MB':>8}{'after':>7}{'get p50':>9}{'p99':>8}"
+          f"{'batch100':>10}{'timeline':>10}{'cohort':>9}  (ms)")
+    for r in reports:
+        print(f"{r['backend']:<9}{r['open_s']:>8.2f}{r['rss_open_mb']:>8.0f}{r['rss_after_mb']:>7.0f}"
+              f"{r['get']['p50']:>9.3f}{r['get']['p99']:>8.3f}{r['get_many_100']['p50']:>10.2f}"
+              f"{r['timeline']['p50']:>10.3f}{r['cohort']['p50']:>9.2f}")
+    for r in reports:
+        if 'stats' in r:
+            st = r['stats']
+            print(f"📦 {r['backend']}: {st['bytes_per_lookup'] / 1024:,.0f} KB and "
+                  f"{st['requests'] / max(st['lookups'], 1):.1f} range GETs per scenario read "
+                  f"({st['lookups']:,} reads, {st['bytes'] / 1e6:,.1f} MB in total)")
+    failed = False
+    for r in reports:
+        if 'failures' in r:
+            status = '✅ conforms' if not r['failures'] else f"❌ {len(r['failures'])} differences"
+            print(f"🔍 {r['backend']}: {status}")
+            for f in r['failures'][:5]:
+                print(f"     {f}")
+            failed |= bool(r['failures'])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
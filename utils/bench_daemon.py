@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Lookup daemon (compass/daemon.py) against in-process lookups.
+
+Every measurement runs in fresh client processes:
+
+    inproc     each process maps the snapshot itself (backends.MmapBackend)
+    daemon     each process asks the daemon over its Unix socket
+    pipelined  daemon, one key per request, --depth requests in flight
+
+With --clients N, N processes look up random scenarios at the same time for
+--seconds; the report gives aggregate lookups/s and latency percentiles over
+all of them, and the daemon's mean batch (lookups answered per get_many).
+Startup is the wall time of a fresh interpreter up to its first answer.
+
+    python utils/bench_daemon.py                    # starts the daemon itself
+    python utils/bench_daemon.py --clients 1,4,16 --seconds 5
+    python utils/bench_daemon.py --socket /tmp/pfm-compass.sock --no-start
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass import GRID_SIZE, backends, daemon, snapshot
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_one(args, mode, seed):
+    """Look up random keys until the deadline; returns per-lookup latencies in ms"""
+    rng = np.random.default_rng(seed)
+    sks = [backends.key_at(i) for i in rng.integers(0, GRID_SIZE, 2000)]
+    if mode == 'inproc':
+        backend = backends.MmapBackend()
+        lookup = backend.get
+    else:
+        client = daemon.DaemonClient(args.socket)
+        lookup = client.get
+    lookup(sks[0])
+    while time.time() < args.start_at:
+        time.sleep(0.001)
+    deadline = args.start_at + args.seconds
+    latencies = []
+    k = 0
+    if mode == 'pipelined':
+        while time.time() < deadline:
+            started = time.perf_counter()
+            client.pipelined(sks[k % 1000:k % 1000 + args.depth * 4], args.depth)
+            latencies.append((time.perf_counter() - started) * 1000 / (args.depth * 4))
+            k += args.depth * 4
+        return {'lookups': k, 'ms': latencies}
+    while time.time() < deadline:
+        started = time.perf_counter()
+        lookup(sks[k % len(sks)])
+        latencies.append((time.perf_counter() - started) * 1000)
+        k += 1
+    return {'lookups': k, 'ms': latencies}
+
+
+def run_clients(args, mode, clients):
+    start_at = time.time() + 1.0 + 0.3 * clients
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--one', mode,
+                               '--seed', str(k), '--start-at', str(start_at)],
+                              stdout=subprocess.PIPE, text=True) for k in range(clients)]
+    reports = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    ms = np.concatenate([r['ms'] for r in reports])
+    return {'mode': mode, 'clients': clients, 'per_s': sum(r['lookups'] for r in reports) / args.seconds,
+            'p50': float(np.percentile(ms, 50)), 'p99': float(np.percentile(ms, 99)),
+            'p999': float(np.percentile(ms, 99.9))}
+
+
+def startup(code, repeat=3):
+    """Best wall time of a fresh interpreter running ``code``"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, env=env)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=daemon.SOCKET_PATH)
+    parser.add_argument('--no-start', action='store_true', help='use a daemon that is already running')
+    parser.add_argument('--clients', default='1,4,16', help='comma-separated client process counts')
+    parser.add_argument('--modes', default='inproc,daemon,pipelined')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--depth', type=int, default=32, help='requests in flight for pipelined')
+    parser.add_argument('--one', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--seed', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_one(args, args.one, args.seed)))
+        return
+
+    snapshot.ensure()
+    server = None
+    if not args.no_start:
+        server = subprocess.Popen([sys.executable, '-m', 'compass.daemon', '--socket', args.socket],
+                                  env=dict(os.environ, PYTHONPATH=REPO_ROOT), stdout=subprocess.DEVNULL)
+        for _ in range(200):
+            if os.path.exists(args.socket):
+                break
+            time.sleep(0.05)
+    try:
+        client = daemon.DaemonClient(args.socket)
+        rows = []
+        for clients in [int(c) for c in args.clients.split(',') if c]:
+            for mode in [m for m in args.modes.split(',') if m]:
+                print(f"⏱️  {mode} x{clients}...", flush=True)
+                before = client.stats()
+                row = run_clients(args, mode, clients)
+                after = client.stats()
+                lookups = after['lookups'] - before['lookups']
+                row['batch'] = lookups / max(after['batches'] - before['batches'], 1) if mode != 'inproc' else None
+                rows.append(row)
+        sk = backends.key_at(GRID_SIZE // 2)
+        starts = {
+            'inproc (mmap)': startup(f"from compass.backends import MmapBackend; MmapBackend().get({sk!r})"),
+            'daemon client': startup(f"from compass.daemon import DaemonClient; "
+                                     f"DaemonClient({args.socket!r}).get({sk!r})"),
+            'interpreter only': startup('pass'),
+        }
+        stats = client.stats()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"\n{'mode':<11}{'clients':>8}{'lookups/s':>11}{'p50 ms':>9}{'p99':>8}{'p99.9':>8}{'batch':>7}")
+    for r in rows:
+        batch = f"{r['batch']:.1f}" if r['batch'] is not None else '-'
+        print(f"{r['mode']:<11}{r['clients']:>8}{r['per_s']:>11,.0f}{r['p50']:>9.3f}{r['p99']:>8.3f}"
+              f"{r['p999']:>8.3f}{batch:>7}")
+    print('\n🚀 Fresh process to first answer:')
+    for name, seconds in starts.items():
+        print(f"  {name:<17}{seconds * 1000:>7.0f} ms")
+    print(f"\n🧭 Daemon: {stats['requests']:,} requests, {stats['lookups']:,} lookups in {stats['batches']:,} "
+          f"batches (max {stats['max_batch']} requests), {stats['errors']} errors")
+    print('(pipelined latency is per lookup: batch wall time / lookups in it)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Measure DynamoDB-backed lookup latency against in-process grid lookups.
+
+Needs a table filled by utils/export_dynamodb.py (or use --moto, which
+exports --rows scenarios into an in-process mock first).
+
+    python utils/bench_dynamodb.py --endpoint-url http://localhost:8000
+    python utils/bench_dynamodb.py --moto --rows 5000
+"""
+import argparse
+import contextlib
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass import dynamo, grid
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):.2f} ms  p99 {np.percentile(ms, 99):.2f} ms"
+
+
+def timed(fn, args_list):
+    out = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        out.append(time.perf_counter() - started)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=dynamo.TABLE_NAME)
+    parser.add_argument('--endpoint-url', default=None)
+    parser.add_argument('--region', default=None)
+    parser.add_argument('--moto', action='store_true')
+    parser.add_argument('--rows', type=int, default=5000, help='rows to sample from (and export under --moto)')
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    mock = contextlib.nullcontext()
+    if args.moto:
+        from moto import mock_aws
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+        mock = mock_aws()
+
+    with mock:
+        client = dynamo.make_client(args.endpoint_url, args.region)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        backend = dynamo.DynamoLookup(args.table, client=client)
+        rss_backend = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+        current = grid.load_grid()
+        if args.moto:
+            dynamo.create_table(client, args.table)
+            dynamo.export(current, client, args.table, stop=args.rows)
+        rows = np.random.default_rng(0).integers(0, args.rows, args.lookups)
+        profiles = [current.buckets(int(i)) for i in rows]
+
+        print(f"⏱️  {args.lookups} lookups over the first {args.rows:,} scenarios")
+        print(f"  in-process grid   : {percentiles(timed(lambda b: current.lookup(**b), [(b,) for b in profiles]))}")
+        print(f"  DynamoDB (cold)   : {percentiles(timed(lambda b: backend.lookup(**b), [(b,) for b in profiles]))}")
+        print(f"  DynamoDB (LRU hit): {percentiles(timed(lambda b: backend.lookup(**b), [(b,) for b in profiles]))}")
+        backend._cache.clear()
+        neighbours = timed(lambda b: backend.neighbours(**b), [(b,) for b in profiles[:100]])
+        print(f"  neighbours (BatchGetItem, up to 18 profiles): {percentiles(neighbours)}")
+        print(f"  backend memory: ~{rss_backend / 1024:.0f} MB (LRU {backend.cache_info()['size']:,} profiles), "
+              f"grid: {current.nbytes / 1e6:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
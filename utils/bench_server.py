@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Load-test the scoring API (compass/server.py) with keep-alive connections.
+
+Each connection sends requests back to back over random profiles and the
+script reports throughput and latency percentiles.
+
+    python -m compass.server --port 8080 &
+    python utils/bench_server.py --port 8080 --connections 16 --requests 20000
+    python utils/bench_server.py --path /scenarios --batch 50
+
+--cold-start starts the server itself and measures how long it takes to
+answer its first lookup and to switch to the in-memory grid:
+
+    python utils/bench_server.py --cold-start "python -m compass.server --port 8080"
+    python utils/bench_server.py --cold-start "python -m compass.server --port 8080 --no-interim"
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass.grid import GRID_SHAPE, GRID_SIZE, LEVELS, DIMENSIONS, sort_key
+
+
+def random_keys(n, seed=0):
+    rows = np.random.default_rng(seed).integers(0, GRID_SIZE, n)
+    codes = np.unravel_index(rows, GRID_SHAPE)
+    return [sort_key(**{d: LEVELS[d][c[k]] for d, c in zip(DIMENSIONS, codes)}) for k in range(n)]
+
+
+def request_bytes(args, keys):
+    if args.path == '/scenarios':
+        body = json.dumps({'keys': keys}).encode()
+        head = f"POST /scenarios HTTP/1.1\r\nHost: {args.host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    else:
+        body = b''
+        head = f"GET {args.path}?sk={keys[0]} HTTP/1.1\r\nHost: {args.host}\r\n"
+    if args.compress:
+        head += f"Accept-Encoding: {args.compress}\r\n"
+    return (head + "\r\n").encode() + body
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    body = await reader.readexactly(length)
+    return int(head.split(b' ', 2)[1]), body
+
+
+async def worker(args, requests, latencies, errors):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    for payload in requests:
+        started = time.perf_counter()
+        writer.write(payload)
+        status, _ = await read_response(reader)
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            errors.append(status)
+    writer.close()
+
+
+async def run(args):
+    keys = random_keys(args.requests * args.batch)
+    payloads = [request_bytes(args, keys[k * args.batch:(k + 1) * args.batch]) for k in range(args.requests)]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(args, payloads[c::args.connections], latencies, errors)
+                           for c in range(args.connections)))
+    elapsed = time.perf_counter() - started
+    ms = np.array(latencies) * 1000
+    print(f"📈 {args.requests:,} requests ({args.requests * args.batch:,} lookups) on "
+          f"{args.connections} connections in {elapsed:.2f}s")
+    print(f"  {args.requests / elapsed:,.0f} req/s, {args.requests * args.batch / elapsed:,.0f} lookups/s")
+    print(f"  latency ms: p50 {np.percentile(ms, 50):.2f}  p95 {np.percentile(ms, 95):.2f}  "
+          f"p99 {np.percentile(ms, 99):.2f}  max {ms.max():.2f}")
+    if errors:
+        print(f"  ❌ {len(errors):,} non-200 responses")
+
+
+def cold_start(args):
+    """Start ``args.cold_start`` and poll lookups until the server runs on the full grid"""
+    keys = random_keys(10_000, seed=1)
+    started = time.perf_counter()
+    server = subprocess.Popen(shlex.split(args.cold_start), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first = full = None
+    latencies = {'interim': [], 'full': []}
+    try:
+        for sk in keys:
+            if time.perf_counter() - started > args.timeout:
+                break
+            try:
+                conn = http.client.HTTPConnection(args.host, args.port, timeout=30)
+                sent = time.perf_counter()
+                conn.request('GET', f"/scenario?sk={sk}")
+                response = conn.getresponse()
+                response.read()
+                took = time.perf_counter() - sent
+                conn.request('GET', '/ready')
+                ready = json.loads(conn.getresponse().read() or b'{}')
+                conn.close()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                time.sleep(0.01)
+                continue
+            if response.status != 200:
+                time.sleep(0.01)
+                continue
+            if first is None:
+                first = time.perf_counter() - started
+            latencies['full' if ready.get('mode') == 'full' else 'interim'].append(took)
+            if ready.get('mode') == 'full':
+                if full is None:
+                    full = time.perf_counter() - started
+                if len(latencies['full']) >= 50:
+                    break
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"🚀 {args.cold_start}")
+    print(f"  first useful response after {first:.2f}s" if first is not None else "  ❌ never answered")
+    print(f"  full grid serving after {full:.2f}s" if full is not None else "  ❌ never switched to the full grid")
+    for mode, values in latencies.items():
+        if values:
+            ms = np.array(values) * 1000
+            print(f"  {mode:<8} lookups: {len(values):>4}  p50 {np.percentile(ms, 50):.1f} ms  "
+                  f"p99 {np.percentile(ms, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--path', default='/scenario', choices=['/scenario', '/timeline', '/scenarios'])
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=1, help='lookups per /scenarios request')
+    parser.add_argument('--compress', default='', help="Accept-Encoding to send, e.g. 'gzip'")
+    parser.add_argument('--cold-start', default=None, help='server command to start and time (see above)')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+    if args.cold_start:
+        cold_start(args)
+        return
+    if args.path != '/scenarios':
+        args.batch = 1
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""First-request latency of a fresh app process, with and without warm-up.
+
+Each mode runs in a new process, like a freshly started server:
+
+    cold  the first request (compass.warmup.first_request: table lookup by
+          sort key, grid row and neighbours, figures) pays for the imports,
+          data load, grid, index build and first figure itself
+    warm  compass.warmup.run() first, then the same request
+
+For both it reports the first and second request latency, and for warm the
+time each warm-up step took, i.e. how long /ready stays 503 after a restart.
+
+    python utils/bench_warmup.py
+    python utils/bench_warmup.py --steps imports,grid,indexes --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_one(mode, steps):
+    """Time one fresh process in this interpreter; returns a JSON-able dict"""
+    started = time.perf_counter()
+    from compass import warmup
+    report = {'mode': mode, 'import_s': time.perf_counter() - started}
+    if mode == 'warm':
+        report['warmup'] = warmup.run(steps)
+        report['warmup_s'] = time.perf_counter() - started
+    latencies = []
+    for _ in range(2):
+        t = time.perf_counter()
+        warmup.first_request()
+        latencies.append(time.perf_counter() - t)
+    report['first_ms'], report['second_ms'] = (x * 1000 for x in latencies)
+    report['to_first_response_s'] = report.get('warmup_s', report['import_s']) + latencies[0]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', default='imports,data,grid,indexes,figures', help='warm-up steps for the warm run')
+    parser.add_argument('--repeat', type=int, default=1, help='fresh processes per mode')
+    parser.add_argument('--one', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    steps = [s for s in args.steps.split(',') if s]
+
+    if args.one:
+        print(json.dumps(run_one(args.one, steps)))
+        return
+
+    reports = []
+    for _ in range(args.repeat):
+        for mode in ['cold', 'warm']:
+            print(f"⏱️  {mode}...", flush=True)
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--one', mode],
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+                print(f"  ❌ {mode} failed:\n{child.stderr.strip().splitlines()[-1] if child.stderr else ''}")
+                continue
+            reports.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'mode':<6}{'warm-up s':>11}{'1st request ms':>16}{'2nd ms':>9}{'to 1st response s':>19}")
+    for r in reports:
+        warm = f"{r['warmup_s']:.2f}" if 'warmup_s' in r else '-'
+        print(f"{r['mode']:<6}{warm:>11}{r['first_ms']:>16.1f}{r['second_ms']:>9.1f}{r['to_first_response_s']:>19.2f}")
+    warm = next((r for r in reports if 'warmup' in r), None)
+    if warm:
+        print('\n🔥 Warm-up steps:')
+        for step, s in warm['warmup']['steps'].items():
+            mark = '✅' if s['state'] == 'done' else '❌'
+            print(f"  {mark} {step:<8}{s['seconds']:>7.2f}s  {s['detail']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Report how much of the scenario grid is duplicated content.
+
+Whole result rows and the wealth timelines are deduplicated by content (see
+compass/dedup.py); the table shows distinct result tuples, timelines and
+values per column, rows per distinct value and the in-memory size before and
+after (each column's share of the result-tuple table).
+
+    python utils/dedup_report.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compass import dedup, grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=grid.DATA_DIR, help='partitioned parquet snapshot')
+    args = parser.parse_args()
+
+    print(f"📚 Loading snapshot from {args.source}...")
+    current = grid.load_grid(args.source)
+    before = current.nbytes
+    started = time.perf_counter()
+    current, report = dedup.deduplicate(current)
+    print(f"🧬 Deduplicated in {time.perf_counter() - started:.1f}s\n")
+    print(dedup.format_report(report))
+    print(f"\n📦 Grid in memory: {before / 1e6:.0f} MB -> {current.nbytes / 1e6:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Discover which bucket dimensions each output really depends on, and factorise the grid.
+
+A column ignores a dimension when it is invariant along that grid axis.
+Each column is then stored as a table over the dimensions it depends on
+(see compass/factorize.py); the report shows the stored cells, sizes and any
+disagreement with the dimensions the model declares.
+
+    python utils/dependency_report.py
+    python utils/dependency_report.py --derived   # include the drawdown columns
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compass import factorize, grid, recompute
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=grid.DATA_DIR, help='partitioned parquet snapshot')
+    parser.add_argument('--derived', action='store_true', help=f"also add {', '.join(recompute.DERIVED)}")
+    args = parser.parse_args()
+
+    print(f"📚 Loading snapshot from {args.source}...")
+    current = grid.load_grid(args.source)
+    if args.derived:
+        recompute.add_columns(current)
+    before = current.nbytes
+    started = time.perf_counter()
+    current, report = factorize.factorize(current)
+    print(f"🧩 Factorised in {time.perf_counter() - started:.1f}s\n")
+    print(factorize.format_report(report))
+    print(f"\n📦 Grid in memory: {before / 1e6:.0f} MB -> {current.nbytes / 1e6:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Bulk-load the scenario grid into DynamoDB.
+
+Rows are streamed from the local snapshot and written by concurrent
+BatchWriteItem workers (see compass/dynamo.py).  Progress is checkpointed,
+so re-running the same command resumes an interrupted export.
+
+    # DynamoDB Local (docker run -p 8000:8000 amazon/dynamodb-local)
+    python utils/export_dynamodb.py --endpoint-url http://localhost:8000 --create-table
+
+    # In-process moto stand-in, first 20,000 rows
+    python utils/export_dynamodb.py --moto --create-table --limit 20000
+
+    # Real table
+    python utils/export_dynamodb.py --table pfm_compass_retirement_predictions --workers 16
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass import dynamo, grid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=grid.DATA_DIR, help='partitioned parquet snapshot')
+    parser.add_argument('--table', default=dynamo.TABLE_NAME)
+    parser.add_argument('--endpoint-url', default=None, help='e.g. http://localhost:8000 for DynamoDB Local')
+    parser.add_argument('--region', default=None)
+    parser.add_argument('--moto', action='store_true', help='run against an in-process moto mock')
+    parser.add_argument('--create-table', action='store_true')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=None, help='only export the first N rows')
+    parser.add_argument('--checkpoint', default='./dynamodb_export.checkpoint.json')
+    parser.add_argument('--verify', type=int, default=200, help='random rows to read back and compare')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    mock = contextlib.nullcontext()
+    if args.moto:
+        from moto import mock_aws
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+        mock = mock_aws()
+
+    with mock:
+        client = dynamo.make_client(args.endpoint_url, args.region, max_pool_connections=args.workers * 2)
+        if args.create_table:
+            dynamo.create_table(client, args.table)
+
+        print(f"📚 Loading snapshot from {args.source}...")
+        current = grid.load_grid(args.source)
+        stop = min(args.limit or grid.GRID_SIZE, grid.GRID_SIZE)
+
+        def progress(r):
+            print(f"  {r['segments_done']}/{r['segments_total']} segments, {r['written']:,} items, "
+                  f"{r['items_per_second']:,.0f} items/s, {r['retried']:,} retried", end='\r')
+
+        print(f"🚚 Exporting {stop:,} scenarios to {args.table} with {args.workers} workers")
+        report = dynamo.export(current, client, args.table, args.workers, args.checkpoint, stop=stop,
+                               progress=progress)
+        print(f"\n✅ {report['written']:,} items in {report['seconds']:.1f}s "
+              f"({report['items_per_second']:,.0f} items/s, {report['retried']:,} unprocessed items retried)")
+
+        if args.verify:
+            rows = np.random.default_rng(0).integers(0, stop, args.verify)
+            bad = dynamo.verify(current, client, args.table, rows)
+            print(f"🔍 Read back {len(rows)} random items: {'all match' if not bad else f'{len(bad)} differ'}")
+            if bad:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
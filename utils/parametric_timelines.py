@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Check that every wealth_timeline can be regenerated from the model, then drop them.
+
+Rows that don't reproduce bit for bit are kept as residuals in a small .npz
+next to the snapshot; compass.parametric.load_grid() serves timelines from it.
+
+    python utils/parametric_timelines.py
+    python utils/parametric_timelines.py --output ./pfm_compass_data/compact_parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from compass import grid, parametric
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=grid.DATA_DIR, help='partitioned parquet snapshot to check')
+    parser.add_argument('--residuals', default=parametric.RESIDUALS_FILE, help='where to write the residual rows')
+    parser.add_argument('--output', default=None, help='also write the snapshot without wealth_timeline here')
+    parser.add_argument('--samples', type=int, default=1000, help='rows to re-check after fitting')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"📚 Loading snapshot from {args.source}...")
+    current = grid.load_grid(args.source)
+    stored = current.timelines
+    print(f"  {len(current):,} timelines, {stored.nbytes / 1e6:.0f} MB in memory")
+
+    started = time.perf_counter()
+    current, report = parametric.drop_timelines(current)
+    fitted = current.timelines
+    print(f"🔍 Checked against the model in {time.perf_counter() - started:.1f}s")
+    print(f"  Exact: {report['rows'] - report['residual_rows']:,}  Residuals: {report['residual_rows']:,}")
+    print(f"  Timelines: {report['bytes_before'] / 1e6:.0f} MB -> {report['bytes_after'] / 1e6:.3f} MB")
+
+    rows = np.random.default_rng(0).integers(0, len(current), args.samples)
+    if any(fitted.row(int(i)) != stored.row(int(i)) for i in rows):
+        sys.exit("❌ Regenerated timelines differ from the snapshot")
+    print(f"✅ {args.samples:,} random rows regenerate identically")
+
+    parametric.save_residuals(fitted, args.residuals)
+    print(f"💾 Residuals: {args.residuals} ({os.path.getsize(args.residuals):,} bytes)")
+
+    if args.output:
+        import pyarrow.dataset as ds
+        current.timelines = None
+        ds.write_dataset(
+            current.to_table(), args.output, format='parquet',
+            partitioning=['status_color', 'execution_date'], partitioning_flavor='hive',
+            existing_data_behavior='delete_matching',
+        )
+        print(f"💾 Snapshot without timelines: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Re-publish the scenario grid after changing assumptions or bucket midpoints.
+
+Only the columns (and grid slices) that depend on what changed are recomputed;
+everything else is carried over from the current snapshot untouched.
+
+    python utils/recompute_grid.py --set pension_replacement=0.28
+    python utils/recompute_grid.py --set pension_model=nenkin --set pension_age=68
+    python utils/recompute_grid.py --midpoints expected_expenses_bucket=125000,175500,225500,300500,400500,550000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compass import grid, historical, model, recompute
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=grid.DATA_DIR, help='partitioned parquet snapshot to start from')
+    parser.add_argument('--output', default='./pfm_compass_data/recomputed_parquet', help='where to write the new snapshot')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help=f"override an assumption ({', '.join(model.ASSUMPTIONS)})")
+    parser.add_argument('--midpoints', action='append', default=[], metavar='BUCKET=V1,V2,...',
+                        help='replace the midpoints of one bucket dimension')
+    parser.add_argument('--compare-full', action='store_true', help='also time a full rebuild for comparison')
+    parser.add_argument('--survival', action='store_true',
+                        help='add the historical sequence-of-returns survival_rate column')
+    parser.add_argument('--workers', type=int, default=None, help='processes for --survival (one shard per age bucket)')
+    parser.add_argument('--dry-run', action='store_true', help='show the recompute plan and exit')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    assumptions = {}
+    for item in args.set:
+        name, value = item.split('=', 1)
+        try:
+            assumptions[name] = float(value) if '.' in value else int(value)
+        except ValueError:
+            assumptions[name] = value
+    midpoints = {}
+    for item in args.midpoints:
+        name, values = item.split('=', 1)
+        midpoints[name] = [float(v) for v in values.split(',')]
+
+    work = recompute.plan(assumptions, midpoints)
+    print("🧭 Recompute plan:")
+    if not work:
+        print("  Nothing depends on these changes - snapshot is unchanged")
+        if not args.survival:
+            return
+    for name, region in work.items():
+        scope = ', '.join(f"{d}[{','.join(str(recompute.LEVELS[d][i]) for i in idx)}]" for d, idx in region.items())
+        print(f"  {name}: {scope or 'all cells'}")
+    if args.dry_run:
+        return
+
+    print(f"📚 Loading snapshot from {args.source}...")
+    started = time.perf_counter()
+    current = grid.load_grid(args.source)
+    print(f"  Loaded {len(current):,} scenarios in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    updated, report = recompute.recompute(current, assumptions, midpoints)
+    incremental = time.perf_counter() - started
+    carried = [name for name in updated.columns if updated.columns[name] is current.columns[name]]
+    print(f"⚡ Incremental recompute: {incremental:.2f}s")
+    for name, stats in report.items():
+        print(f"  {name}: {stats['cells']:,} cells in {stats['seconds']:.3f}s")
+    print(f"  Carried over unchanged: {', '.join(carried) or '-'}")
+
+    if args.compare_full:
+        started = time.perf_counter()
+        recompute.build(dict(model.ASSUMPTIONS, **assumptions), midpoints)
+        full = time.perf_counter() - started
+        print(f"🐢 Full rebuild: {full:.2f}s ({incremental / full * 100:.0f}% of full)")
+
+    started = time.perf_counter()
+    recompute.add_columns(updated, assumptions=assumptions)
+    print(f"🏦 Drawdown columns ({', '.join(recompute.DERIVED)}): {time.perf_counter() - started:.2f}s")
+
+    if args.survival:
+        started = time.perf_counter()
+        historical.add_survival_rate(updated, assumptions, workers=args.workers)
+        print(f"📉 Historical survival rates: {time.perf_counter() - started:.1f}s")
+
+    import pyarrow.dataset as ds
+    print(f"💾 Writing to {args.output}")
+    ds.write_dataset(
+        updated.to_table(), args.output, format='parquet',
+        partitioning=['status_color', 'execution_date'], partitioning_flavor='hive',
+        existing_data_behavior='delete_matching',
+    )
+    print("🎯 Recomputed snapshot ready!")
+
+
+if __name__ == '__main__':
+    main()